@@ -1,46 +1,149 @@
-import json
-import os
 import argparse
-from src.tests.evaluate import AppWorldEvalator
+import os
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--agent_type", type=str, choices=["react", "reflexion", "ace", "reflace"], required=True)
     parser.add_argument("--model_name", type=str, default="gpt-4.1-mini")
     parser.add_argument("--temperature", type=float, default=0.0)
+    # model routing (reflector / curator and api doc browsing steps -> small model, repeated failures -> large model)
+    parser.add_argument("--small_model", type=str, default=None, help="cheap model for routine steps (reflector, curator, api doc browsing)")
+    parser.add_argument("--large_model", type=str, default=None, help="strong model that steps escalate to after repeated failures")
+    parser.add_argument("--escalate_after", type=int, default=2, help="number of failures that moves a step one model tier up")
+    parser.add_argument("--streaming", action="store_true", help="stream actor responses : api doc lookups start while the model is still generating, TTFT / inter-token latency are recorded")
     parser.add_argument("--dataset_type", type=str, choices=["train", "test", "dev"], default="dev")
     parser.add_argument("--experiment_name", type=str, default="sample")
     parser.add_argument("--first_k_task", type=int, default=None)
     parser.add_argument("--save_dir", type=str, default="./evaluation_results")
+    parser.add_argument("--resume", action="store_true", help="skip task ids already recorded in '{experiment_name}.jsonl' and restore carried-over state")
+    parser.add_argument("--num_samples", type=int, default=1, help="number of parallel trajectories per task for 'react' (best-of-N, needs '--sandbox')")
+    parser.add_argument("--sample_temperature", type=float, default=0.7, help="temperature of best-of-N samples when '--temperature' is 0 (samples also differ by seed)")
+    parser.add_argument("--num_workers", type=int, default=1, help="number of tasks run in parallel (longest predicted task first, needs '--sandbox')")
+    parser.add_argument("--schedule_history", type=str, nargs='*', default=[], help="earlier result files used to predict task durations for '--num_workers'")
+    parser.add_argument("--prefetch_envs", type=int, default=None, help="number of AppWorld environments prepared in background for upcoming tasks (needs '--sandbox', default : 1 with '--sandbox', otherwise 0)")
+    parser.add_argument("--sandbox", action="store_true", help="run AppWorld code execution in sandbox worker processes")
+    parser.add_argument("--sandbox_cpu_seconds", type=float, default=30.0, help="CPU time limit of one code execution in sandbox")
+    parser.add_argument("--sandbox_max_output", type=int, default=20000, help="max characters of one code execution output in sandbox")
+    parser.add_argument("--sandbox_max_memory_mb", type=float, default=2048, help="sandbox worker is replaced when its memory exceeds this limit")
+    parser.add_argument("--batch", type=str, choices=["openai", "local"], default=None, help="offline mode for 'reflexion' / 'ace' : reflector and curator calls of failed tasks go through batch api, results are applied to later tasks")
+    parser.add_argument("--batch_size", type=int, default=100, help="number of deferred requests sent as one batch job")
+    parser.add_argument("--batch_poll_seconds", type=float, default=30.0, help="polling interval of batch jobs at the end of experiment")
+    parser.add_argument("--playbook", type=str, default=None, help="ACE playbook checkpoint to start from (e.g. written by train.py)")
+    parser.add_argument("--reflections", type=str, default=None, help="Reflexion reflection set to start from (evaluator state file or saved reflection store)")
+    parser.add_argument("--frozen", action="store_true", help="read-only inference for 'ace' / 'reflexion' : generator / actor only with the given playbook or reflections, no evaluator / learning nodes / embedding model")
+    parser.add_argument("--checkpoint", type=str, default=None, help="path of SQLite checkpoint file. with '--resume', interrupted task continues from its last completed node")
+    parser.add_argument("--playbook_store", type=str, default=None, help="path of SQLite playbook store shared by ACE workers")
+    # budget limits (per task / per experiment)
+    parser.add_argument("--max_steps", type=int, default=100)
+    parser.add_argument("--max_task_tokens", type=int, default=None)
+    parser.add_argument("--max_task_cost", type=float, default=None)
+    parser.add_argument("--max_task_seconds", type=float, default=None)
+    parser.add_argument("--max_experiment_cost", type=float, default=None)
+    parser.add_argument("--max_experiment_seconds", type=float, default=None)
     args = parser.parse_args()
+
+    # AppWorld sessions open at the same time must live in separate processes (process-global state)
+    if args.prefetch_envs is None:
+        args.prefetch_envs = 1 if args.sandbox else 0
+    if not args.sandbox and (args.num_workers > 1 or args.prefetch_envs > 0 or args.num_samples > 1):
+        parser.error("'--num_workers' > 1, '--prefetch_envs' > 0 and '--num_samples' > 1 need '--sandbox'")
     
     print("=="*50)
     print(f"📌 Running Agent Type: {args.agent_type}")
     print(f"    📍 LLM Core Name: {args.model_name}")
     print(f"    📍 LLM Core Temperature: {args.temperature}")
+    print(f"    📍 Model Tiers: small={args.small_model}, large={args.large_model} (escalate after {args.escalate_after} failures)")
+    print(f"    📍 Streaming: {args.streaming}")
+    print(f"    📍 Number of Samples: {args.num_samples} (sample temperature : {args.sample_temperature})")
+    print(f"    📍 Number of Workers: {args.num_workers}")
+    print(f"    📍 Prefetched Environments: {args.prefetch_envs}")
+    print(f"    📍 Sandbox: {args.sandbox}")
+    print(f"    📍 Batch Mode: {args.batch}")
     print(f"📌 Running Environment: AppWorld")
     print(f"    📍 Dataset Type: {args.dataset_type}")
     print(f"    📍 Experiment Name: {args.experiment_name}")
     print(f"    📍 Number of Task: {args.first_k_task if args.first_k_task is not None else 'Full'}")
     print(f"📌 Save Directory: {args.save_dir}")
+    print(f"    📍 Resume: {args.resume}")
+    print(f"    📍 Checkpoint: {args.checkpoint}")
+    print(f"📌 Playbook: {args.playbook}, Reflections: {args.reflections} (frozen : {args.frozen})")
+    print(f"📌 Task Budget: steps={args.max_steps}, tokens={args.max_task_tokens}, cost={args.max_task_cost}, seconds={args.max_task_seconds}")
+    print(f"📌 Experiment Budget: cost={args.max_experiment_cost}, seconds={args.max_experiment_seconds}")
     print("=="*50 + "\n\n")
     
+    # imported after argument parsing : '--help' and argument errors never load agents / appworld
+    from src.tests.evaluate import AppWorldEvalator
+
+    model_config = {
+        'model' : args.model_name,
+        'temperature' : args.temperature,
+        'stream_usage' : True
+    }
+    if args.streaming:
+        model_config['streaming'] = True        # model tiers below inherit it
+    router_config = None
+    if args.small_model is not None or args.large_model is not None:
+        tiers = {'default' : model_config}
+        for tier, model in (('small', args.small_model), ('large', args.large_model)):
+            if model is not None:
+                tiers[tier] = {**model_config, 'model' : model}
+        router_config = {'tiers' : tiers, 'escalate_after' : args.escalate_after}
+
+    # learned state to start from (frozen inference or continued learning)
+    playbook, reflection_store = None, None
+    if args.playbook is not None:
+        from src.core.playbook import load_playbook
+        playbook = load_playbook(args.playbook)
+    if args.reflections is not None:
+        from src.core.reflection_store import load_reflection_store
+        reflection_store = load_reflection_store(args.reflections)
 
     evaluator = AppWorldEvalator(
         agent_type=args.agent_type,
         dataset_type=args.dataset_type,
         experiment_name=args.experiment_name,
         first_k_task=args.first_k_task,
-        model_config={
-            'model' : args.model_name,
-            'temperature' : args.temperature,
-            'stream_usage' : True
-        }
+        model_config=model_config,
+        save_dir=args.save_dir,
+        resume=args.resume,
+        task_budget={
+            'max_steps' : args.max_steps,
+            'max_tokens' : args.max_task_tokens,
+            'max_cost' : args.max_task_cost,
+            'max_seconds' : args.max_task_seconds
+        },
+        experiment_budget={
+            'max_cost' : args.max_experiment_cost,
+            'max_seconds' : args.max_experiment_seconds
+        },
+        num_samples=args.num_samples,
+        sample_temperature=args.sample_temperature,
+        playbook_store_path=args.playbook_store,
+        checkpoint_path=args.checkpoint,
+        num_workers=args.num_workers,
+        schedule_history=args.schedule_history,
+        prefetch_envs=args.prefetch_envs,
+        sandbox_config={
+            'cpu_seconds' : args.sandbox_cpu_seconds,
+            'max_output_chars' : args.sandbox_max_output,
+            'max_memory_mb' : args.sandbox_max_memory_mb
+        } if args.sandbox else None,
+        router_config=router_config,
+        batch_config={
+            'backend' : args.batch,
+            'work_dir' : os.path.join(args.save_dir, 'batch_jobs'),
+            'max_batch_size' : args.batch_size,
+            'poll_interval' : args.batch_poll_seconds
+        } if args.batch is not None else None,
+        playbook=playbook,
+        reflection_store=reflection_store,
+        frozen=args.frozen
     )
     
-    result = evaluator.evaluate()
-    with open(os.path.join(f"{args.save_dir}", f"{args.experiment_name}.json"), 'w', encoding='utf-8') as f:
-        json.dump(result, f, indent=2)
+    # per-task results are streamed to '{save_dir}/{experiment_name}.jsonl' while evaluating
+    summary = evaluator.evaluate()
+    print(f"📌 Succeed {summary['num_succeed']} / {summary['num_tasks']} tasks. Results : {summary['result_path']}")
+    print(f"📌 Total cost : ${summary['total_cost']:.4f} (cost per solved task : ${summary['cost_per_solved_task']:.4f})")
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,11 @@
 from .base import BaseAgent
 from .react import ReActAgent
 from ..state import ReActState, ACEState
-from ..utils.llm import get_response_with_retry
-from ..utils.token_usage import get_token_usage_from_message
+from ..utils.messages import render_trajectory
+from ..utils.structured import get_structured_response, get_text, parse_response
+from ..utils.token_usage import UsageLedger
+from ..utils.budget import BudgetController
+from ..prompt.registry import PromptTemplate
 from ..prompt.ace import (
     # generator prompts
     GENERATOR_INPUT_PROMPT,
@@ -17,16 +20,21 @@ from ..prompt.ace import (
     CURATOR_SYSTEM_PROMPT
 )
 from ..core.playbook import PlayBook
+from ..core.playbook_store import PlayBookStore
+from ..core.evaluation import EvaluationResult
+from ..core.router import ModelRouter, classify_step
+from ..core.batch import BatchQueue
+from ..types import ReflectorResponseModel, CuratorResponseModel
 
+import json
 from typing import Callable, Sequence, Dict, Any, List
 
-from langchain_openai import ChatOpenAI
-
 from langchain.messages import AnyMessage, SystemMessage, AIMessage, HumanMessage, ToolMessage
 from langchain.tools import tool
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from appworld import AppWorld
 
@@ -42,24 +50,36 @@ class ReflectorModule(BaseAgent):
     def __init__(
         self,
         env: AppWorld,
-        system_prompt: str = REFLECTOR_SYSTEM_PROMPT,
+        system_prompt: str | PromptTemplate = REFLECTOR_SYSTEM_PROMPT,
         model_config: Dict[str, Any] = {
             'model' : 'gpt-4o',
             'temperature' : 0.0,
             'stream_usage' : True
-        }
+        },
+        ledger: UsageLedger = None,
+        budget: BudgetController = None,
+        name: str = 'reflector',
+        checkpointer: BaseCheckpointSaver | bool = None,
+        thread_id: str = None,
+        router: ModelRouter = None
     ) -> None:
         self.env = env
-        self.system_prompt = system_prompt
+        self.system_prompt = str(system_prompt)
         self.model_config = model_config
+        self.router = router if router is not None else ModelRouter.single(model_config)
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.budget = budget if budget is not None else BudgetController(ledger=self.ledger)
+        self.name = name
+        self.checkpointer = checkpointer
+        self.thread_id = thread_id
 
         self.tool_list = self._get_tool_list()
 
-        self.openai_client = ChatOpenAI(**model_config)
-        self.openai_client_with_tools = self.openai_client.bind_tools(self.tool_list)
-        self.openai_client_with_structured_output = self.openai_client.with_structured_output(
-            ########## NotImplement ##########
-        )
+        self.openai_client_with_tools = self.router.get_client('default', tools=self.tool_list)
+        # structured response of reflector runs on its own tier
+        self.response_tier = self.router.route(self.name, step_type='response')
+
+        self.agent = self._build_agent()
 
     # --------------------------------------------------------------------------------------------------------
     # Define Actor Node
@@ -76,15 +96,24 @@ class ReflectorModule(BaseAgent):
         # ================================================================================================================
         def _actor(state: ReActState) -> ReActState:
 
-            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt)] + state['messages']
+            # count agent step for budget controller
+            self.budget.step()
+
+            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt), *state['messages']]
 
-            response: AIMessage = get_response_with_retry(
-                model_client=self.openai_client_with_tools,
+            # model tier of this step (escalates after error observations and failed attempts of the task)
+            model_client, tier = self._route(
+                step_type=classify_step(state['messages']),
+                failures=state.get('consecutive_errors', 0) + state.get('failed_attempts', 0)
+            )
+
+            response: AIMessage = self._get_action_response(
+                model_client=model_client,
                 messages=request_messages,
-                max_retries=3
+                tier=tier
             )
 
-            token_usage = get_token_usage_from_message(response)
+            token_usage = self._record_usage(response=response, node='actor', tier=tier)
             
             return {
                 'messages' : [response],
@@ -111,22 +140,31 @@ class ReflectorModule(BaseAgent):
         # ================================================================================================================
         def _response(state: ReActState) -> ReActState:
 
-            request_messages: Sequence[AnyMessage] = [SystemMessage(content=GENERATOR_RESPONSE_MODULE_SYSTEM_PROMPT)] + [
-                HumanMessage(content=GENERATOR_RESPONSE_MODULE_INPUT_PROMPT.format(
-                    ############# NotImplemented #############
+            final_answer = get_text(state['messages'][-1])
+
+            # fast path : final answer already follows requested JSON format (parsed / repaired locally, no call)
+            response, _ = parse_response(final_answer, ReflectorResponseModel)
+            if response is not None:
+                return {'structured_response' : response.model_dump()}
+
+            # otherwise only the final answer (not the whole trajectory) is converted with strict json schema
+            request_messages: Sequence[AnyMessage] = [SystemMessage(content=str(GENERATOR_RESPONSE_MODULE_SYSTEM_PROMPT))] + [
+                HumanMessage(content=GENERATOR_RESPONSE_MODULE_INPUT_PROMPT.render(
+                    response = final_answer
                 ))
             ]
 
-            response: AIMessage = get_response_with_retry(
-                model_client=self.openai_client_with_structured_output,
-                messages = request_messages,
+            response, responses = get_structured_response(
+                model_client=self.router.get_client(self.response_tier),
+                schema=ReflectorResponseModel,
+                messages=request_messages,
                 max_retries=3
             )
 
-            token_usage = get_token_usage_from_message(response)
+            token_usage = self._record_usages(responses=responses, node='response', tier=self.response_tier)
             
             return {
-                'messages' : [response],
+                'structured_response' : response.model_dump(),
                 'input_tokens' : token_usage['input_tokens'],
                 'output_tokens' : token_usage['output_tokens'],
                 'total_tokens' : token_usage['total_tokens']
@@ -160,19 +198,16 @@ class ReflectorModule(BaseAgent):
 
             if hasattr(last_msg, 'tool_calls') and last_msg.tool_calls:
 
-                for tool_call in last_msg.tool_calls:
-                    if tool_call['name'] == 'action_tool':
-                        try:
-                            tool_messages.append(
-                                ToolMessage(
-                                    content=action_tool.invoke(tool_call['args']),
-                                    tool_call_id=tool_call['id']
-                                )
-                            )
-                        except Exception as error:
-                            raise error
+                # read-only calls (api doc lookups) run concurrently, mutating calls run serially. order is kept.
+                tool_messages = self._run_tool_calls(
+                    message=last_msg,
+                    action_tool=action_tool
+                )
                 
-            return {'messages' : tool_messages}
+            return {
+                'messages' : tool_messages,
+                'consecutive_errors' : self._count_consecutive_errors(state, tool_messages)
+            }
         # ================================================================================================================
 
         return _tools
@@ -193,7 +228,12 @@ class ReflectorModule(BaseAgent):
         # ================================================================================================================
         def _should_continue(state: ReActState) -> str:
 
-            last_msg: AIMessage = state['messages']
+            last_msg: AIMessage = state['messages'][-1]
+
+            # cut off gracefully when budget is exhausted (reason is recorded in budget controller)
+            if self.budget.exceeded():
+                self._abandon_tool_calls(last_msg)     # read-only calls dispatched while streaming
+                return 'end'
             
             if hasattr(last_msg, 'tool_calls') and last_msg.tool_calls:
                 return 'tools'
@@ -238,14 +278,15 @@ class ReflectorModule(BaseAgent):
             _should_continue,
             {
                 'tools' : 'tools',
-                'response' : 'response'
+                'response' : 'response',
+                'end' : END
             }
         )
         workflow.add_edge('tools', 'actor')
         workflow.add_edge('response', END)
 
         # compile workflow
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
     
 
 
@@ -282,26 +323,51 @@ class ACEAgent(BaseAgent):
     def __init__(
         self,
         env: AppWorld,
-        generator_system_prompt: str = GENERATOR_SYSTEM_PROMPT,
-        reflector_system_prompt: str = REFLECTOR_SYSTEM_PROMPT,
-        curator_system_prompt: str = CURATOR_SYSTEM_PROMPT,
+        generator_system_prompt: str | PromptTemplate = GENERATOR_SYSTEM_PROMPT,
+        reflector_system_prompt: str | PromptTemplate = REFLECTOR_SYSTEM_PROMPT,
+        curator_system_prompt: str | PromptTemplate = CURATOR_SYSTEM_PROMPT,
         model_config: Dict[str, Any] = {
             'model' : 'gpt-4o',
             'temperature' : 0.0,
             'stream_usage' : True
-        }
+        },
+        ledger: UsageLedger = None,
+        budget: BudgetController = None,
+        playbook_store: PlayBookStore = None,
+        name: str = 'ace',
+        checkpointer: BaseCheckpointSaver = None,
+        thread_id: str = None,
+        router: ModelRouter = None,
+        batch_queue: BatchQueue = None,
+        frozen: bool = False
     ) -> None:
         
         self.env = env
-        self.generator_system_prompt: str = generator_system_prompt
-        self.reflector_system_prompt: str = reflector_system_prompt
-        self.curator_system_prompt: str = curator_system_prompt
+        self.generator_system_prompt: str = str(generator_system_prompt)
+        self.reflector_system_prompt: str = str(reflector_system_prompt)
+        self.curator_system_prompt: str = str(curator_system_prompt)
         self.model_config = model_config
+        self.router = router if router is not None else ModelRouter.single(model_config)
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.budget = budget if budget is not None else BudgetController(ledger=self.ledger)
+        self.name = name
+        self.checkpointer = checkpointer
+        self.thread_id = thread_id
+
+        # playbook shared by many ACE workers (optional). without it, playbook in state is used.
+        self.playbook_store = playbook_store
+
+        # offline batch mode (optional) : reflector and curator calls of failed task are deferred to batch api.
+        # curation arrives after the task is done, so it is applied to the shared playbook store.
+        self.batch_queue = batch_queue
+        # frozen playbook (evaluation of trained playbook) : generator only, no evaluator / reflector / curator
+        self.frozen = frozen
+        if batch_queue is not None and playbook_store is None:
+            raise ValueError("Batch mode of ACE agent needs a shared playbook store ('playbook_store').")
 
         self.tool_list: Sequence[tool] = self._get_tool_list()
 
-        self.openai_client = ChatOpenAI(**model_config)
-        self.openai_client_with_tools = self.openai_client.bind_tools(self.tool_list)
+        self.openai_client_with_tools = self.router.get_client('default', tools=self.tool_list)
 
         self.agent = self._build_agent()
 
@@ -314,26 +380,41 @@ class ACEAgent(BaseAgent):
         generator = ReActAgent(
             env=self.env,
             system_prompt=self.generator_system_prompt,
-            model_config=self.model_config
+            model_config=self.model_config,
+            ledger=self.ledger,
+            budget=self.budget,
+            name='generator',
+            checkpointer=False,
+            router=self.router
         )
 
         # Generator Module
         # ================================================================================================================
         def _generator(state: ACEState) -> ACEState:
-            _playbook: PlayBook = state['playbook']
+            # with shared playbook store, always start from the latest version (learned by every worker)
+            if self.playbook_store is not None:
+                _playbook: PlayBook = self.playbook_store.read()
+            else:
+                _playbook: PlayBook = state['playbook']
 
             try:
                 result_state: ACEState = generator.invoke({
-                    'messages' : [HumanMessage(content=GENERATOR_INPUT_PROMPT.format(
-                        playbook = _playbook.to_str()
-                        ############# Not Implement #############
-                    ))]
+                    'messages' : [HumanMessage(content=GENERATOR_INPUT_PROMPT.render(
+                        playbook = _playbook.to_str(),
+                        first_name = self.env.task.supervisor.first_name,
+                        last_name = self.env.task.supervisor.last_name,
+                        email = self.env.task.supervisor.email,
+                        phone_number = self.env.task.supervisor.phone_number,
+                        instruction = self.env.task.instruction
+                    ))],
+                    'failed_attempts' : state.get('num_reflections', 0)
                 })
             except Exception as error:
                 raise error
 
             return {
                 'trajectory' : result_state['messages'],
+                'playbook' : _playbook,
                 'input_tokens' : result_state['input_tokens'],
                 'output_tokens' : result_state['output_tokens'],
                 'total_tokens' : result_state['total_tokens']
@@ -350,46 +431,12 @@ class ACEAgent(BaseAgent):
         # Evaluator Node
         # ==========================================================================================
         def _evaluator(state: ACEState):
-            # get task evaluation result
-            eval_result = self.env.evaluate()
-
-            evaluation_report = ""
-
-            # get task requirement information
-            # total requirement count
-            total_requirement_count = eval_result.total_count
-            passed_requirement_count = eval_result.pass_count
-            failed_requirement_count = eval_result.fail_count
-
-            evaluation_report += f"Task Status : {'Succeed' if (eval_result.pass_count == eval_result.total_count) else 'Failed'}\n---\n\n"
-
-
-            evaluation_report += f"Task Requirement Count:\n- total requirements : {total_requirement_count}\n- passed requirements : {passed_requirement_count}\n- failed requirements : {failed_requirement_count}\n---\n\n"
-
-            if passed_requirement_count > 0:
-                evaluation_report += "Detail of passed requirments: \n"
-                for passed_requirement in eval_result.passes:
-                    evaluation_report += str({
-                        'requirement' : passed_requirement['requirement'],
-                        'label' : passed_requirement['label']
-                    })
-                    evaluation_report += "\n"
-                evaluation_report += "---\n\n"
-
-
-            if failed_requirement_count > 0:
-                evaluation_report += "Detail of failed requirments: \n"
-                for failed_requirement in eval_result.failures:
-                    evaluation_report += str({
-                        'requirement' : failed_requirement['requirement'],
-                        'failed_reason' : failed_requirement['trace']
-                    })
-                    evaluation_report += "\n"
-                evaluation_report += "---\n\n"
-            
-            print(f"[Evaluator] 📊 Evaluation Report: \n{evaluation_report}")
+            # get task evaluation result (report text is rendered lazily, only when reflector needs it)
+            evaluation = EvaluationResult.from_env(self.env)
+
+            print(f"[Evaluator] 📊 Task Status : {'Succeed' if evaluation.success else 'Failed'} ({evaluation.pass_count}/{evaluation.total_count} requirements passed)")
             
-            return {'evaluation' : evaluation_report}
+            return {'evaluation' : evaluation}
         # ==========================================================================================
 
         return _evaluator
@@ -402,7 +449,12 @@ class ACEAgent(BaseAgent):
         reflector = ReflectorModule(
             env=self.env,
             system_prompt=self.reflector_system_prompt,
-            model_config=self.model_config
+            model_config=self.model_config,
+            ledger=self.ledger,
+            budget=self.budget,
+            name='reflector',
+            checkpointer=False,
+            router=self.router
         )
 
         # Reflector Module
@@ -412,16 +464,20 @@ class ACEAgent(BaseAgent):
 
             try:
                 result_state: ReActState = reflector.invoke({
-                    'messages' : [HumanMessage(content=REFLECTOR_INPUT_PROMPT.format(
+                    'messages' : [HumanMessage(content=REFLECTOR_INPUT_PROMPT.render(
+                        instruction = self.env.task.instruction,
+                        trajectory = render_trajectory(state['trajectory']),
                         playbook = _playbook.to_str()
-                        ############# Not Implement #############
-                    ))]
+                    ))],
+                    'failed_attempts' : state.get('num_reflections', 0)
                 })
             except Exception as error:
                 raise error
             
             return {
-                'reflection' : dict(result_state['messages'][-1]),
+                # no structured response when reflector was cut off by budget
+                'reflection' : result_state.get('structured_response', {}),
+                'num_reflections' : 1,
                 'input_tokens' : result_state['input_tokens'],
                 'output_tokens' : result_state['output_tokens'],
                 'total_tokens' : result_state['total_tokens']
@@ -435,40 +491,39 @@ class ACEAgent(BaseAgent):
     # --------------------------------------------------------------------------------------------------------
     def _get_curator_node(self) -> Callable:
 
-        openai_client = ChatOpenAI(**self.model_config)
-        curator = openai_client.with_structured_output(
-            ############ NotImplement ############ 
-        )
-
         # Curator Module
         # ================================================================================================================
         def _curator(state: ACEState) -> ACEState:
 
+            # model tier of curator (escalates after failed attempts of the task)
+            tier = self.router.route('curator', failures=state.get('num_reflections', 0))
+
             _playbook: PlayBook = state['playbook']
 
-            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.curator_system_prompt)] + [HumanMessage(content=CURATOR_INPUT_PROMPT.format(
-                reflection = state['reflection'],
-                playbook = _playbook.to_str()
-                ############# Not Implement #############
+            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.curator_system_prompt)] + [HumanMessage(content=CURATOR_INPUT_PROMPT.render(
+                instruction = self.env.task.instruction,
+                playbook = _playbook.to_str(),
+                reflection = json.dumps(state['reflection'], indent=2, ensure_ascii=False)
             ))]
 
-            response: AIMessage = get_response_with_retry(
-                model_client=curator,
+            # strict json schema output, local repair, then minimal re-ask (one call in common case)
+            response, responses = get_structured_response(
+                model_client=self.router.get_client(tier),
+                schema=CuratorResponseModel,
                 messages=request_messages,
                 max_retries=3
             )
 
-            token_usage = get_token_usage_from_message(response)
+            token_usage = self._record_usages(responses=responses, node='curator', tier=tier)
 
-            delta_entries: List[Dict[str, Any]] = dict(response.content)
+            delta_entries: List[Dict[str, Any]] = [operation.model_dump() for operation in response.operations]
 
-            for delta in delta_entries:
-                if delta['operation'] == 'ADD':
-                    section = delta['section']
-                    content = delta['content']
-                    _playbook.add_to_playbook(section=section, content=content)
-                else:
-                    raise ValueError(f"Unexpected Operation value : {delta['operation']}")
+            if self.playbook_store is not None:
+                # shared playbook : apply delta to store and continue with the new version
+                _playbook = self.playbook_store.apply_delta(delta_entries, ledger=self.ledger)
+            else:
+                # playbook is immutable : delta produces a new version, the input snapshot is left untouched
+                _playbook = _playbook.apply_delta(delta_entries, ledger=self.ledger)
             
             return {
                 'curation' : delta_entries,
@@ -481,6 +536,55 @@ class ACEAgent(BaseAgent):
 
         return _curator
 
+    # --------------------------------------------------------------------------------------------------------
+    # Define Deferred Reflector / Curator (offline batch mode)
+    # --------------------------------------------------------------------------------------------------------
+    def _get_deferred_reflector_node(self) -> Callable:
+
+        playbook_store = self.playbook_store
+        batch_queue = self.batch_queue
+
+        # Deferred Reflector Node
+        # ================================================================================================================
+        def _deferred_reflector(state: ACEState) -> ACEState:
+            instruction = self.env.task.instruction
+            failures = state.get('num_reflections', 0)
+
+            def _on_curation(curation: CuratorResponseModel) -> None:
+                delta_entries = [operation.model_dump() for operation in curation.operations]
+                playbook_store.apply_delta(delta_entries, ledger=batch_queue.ledger)
+
+            def _on_reflection(reflection: ReflectorResponseModel) -> None:
+                # curator sees the playbook as it is when the reflection arrives (with updates of other tasks)
+                batch_queue.submit(
+                    node=f"{self.name}/curator",
+                    tier=self.router.route('curator', failures=failures),
+                    messages=[SystemMessage(content=self.curator_system_prompt), HumanMessage(content=CURATOR_INPUT_PROMPT.render(
+                        instruction = instruction,
+                        playbook = playbook_store.read().to_str(),
+                        reflection = json.dumps(reflection.model_dump(), indent=2, ensure_ascii=False)
+                    ))],
+                    on_result=_on_curation,
+                    schema=CuratorResponseModel
+                )
+
+            # single call without tools : the environment is closed long before the batch result arrives
+            batch_queue.submit(
+                node=f"{self.name}/reflector",
+                tier=self.router.route('reflector', failures=failures),
+                messages=[SystemMessage(content=self.reflector_system_prompt), HumanMessage(content=REFLECTOR_INPUT_PROMPT.render(
+                    instruction = instruction,
+                    trajectory = render_trajectory(state['trajectory']),
+                    playbook = state['playbook'].to_str()
+                ))],
+                on_result=_on_reflection,
+                schema=ReflectorResponseModel
+            )
+            return {}
+        # ================================================================================================================
+
+        return _deferred_reflector
+
     # --------------------------------------------------------------------------------------------------------
     # Define conditional edge function
     # --------------------------------------------------------------------------------------------------------
@@ -490,12 +594,17 @@ class ACEAgent(BaseAgent):
         # ================================================================================================================
         def _should_continue(state: ACEState) -> str:
 
-            if len(state['reflector_output']) == 3:
+            max_retries = 3
+            if self.budget.exceeded():
+                return 'end'
+            elif state.get('num_reflections', 0) == max_retries:
                 return 'end'
-            elif 'Succeed' in state['evaluation']:
+            elif state['evaluation'].success:
                 return 'end'
+            elif self.batch_queue is not None:
+                return 'deferred_reflector'
             else:
-                'reflector'
+                return 'reflector'
         # ================================================================================================================
 
         return _should_continue
@@ -504,6 +613,8 @@ class ACEAgent(BaseAgent):
     # Build Agent
     # --------------------------------------------------------------------------------------------------------
     def _build_agent(self) -> CompiledStateGraph:
+        if self.frozen:
+            return self._build_frozen_agent()
 
         # ----------------------------------------------------
         # Get Nodes
@@ -512,6 +623,7 @@ class ACEAgent(BaseAgent):
         _evaluator = self._get_evaluator_node()
         _reflector = self._get_reflector_node()
         _curator = self._get_curator_node()
+        _deferred_reflector = self._get_deferred_reflector_node() if self.batch_queue is not None else None
 
         # ----------------------------------------------------
         # Get Conditional Edge function
@@ -528,20 +640,51 @@ class ACEAgent(BaseAgent):
         workflow.add_node('evaluator', _evaluator)
         workflow.add_node('reflector', _reflector)
         workflow.add_node('curator', _curator)
+        if _deferred_reflector is not None:
+            workflow.add_node('deferred_reflector', _deferred_reflector)
 
         # add edges
         workflow.add_edge(START, 'generator')
         workflow.add_edge('generator', 'evaluator')
+        evaluator_routes = {
+            'end' : END,
+            'reflector' : 'reflector'
+        }
+        if _deferred_reflector is not None:
+            evaluator_routes['deferred_reflector'] = 'deferred_reflector'
+            workflow.add_edge('deferred_reflector', END)
         workflow.add_conditional_edges(
             'evaluator',
             _should_continue,
+            evaluator_routes
+        )
+        workflow.add_conditional_edges(
+            'reflector',
+            self._get_budget_edge('curator'),
+            {
+                'curator' : 'curator',
+                'end' : END
+            }
+        )
+        workflow.add_conditional_edges(
+            'curator',
+            self._get_budget_edge('generator'),
             {
-                'end' : END,
-                'reflector' : 'reflector'
+                'generator' : 'generator',
+                'end' : END
             }
         )
-        workflow.add_edge('reflector', 'curator')
-        workflow.add_edge('curator', 'generator')
 
         # build agent
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    def _build_frozen_agent(self) -> CompiledStateGraph:
+        # learning nodes (and their modules) are never built
+        workflow = StateGraph(ACEState)
+
+        workflow.add_node('generator', self._get_generator_node())
+
+        workflow.add_edge(START, 'generator')
+        workflow.add_edge('generator', END)
+
+        return workflow.compile(checkpointer=self.checkpointer)
@@ -1,39 +1,72 @@
 from abc import ABC, abstractmethod
-from typing import Any, Union
+from uuid import uuid4
+from typing import Any, Callable, Dict, Sequence, Tuple, Union
 from pydantic import BaseModel, Field
 
-from langchain_openai import ChatOpenAI
 from langchain.tools import tool
+from langchain.messages import AIMessage, AnyMessage, ToolMessage
 
 from langgraph.graph.state import CompiledStateGraph
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from appworld import AppWorld
 from appworld.common.time import Timer
 
 from ..state import ReActState, ReflexionState, ACEState
+from ..utils.token_usage import UsageLedger
+from ..utils.budget import BudgetController
+from ..prompt.registry import PromptTemplate
+from ..core.router import ModelRouter
+from ..utils.llm import get_response_with_retry, stream_response_with_retry
+from ..utils.messages import is_error_observation
+from ..utils.tools import ToolCallDispatcher, calls_complete_task, execute_code, is_read_only_tool_call, run_tool_calls
 
 class BaseAgent(ABC):
     def __init__(
         self,
         env: AppWorld,
-        system_prompt: str,
+        system_prompt: str | PromptTemplate,
         model_config:dict[str, Any] = {
             'model' : 'gpt-4o',
             'temperature' : 0.0,
             'stream_usage' : True
-        }
+        },
+        ledger: UsageLedger = None,
+        budget: BudgetController = None,
+        name: str = 'react',
+        checkpointer: BaseCheckpointSaver | bool = None,
+        thread_id: str = None,
+        router: ModelRouter = None
     ):
         self.env = env
-        self.system_prompt = system_prompt
+        self.system_prompt = str(system_prompt)       # PromptTemplate is loaded here (first use)
         self.model_config = model_config
+        # model tier of each llm call (single tier of `model_config` when no router is given)
+        self.router = router if router is not None else ModelRouter.single(model_config)
+
+        # usage ledger (tokens / cost per model, node and call type)
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        # budget controller (hard caps on steps, tokens, cost and wall-time)
+        self.budget = budget if budget is not None else BudgetController(ledger=self.ledger)
+        self.name = name
+
+        # durable checkpointer (optional). modules invoked inside a node of another agent pass `False`
+        # and are re-run as a whole when the outer graph resumes.
+        self.checkpointer = checkpointer
+        self.thread_id = thread_id
+
+        # whether AppWorld task was already completed when current run started (retry on same environment)
+        self._completed_at_start = False
+
+        # tool calls dispatched while actor response was streaming (response id -> dispatcher)
+        self._dispatchers: Dict[str, ToolCallDispatcher] = {}
         
         # get tool list cache
         self.tool_list = self._get_tool_list()
 
-        # create llm client
-        openai_client = ChatOpenAI(**model_config)
-        # bind tools to llm client
-        self.openai_client_with_tools = openai_client.bind_tools(self.tool_list)
+        # llm client of default tier with tools bound (shared through router : only tool schema is bound,
+        # every agent still runs its own tools)
+        self.openai_client_with_tools = self.router.get_client('default', tools=self.tool_list)
 
         # build agent instance
         self.agent: CompiledStateGraph = self._build_agent()
@@ -80,7 +113,8 @@ class BaseAgent(ABC):
             """
             
             try:
-                tool_result = f"{self.env.execute(code)}"
+                # serialized per environment, api doc lookups are served from cache when possible
+                tool_result = execute_code(self.env, code)
             except Exception as error:
                 raise error
 
@@ -88,14 +122,181 @@ class BaseAgent(ABC):
         
         return [action_tool]
 
+    def _route(self, step_type: str = 'default', failures: int = 0) -> Tuple[Any, str]:
+        """
+        Get (llm client with tools, model tier) for the next call of this agent.
+        """
+        tier = self.router.route(self.name, step_type=step_type, failures=failures)
+        return self.router.get_client(tier, tools=self.tool_list), tier
+
+    def _get_response(
+        self,
+        model_client: Any,
+        messages: Sequence[AnyMessage],
+        node: str,
+        tier: str = 'default',
+        on_tool_call: Callable[[Dict[str, Any]], None] = None
+    ) -> AIMessage:
+        """
+        Get response of model client with retry logic. Tiers configured with `streaming` consume the
+        response as a stream : each complete tool call is passed to `on_tool_call` before the turn ends,
+        and time to first token / inter-token latency are recorded in usage ledger.
+        """
+        if not self.router.tiers[tier].get('streaming', False):
+            return get_response_with_retry(model_client=model_client, messages=messages, max_retries=3)
+
+        response, metrics = stream_response_with_retry(
+            model_client=model_client,
+            messages=messages,
+            max_retries=3,
+            on_tool_call=on_tool_call
+        )
+        self.ledger.record_stream(node=f"{self.name}/{node}", metrics=metrics)
+        return response
+
+    def _get_action_response(
+        self,
+        model_client: Any,
+        messages: Sequence[AnyMessage],
+        tier: str = 'default'
+    ) -> AIMessage:
+        """
+        Get actor response. With a streaming tier, read-only 'action_tool' calls (api doc lookups) start
+        running as soon as their arguments are complete (collected by `_run_tool_calls`, or dropped by
+        `_abandon_tool_calls` when the turn ends without tool node). State-changing calls always wait for
+        the tool node. A checkpointed agent never dispatches early : a tool that already ran before the
+        actor checkpoint is written would run again on resume.
+        """
+        streaming = self.router.tiers[tier].get('streaming', False)
+        if not streaming or self.checkpointer:
+            return self._get_response(model_client=model_client, messages=messages, node='actor', tier=tier)
+
+        action_tool = next(_tool for _tool in self.tool_list if _tool.name == 'action_tool')
+        dispatcher = ToolCallDispatcher(action_tool)
+        response = self._get_response(
+            model_client=model_client,
+            messages=messages,
+            node='actor',
+            tier=tier,
+            on_tool_call=dispatcher.dispatch_early
+        )
+        if len(dispatcher) > 0:
+            if response.id is None:
+                response.id = f"{uuid4()}"
+            self._dispatchers[response.id] = dispatcher
+        return response
+
+    def _run_tool_calls(self, message: AIMessage, action_tool: Any) -> Sequence[ToolMessage]:
+        """
+        Tool messages of `message`, from calls dispatched while streaming when there are any.
+        """
+        dispatcher = self._dispatchers.pop(message.id, None) if message.id is not None else None
+        if dispatcher is not None:
+            return dispatcher.collect(message.tool_calls)
+        return run_tool_calls(tool_calls=message.tool_calls, action_tool=action_tool)
+
+    def _count_consecutive_errors(self, state: ReActState, tool_messages: Sequence[ToolMessage]) -> int:
+        """
+        Steps in a row whose observation is an error, this step included (model router escalates on them).
+        """
+        failed = any(is_error_observation(f"{message.content}") for message in tool_messages)
+        return state.get('consecutive_errors', 0) + 1 if failed else 0
+
+    def _abandon_tool_calls(self, message: AIMessage = None) -> None:
+        """
+        Drop calls dispatched while streaming `message` (every pending turn when not given), for turns that
+        end without tool node (budget cut-off). Returns once none of them runs anymore.
+        """
+        if message is None:
+            dispatchers, self._dispatchers = list(self._dispatchers.values()), {}
+        else:
+            dispatcher = self._dispatchers.pop(message.id, None) if message.id is not None else None
+            dispatchers = [] if dispatcher is None else [dispatcher]
+
+        for dispatcher in dispatchers:
+            dispatcher.cancel()
+
+    def _record_usage(self, response: AIMessage, node: str, tier: str = 'default') -> Dict[str, int]:
+        """
+        Record token usage of response in usage ledger, and return token usage of response.
+        """
+        return self.ledger.record_message(
+            message=response,
+            model=self.router.model(tier),
+            node=f"{self.name}/{node}",
+            tier=tier
+        )
+
+    def _is_task_completed(
+        self,
+        tool_calls: Sequence[Dict[str, Any]],
+        tool_messages: Sequence[ToolMessage]
+    ) -> bool:
+        """
+        Whether tool calls of current step completed the task, read from AppWorld state.
+
+        Read-only calls (api doc lookups) never complete a task, so the environment is only asked after
+        state-changing code. When the task was already completed before this run (Reflexion / ACE retry on
+        the same environment), the flag cannot change anymore, and a `complete_task` call that ran without
+        error is used instead.
+        """
+        # tool messages are only created for 'action_tool' calls (see run_tool_calls)
+        tool_calls = [tool_call for tool_call in tool_calls if tool_call['name'] == 'action_tool']
+        if all(is_read_only_tool_call(tool_call) for tool_call in tool_calls):
+            return False
+
+        if not self._completed_at_start:
+            return self.env.task_completed()
+
+        return any(
+            calls_complete_task(tool_call['args'].get('code', '')) and 'Traceback' not in f"{message.content}"
+            for tool_call, message in zip(tool_calls, tool_messages)
+        )
+
+    def _record_usages(self, responses: Sequence[AIMessage], node: str, tier: str = 'default') -> Dict[str, int]:
+        """
+        Record token usage of several responses of one node (e.g. structured output re-ask), and return their sum.
+        """
+        total = {'input_tokens' : 0, 'output_tokens' : 0, 'total_tokens' : 0}
+        for response in responses:
+            token_usage = self._record_usage(response=response, node=node, tier=tier)
+            for field in total:
+                total[field] += token_usage[field]
+        return total
+
+    def _get_budget_edge(self, next_node: str):
+        """
+        Create conditional edge function that routes to `next_node`, or 'end' when budget is exhausted.
+        """
+        def _within_budget(state) -> str:
+            if self.budget.exceeded():
+                return 'end'
+            return next_node
+        
+        return _within_budget
+
     @abstractmethod
     def _build_agent(self):
         raise NotImplementedError()
     
 
-    def invoke(self, state: Union[ReActState, ReflexionState, ACEState]):
+    def _get_config(self) -> Dict[str, Any]:
+        config = {'recursion_limit' : self.budget.recursion_limit()}
+        if self.thread_id is not None:
+            config['configurable'] = {'thread_id' : self.thread_id}
+        return config
+
+    def invoke(self, state: Union[ReActState, ReflexionState, ACEState, None]):
+        """
+        Run agent on input state. With a checkpointer, `state=None` resumes the thread from its last checkpoint.
+        """
         timer = Timer(bypass_freezegun=True, start=True)
-        result = self.agent.invoke(state)
+        self._completed_at_start = self.env.task_completed()
+        try:
+            result = self.agent.invoke(state, config=self._get_config())
+        finally:
+            # environment is evaluated by the caller : no tool call of this run may still be running
+            self._abandon_tool_calls()
         latency = timer.stop()
         return {
             **result,
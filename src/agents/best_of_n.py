@@ -0,0 +1,185 @@
+from .react import ReActAgent
+from ..state import ReActState
+from ..utils.token_usage import UsageLedger
+from ..utils.budget import BudgetController
+from ..prompt.registry import PromptTemplate
+from ..core.evaluation import EvaluationResult
+from ..core.router import ModelRouter
+
+from typing import Any, Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from appworld import AppWorld
+from appworld.common.time import Timer
+
+# sampling temperature of tiers configured greedy (temperature 0 makes N samples nearly identical)
+SAMPLE_TEMPERATURE = 0.7
+
+
+def get_sample_routers(
+    router: ModelRouter,
+    num_samples: int,
+    temperature: float = SAMPLE_TEMPERATURE
+) -> List[ModelRouter]:
+    """
+    Router of each sample : same tiers and routes, with its own seed, and `temperature` for tiers that
+    are configured greedy. Routers are meant to be created once and shared by every task.
+    """
+    if temperature <= 0:
+        raise ValueError(f"Best-of-N sampling needs a positive sample temperature, got {temperature}.")
+
+    greedy = sorted(name for name, config in router.tiers.items() if config.get('temperature', 1.0) <= 0)
+    if greedy:
+        print(f"[BestOfN] ⚠️ Tiers {greedy} are configured with temperature 0. Samples use temperature {temperature}.")
+
+    return [
+        ModelRouter(
+            tiers={
+                name : {**config, **({'temperature' : temperature} if name in greedy else {}), 'seed' : index}
+                for name, config in router.tiers.items()
+            },
+            routes=router.routes,
+            escalate_after=router.escalate_after
+        )
+        for index in range(num_samples)
+    ]
+
+
+# --------------------------------------------------------------------------------------------------------
+# Best-of-N ReAct Agent (speculative parallel sampling)
+# --------------------------------------------------------------------------------------------------------
+class BestOfNAgent:
+    """
+    Run N independent ReAct trajectories at once, each in its own isolated AppWorld instance.
+
+    Samples differ by seed, and tiers configured with temperature 0 are sampled at `SAMPLE_TEMPERATURE`
+    (see `get_sample_routers`). AppWorld keeps process-global state (frozen clock, app databases), so
+    `env_factory` must create sandboxed sessions (`SandboxPool.open`), not AppWorld instances of this process.
+
+    The first trajectory that passes `env.evaluate()` wins and the other samples are cancelled
+    (through their budget controllers). If no sample succeeds, the sample with the highest
+    `pass_count` is kept. After `invoke`, `self.env` is the environment of the kept sample.
+    """
+    def __init__(
+        self,
+        env: AppWorld,
+        env_factory: Callable[[int], AppWorld],
+        num_samples: int,
+        system_prompt: str | PromptTemplate,
+        model_config: Dict[str, Any] = {
+            'model' : 'gpt-4o',
+            'temperature' : 0.0,
+            'stream_usage' : True
+        },
+        ledger: UsageLedger = None,
+        budget: BudgetController = None,
+        name: str = 'best_of_n',
+        router: ModelRouter = None,
+        sample_routers: List[ModelRouter] = None
+    ) -> None:
+        self.env = env                      # environment of sample 0 (and of kept sample after invoke)
+        self.env_factory = env_factory      # create isolated environment of sample i (i >= 1)
+        self.num_samples = num_samples
+        self.system_prompt = system_prompt
+        self.model_config = model_config
+        self.router = router if router is not None else ModelRouter.single(model_config)
+        # router of each sample (seed / temperature per sample)
+        self.sample_routers = sample_routers if sample_routers is not None else get_sample_routers(self.router, num_samples)
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.budget = budget if budget is not None else BudgetController(ledger=self.ledger)
+        self.name = name
+
+    def _get_sample_budget(self) -> BudgetController:
+        # every sample has the step / time limit of the task, token and cost limits are shared by all samples.
+        return BudgetController(
+            max_steps=self.budget.max_steps,
+            max_tokens=self.budget.max_tokens,
+            max_cost=self.budget.max_cost,
+            max_seconds=self.budget.max_seconds,
+            ledger=self.ledger,
+            parent=self.budget.parent
+        )
+
+    def invoke(self, state: ReActState) -> Dict[str, Any]:
+        timer = Timer(bypass_freezegun=True, start=True)
+
+        envs: List[AppWorld] = [self.env]
+        budgets: List[BudgetController] = [self._get_sample_budget() for _ in range(self.num_samples)]
+
+        def _run_sample(index: int):
+            agent = ReActAgent(
+                env=envs[index],
+                system_prompt=self.system_prompt,
+                model_config=self.model_config,
+                ledger=self.ledger,
+                budget=budgets[index],
+                name=f"{self.name}/sample_{index}",
+                router=self.sample_routers[index]
+            )
+            result = agent.invoke({
+                **state,
+                'messages' : [message.model_copy() for message in state['messages']]
+            })
+            return result, EvaluationResult.from_env(envs[index])
+
+        results: Dict[int, Dict[str, Any]] = {}
+        evaluations: Dict[int, EvaluationResult] = {}
+        best_index, best_pass_count, solved = None, -1, False
+
+        # environment handed back as `self.env` : sample 0 (owned by the caller) until a sample is kept.
+        # every other environment is released here, also when a sample or `env_factory` fails.
+        kept_index = 0
+        try:
+            for index in range(1, self.num_samples):
+                envs.append(self.env_factory(index))
+
+            with ThreadPoolExecutor(max_workers=self.num_samples, thread_name_prefix='sample') as executor:
+                futures = {executor.submit(_run_sample, index) : index for index in range(self.num_samples)}
+
+                try:
+                    # cancelled samples stop at their next step, so every future is still collected (tokens are paid)
+                    for future in as_completed(futures):
+                        index = futures[future]
+                        results[index], evaluation = future.result()
+                        evaluations[index] = evaluation
+
+                        if solved:
+                            continue
+
+                        if evaluation.pass_count > best_pass_count:
+                            best_index, best_pass_count = index, evaluation.pass_count
+
+                        # keep the first sample that solves the task and cancel the rest
+                        if evaluation.success:
+                            best_index, solved = index, True
+                            for other_index, other_budget in enumerate(budgets):
+                                if other_index not in results:
+                                    other_budget.cancel(f"cancelled : sample {index} solved the task")
+                except BaseException:
+                    # failed sample : stop the others before the executor waits for them
+                    for budget in budgets:
+                        budget.cancel("cancelled : another sample failed")
+                    raise
+
+            kept_index = best_index
+        finally:
+            # release environments of discarded samples
+            for index, env in enumerate(envs):
+                if index != kept_index:
+                    env.close()
+        self.env = envs[kept_index]
+
+        # every sample is paid for, so token usage and steps are summed over all samples
+        self.budget.steps = sum(budget.steps for budget in budgets)
+        self.budget.stop_reason = budgets[best_index].stop_reason
+
+        best_result = results[best_index]
+        return {
+            **best_result,
+            'input_tokens' : sum(result['input_tokens'] for result in results.values()),
+            'output_tokens' : sum(result['output_tokens'] for result in results.values()),
+            'total_tokens' : sum(result['total_tokens'] for result in results.values()),
+            'evaluation' : evaluations[best_index],
+            'sample_index' : best_index,
+            'latency' : timer.stop()
+        }
@@ -9,8 +9,8 @@ from appworld.common.time import Timer
 
 from ..state import ReActState
 from .base import BaseAgent
-from ..utils.llm import get_response_with_retry
-from ..utils.token_usage import get_token_usage_from_message
+from ..utils.messages import MessageLog
+from ..core.router import classify_step
 
 
 # --------------------------------------------------------------------------------------------------------
@@ -31,18 +31,27 @@ class ReActAgent(BaseAgent):
         def _actor(state: ReActState):
 
             # create request message list (insert system message in current message history)
-            messages: Sequence[AnyMessage] = state['messages']
-            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt)] + messages
+            messages: MessageLog = state['messages']
+            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt), *messages]
+
+            # count agent step for budget controller
+            self.budget.step()
+
+            # model tier of this step (api doc browsing -> cheap tier, repeated failures -> stronger tier)
+            model_client, tier = self._route(
+                step_type=classify_step(messages),
+                failures=state.get('consecutive_errors', 0) + state.get('failed_attempts', 0)
+            )
 
             # get response from llm client with retry logic
-            response: AIMessage = get_response_with_retry(
-                model_client=self.openai_client_with_tools,
+            response: AIMessage = self._get_action_response(
+                model_client=model_client,
                 messages=request_messages,
-                max_retries=3
+                tier=tier
             )
 
-            # get token usages.
-            token_usage = get_token_usage_from_message(response)
+            # get token usages (and record them in usage ledger).
+            token_usage = self._record_usage(response=response, node='actor', tier=tier)
 
             # update agent state
             return {
@@ -69,20 +78,19 @@ class ReActAgent(BaseAgent):
         # =============================================================================
         def _tools(state: ReActState):
             last_msg: AIMessage = state['messages'][-1]
-            tool_messages = []
-
-            for tool_call in last_msg.tool_calls:
-                if tool_call['name'] == 'action_tool':
-                    try:
-                        tool_message: ToolMessage = ToolMessage(
-                            content=action_tool.invoke(tool_call['args']),
-                            tool_call_id=tool_call['id']
-                        )
-                        tool_messages.append(tool_message)
-                    except Exception as error:
-                        raise error
-
-            return {'messages' : tool_messages}
+
+            # read-only calls (api doc lookups) run concurrently, mutating calls run serially. order is kept.
+            tool_messages: Sequence[ToolMessage] = self._run_tool_calls(
+                message=last_msg,
+                action_tool=action_tool
+            )
+
+            # completion is tracked in state, so should_continue never scans message history
+            return {
+                'messages' : tool_messages,
+                'task_completed' : self._is_task_completed(last_msg.tool_calls, tool_messages),
+                'consecutive_errors' : self._count_consecutive_errors(state, tool_messages)
+            }
         # =============================================================================
         
         return _tools
@@ -96,16 +104,14 @@ class ReActAgent(BaseAgent):
         # =============================================================================
         def _should_continue(state: ReActState):
 
-            for msg in reversed(state['messages']):
-                if isinstance(msg, AIMessage):
-                    last_ai_msg = msg
-                    break
-            
-            if hasattr(last_ai_msg, 'tool_calls') and last_ai_msg.tool_calls:
-                for tool_call in last_ai_msg.tool_calls:
-                    if 'complete_task' in tool_call['args']['code']:
-                        return 'end'
-                
+            # cut off gracefully when budget is exhausted (reason is recorded in budget controller)
+            if self.budget.exceeded():
+                return 'end'
+
+            # task completed by last executed code (AppWorld state, not text of generated code)
+            if state.get('task_completed', False):
+                return 'end'
+
             return 'actor'
         # =============================================================================
 
@@ -148,4 +154,4 @@ class ReActAgent(BaseAgent):
         )
 
         # compile graph and return CompiledStateGraph instance
-        return workflow.compile()
\ No newline at end of file
+        return workflow.compile(checkpointer=self.checkpointer)
\ No newline at end of file
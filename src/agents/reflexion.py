@@ -3,21 +3,32 @@ from .react import ReActAgent
 from ..prompt.reflexion import (
     ACTOR_SYSTEM_PROMPT,
     REFLECTOR_SYSTEM_PROMPT,
+    REFLECTOR_BATCH_SYSTEM_PROMPT,
     ACTOR_INPUT_PROMPT,
     REFLECTOR_INPUT_PROMPT
 )
 from ..state import ReActState, ReflexionState
-from ..utils.llm import get_response_with_retry
-from ..utils.token_usage import get_token_usage_from_message
+from ..core.evaluation import EvaluationResult
+from ..core.reflection_store import ReflectionStore
+from ..utils.messages import MessageLog, render_trajectory
+from ..utils.token_usage import UsageLedger
+from ..utils.budget import BudgetController
+from ..prompt.registry import PromptTemplate
+from ..core.router import ModelRouter, classify_step
+from ..core.batch import BatchQueue
 
 from appworld import AppWorld
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, List, Sequence
 
-from langchain_openai import ChatOpenAI
 from langchain.messages import AnyMessage, SystemMessage, AIMessage, HumanMessage, ToolMessage
 
 from langgraph.graph.state import CompiledStateGraph
 from langgraph.graph import StateGraph, START, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+
+def format_reflections(reflections: Sequence[str]) -> str:
+    return "".join(f"{i+1}. {reflection}\n\n" for i, reflection in enumerate(reflections))
 
 
 # -------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -38,18 +49,27 @@ class ReflectorModule(BaseAgent):
         def _actor(state: ReActState):
 
             # add system message in message history
-            messages: Sequence[AnyMessage] = state['messages']
-            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt)] + messages
+            messages: MessageLog = state['messages']
+            request_messages: Sequence[AnyMessage] = [SystemMessage(content=self.system_prompt), *messages]
+
+            # count agent step for budget controller
+            self.budget.step()
+
+            # model tier of this step (escalates after error observations and failed attempts of the task)
+            model_client, tier = self._route(
+                step_type=classify_step(messages),
+                failures=state.get('consecutive_errors', 0) + state.get('failed_attempts', 0)
+            )
 
             # get response from llm client
-            response: AIMessage = get_response_with_retry(
-                model_client=self.openai_client_with_tools,
+            response: AIMessage = self._get_action_response(
+                model_client=model_client,
                 messages=request_messages,
-                max_retries=3
+                tier=tier
             )
 
-            # get token usages
-            token_usage = get_token_usage_from_message(response)
+            # get token usages (and record them in usage ledger)
+            token_usage = self._record_usage(response=response, node='actor', tier=tier)
 
             # update agent state
             return {
@@ -75,20 +95,17 @@ class ReflectorModule(BaseAgent):
         # =============================================================================
         def _tools(state: ReActState):
             last_msg: AIMessage = state['messages'][-1]
-            tool_messages = []
-
-            for tool_call in last_msg.tool_calls:
-                if tool_call['name'] == 'action_tool':
-                    try:
-                        tool_message: ToolMessage = ToolMessage(
-                            content=action_tool.invoke(tool_call['args']),
-                            tool_call_id=tool_call['id']
-                        )
-                        tool_messages.append(tool_message)
-                    except Exception as error:
-                        raise error
-                    
-            return {'messages' : tool_messages}
+
+            # read-only calls (api doc lookups) run concurrently, mutating calls run serially. order is kept.
+            tool_messages: Sequence[ToolMessage] = self._run_tool_calls(
+                message=last_msg,
+                action_tool=action_tool
+            )
+
+            return {
+                'messages' : tool_messages,
+                'consecutive_errors' : self._count_consecutive_errors(state, tool_messages)
+            }
         # =============================================================================
         
         return _tools
@@ -103,6 +120,10 @@ class ReflectorModule(BaseAgent):
         def _should_continue(state:ReActState):
             last_msg:AIMessage = state['messages'][-1]
 
+            if self.budget.exceeded():
+                self._abandon_tool_calls(last_msg)     # read-only calls dispatched while streaming
+                return 'end'
+
             if hasattr(last_msg, 'tool_calls') and last_msg.tool_calls:
                 return 'tools'
             else:
@@ -147,7 +168,7 @@ class ReflectorModule(BaseAgent):
         workflow.add_edge("tools", "actor")
 
         # compile graph and return CompiledStateGraph instance
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
 
 
 
@@ -165,22 +186,46 @@ class ReflexionAgent(BaseAgent):
     def __init__(
         self,
         env: AppWorld,
-        actor_system_prompt: str = ACTOR_SYSTEM_PROMPT,
-        reflector_system_prompt: str = REFLECTOR_SYSTEM_PROMPT,
+        actor_system_prompt: str | PromptTemplate = ACTOR_SYSTEM_PROMPT,
+        reflector_system_prompt: str | PromptTemplate = REFLECTOR_SYSTEM_PROMPT,
         model_config: dict[str, Any] = {
             'model' : 'gpt-4o',
             'temperature' : 0.0,
             'stream_usage' : True
-        }
+        },
+        ledger: UsageLedger = None,
+        budget: BudgetController = None,
+        reflection_store: ReflectionStore = None,
+        name: str = 'reflexion',
+        checkpointer: BaseCheckpointSaver = None,
+        thread_id: str = None,
+        router: ModelRouter = None,
+        batch_queue: BatchQueue = None,
+        frozen: bool = False
     ):
         self.env = env
-        self.actor_system_prompt = actor_system_prompt
-        self.reflector_system_prompt: str = reflector_system_prompt
+        self.actor_system_prompt: str = str(actor_system_prompt)
+        self.reflector_system_prompt: str = str(reflector_system_prompt)
         self.model_config = model_config
+        self.router = router if router is not None else ModelRouter.single(model_config)
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.budget = budget if budget is not None else BudgetController(ledger=self.ledger)
+        self.name = name
+        self.checkpointer = checkpointer
+        self.thread_id = thread_id
+
+        # reflections carried over from previous tasks (only top-k relevant ones go into actor prompt)
+        self.reflection_store = reflection_store
+
+        # offline batch mode (optional) : reflection of failed task is deferred to batch api and added to
+        # reflection store when it arrives. the task itself is not retried.
+        self.batch_queue = batch_queue
+
+        # frozen reflection set (inference) : actor only, reflections are retrieved lexically (no embedding model)
+        self.frozen = frozen
 
         self.tool_list = self._get_tool_list()
-        self.openai_client = ChatOpenAI(**model_config)
-        self.openai_client_with_tools = self.openai_client.bind_tools(self.tool_list)
+        self.openai_client_with_tools = self.router.get_client('default', tools=self.tool_list)
 
         self.agent = self._build_agent()
 
@@ -190,22 +235,30 @@ class ReflexionAgent(BaseAgent):
     def _get_actor_node(self) -> Callable:
         actor: CompiledStateGraph = ReActAgent(
             env=self.env,
-            system_prompt=ACTOR_SYSTEM_PROMPT,
-            model_config=self.model_config
+            system_prompt=self.actor_system_prompt,
+            model_config=self.model_config,
+            ledger=self.ledger,
+            budget=self.budget,
+            name='actor',
+            checkpointer=False,
+            router=self.router
         )
 
+        # reflections of previous tasks relevant to current task (retrieved once per task)
+        retrieved_reflections: List[str] = []
+        if self.reflection_store is not None:
+            retrieved_reflections = self.reflection_store.retrieve(self.env.task.instruction, ledger=self.ledger, lexical=self.frozen)
+
         # Actor node
         # ==========================================================================================
         def _actor(state: ReflexionState):
 
-            reflection_history = ""
-            for i, reflection in enumerate(state['reflections']):
-                reflection_history += f"{i+1}. {reflection}\n\n"
+            reflection_history = format_reflections(retrieved_reflections + list(state['reflections']))
 
             result: ReActState = actor.invoke({
                 'messages' : [
                     HumanMessage(
-                        content=ACTOR_INPUT_PROMPT.format(
+                        content=ACTOR_INPUT_PROMPT.render(
                             first_name = self.env.task.supervisor.first_name,
                             last_name = self.env.task.supervisor.last_name,
                             email = self.env.task.supervisor.email,
@@ -214,7 +267,8 @@ class ReflexionAgent(BaseAgent):
                             reflection_history = reflection_history
                         )
                     )
-                ]
+                ],
+                'failed_attempts' : len(state['reflections'])
             })
 
             return {
@@ -235,44 +289,10 @@ class ReflexionAgent(BaseAgent):
         # Evaluator Node
         # ==========================================================================================
         def _evaluator(state: ReflexionState):
-            # get task evaluation result
-            eval_result = self.env.evaluate()
-
-            evaluation_report = ""
-
-            # get task requirement information
-            # total requirement count
-            total_requirement_count = eval_result.total_count
-            passed_requirement_count = eval_result.pass_count
-            failed_requirement_count = eval_result.fail_count
-
-            evaluation_report += f"Task Status : {'Succeed' if (eval_result.pass_count == eval_result.total_count) else 'Failed'}\n---\n\n"
-
-
-            evaluation_report += f"Task Requirement Count:\n- total requirements : {total_requirement_count}\n- passed requirements : {passed_requirement_count}\n- failed requirements : {failed_requirement_count}\n---\n\n"
-
-            if passed_requirement_count > 0:
-                evaluation_report += "Detail of passed requirments: \n"
-                for passed_requirement in eval_result.passes:
-                    evaluation_report += str({
-                        'requirement' : passed_requirement['requirement'],
-                        'label' : passed_requirement['label']
-                    })
-                    evaluation_report += "\n"
-                evaluation_report += "---\n\n"
-
-
-            if failed_requirement_count > 0:
-                evaluation_report += "Detail of failed requirments: \n"
-                for failed_requirement in eval_result.failures:
-                    evaluation_report += str({
-                        'requirement' : failed_requirement['requirement'],
-                        'failed_reason' : failed_requirement['trace']
-                    })
-                    evaluation_report += "\n"
-                evaluation_report += "---\n\n"
+            # get task evaluation result (report text is rendered lazily, only when reflector needs it)
+            evaluation = EvaluationResult.from_env(self.env)
             
-            return {'evaluation' : evaluation_report}
+            return {'evaluation' : evaluation}
         # ==========================================================================================
         
 
@@ -287,7 +307,12 @@ class ReflexionAgent(BaseAgent):
         reflector = ReflectorModule(
             env=self.env,
             system_prompt=self.reflector_system_prompt,
-            model_config=self.model_config
+            model_config=self.model_config,
+            ledger=self.ledger,
+            budget=self.budget,
+            name='reflector',
+            checkpointer=False,
+            router=self.router
         )
 
         # Refelctor Node
@@ -296,18 +321,19 @@ class ReflexionAgent(BaseAgent):
             result: ReActState = reflector.invoke({
                 'messages' : [
                     HumanMessage(
-                        content = REFLECTOR_INPUT_PROMPT.format(
+                        content = REFLECTOR_INPUT_PROMPT.render(
                             first_name = self.env.task.supervisor.first_name,
                             last_name = self.env.task.supervisor.last_name,
                             email = self.env.task.supervisor.email,
                             phone_number = self.env.task.supervisor.phone_number,
                             instruction = self.env.task.instruction,
-                            evaluation_report = state['evaluation'],
-                            reflection_history = state['reflections'],
-                            trajectory = state['trajectory']
+                            evaluation_report = state['evaluation'].to_report(),
+                            reflection_history = format_reflections(state['reflections']),
+                            trajectory = render_trajectory(state['trajectory'])
                         )
                     )
-                ]
+                ],
+                'failed_attempts' : len(state['reflections'])
             })
 
             return {
@@ -319,6 +345,49 @@ class ReflexionAgent(BaseAgent):
         # ==========================================================================================
 
         return _reflector
+
+    # -----------------------------------------------------------------------------------------------
+    # Define Deferred Reflector Node (offline batch mode)
+    # -----------------------------------------------------------------------------------------------
+    def _get_deferred_reflector_node(self) -> Callable:
+
+        reflection_store = self.reflection_store
+        batch_queue = self.batch_queue
+
+        def _on_reflection(reflection: str) -> None:
+            if reflection_store is not None and reflection.strip():
+                reflection_store.add(reflection, ledger=batch_queue.ledger)
+
+        # Deferred Reflector Node
+        # ==========================================================================================
+        def _deferred_reflector(state: ReflexionState):
+            # reflector gets no tools here : the environment is closed long before the batch result arrives
+            request_messages: Sequence[AnyMessage] = [
+                SystemMessage(content=str(REFLECTOR_BATCH_SYSTEM_PROMPT)),
+                HumanMessage(
+                    content = REFLECTOR_INPUT_PROMPT.render(
+                        first_name = self.env.task.supervisor.first_name,
+                        last_name = self.env.task.supervisor.last_name,
+                        email = self.env.task.supervisor.email,
+                        phone_number = self.env.task.supervisor.phone_number,
+                        instruction = self.env.task.instruction,
+                        evaluation_report = state['evaluation'].to_report(),
+                        reflection_history = format_reflections(state['reflections']),
+                        trajectory = render_trajectory(state['trajectory'])
+                    )
+                )
+            ]
+
+            batch_queue.submit(
+                node=f"{self.name}/reflector",
+                tier=self.router.route('reflector', failures=len(state['reflections'])),
+                messages=request_messages,
+                on_result=_on_reflection
+            )
+            return {}
+        # ==========================================================================================
+
+        return _deferred_reflector
     
     # -----------------------------------------------------------------------------------------------
     # Define conditional edge (should continue reflexion loop)
@@ -330,11 +399,17 @@ class ReflexionAgent(BaseAgent):
         def _should_continue(state: ReflexionState):
             
             max_retries = 3
-            if len(state['reflections']) == max_retries:
+            if self.budget.exceeded():
+                return 'end'
+
+            elif len(state['reflections']) == max_retries:
                 return 'end'
             
-            elif "Succeed" in state['evaluation']:
+            elif state['evaluation'].success:
                 return 'end'
+
+            elif self.batch_queue is not None:
+                return 'deferred_reflector'
             
             return 'reflector'
         # ==========================================================================================
@@ -345,12 +420,16 @@ class ReflexionAgent(BaseAgent):
     # Define Reflexion Workflow
     # -----------------------------------------------------------------------------------------------
     def _build_agent(self) -> CompiledStateGraph:
+        if self.frozen:
+            return self._build_frozen_agent()
+
         # --------------------------------------------
         # Get Nodes
         # --------------------------------------------
         _actor = self._get_actor_node()
         _evaluator = self._get_evaluator_node()
         _reflector = self._get_reflector_node()
+        _deferred_reflector = self._get_deferred_reflector_node() if self.batch_queue is not None else None
 
         # --------------------------------------------
         # Get conditional edge
@@ -366,21 +445,45 @@ class ReflexionAgent(BaseAgent):
         workflow.add_node("actor", _actor)
         workflow.add_node("evaluator", _evaluator)
         workflow.add_node("reflector", _reflector)
+        if _deferred_reflector is not None:
+            workflow.add_node("deferred_reflector", _deferred_reflector)
 
         # add edge
         workflow.add_edge(START, "actor")
         workflow.add_edge("actor", "evaluator")
+        evaluator_routes = {
+            "reflector" : "reflector",
+            "end" : END
+        }
+        if _deferred_reflector is not None:
+            evaluator_routes["deferred_reflector"] = "deferred_reflector"
+            workflow.add_edge("deferred_reflector", END)
         workflow.add_conditional_edges(
             "evaluator",
             _should_continue,
+            evaluator_routes
+        )
+        workflow.add_conditional_edges(
+            "reflector",
+            self._get_budget_edge("actor"),
             {
-                "reflector" : "reflector",
+                "actor" : "actor",
                 "end" : END
             }
         )
-        workflow.add_edge("reflector", "actor")
 
         # compile graph
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
 
     
+
+    def _build_frozen_agent(self) -> CompiledStateGraph:
+        # single attempt : no evaluator (needs ground truth) and no reflector
+        workflow = StateGraph(ReflexionState)
+
+        workflow.add_node("actor", self._get_actor_node())
+
+        workflow.add_edge(START, "actor")
+        workflow.add_edge("actor", END)
+
+        return workflow.compile(checkpointer=self.checkpointer)
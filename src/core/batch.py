@@ -0,0 +1,307 @@
+import json
+import os
+import time
+import uuid
+from threading import Lock
+from typing import Any, Callable, Dict, List, Sequence, Type
+
+from pydantic import BaseModel
+
+from langchain.messages import AnyMessage, HumanMessage, SystemMessage
+
+from .router import ModelRouter
+from ..utils.token_usage import UsageLedger
+from ..utils.structured import parse_response
+from ..prompt.structured import REASK_SYSTEM_PROMPT, REASK_INPUT_PROMPT
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+# message type of langchain -> role of chat completions api
+_ROLES = {'system' : 'system', 'human' : 'user', 'ai' : 'assistant'}
+
+
+def to_openai_messages(messages: Sequence[AnyMessage]) -> List[Dict[str, str]]:
+    return [{'role' : _ROLES[message.type], 'content' : f"{message.content}"} for message in messages]
+
+
+def get_response_format(schema: Type[BaseModel]) -> Dict[str, Any]:
+    # same strict json schema output as `with_structured_output(method='json_schema', strict=True)`
+    return {
+        'type' : 'json_schema',
+        'json_schema' : {'name' : schema.__name__, 'schema' : schema.model_json_schema(), 'strict' : True}
+    }
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Batch backends (submit request lines as one job, retrieve result lines when the job is done)
+# ------------------------------------------------------------------------------------------------------------------
+class OpenAIBatchBackend:
+    """
+    OpenAI Batch API : request lines are uploaded as a JSONL file and processed within `completion_window`
+    at discounted price. Input files are kept in `work_dir`.
+    """
+    discounted = True
+
+    def __init__(
+        self,
+        work_dir: str = './batch_jobs',
+        completion_window: str = '24h',
+        client: Any = None
+    ) -> None:
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI()
+
+        self.client = client
+        self.work_dir = work_dir
+        self.completion_window = completion_window
+        os.makedirs(work_dir, exist_ok=True)
+
+    def submit(self, requests: Sequence[Dict[str, Any]]) -> str:
+        path = os.path.join(self.work_dir, f"{uuid.uuid4()}.jsonl")
+        with open(path, 'w', encoding='utf-8') as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+
+        with open(path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose='batch')
+        job = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window
+        )
+        return job.id
+
+    def retrieve(self, job_id: str) -> List[Dict[str, Any]] | None:
+        """
+        Result lines of finished job (failed requests included), or None while the job is running.
+        """
+        job = self.client.batches.retrieve(job_id)
+        if job.status in ('validating', 'in_progress', 'finalizing', 'cancelling'):
+            return None
+
+        results: List[Dict[str, Any]] = []
+        for file_id in (job.output_file_id, job.error_file_id):
+            if file_id is None:
+                continue
+            content = self.client.files.content(file_id).text
+            results.extend(json.loads(line) for line in content.splitlines() if line.strip())
+        return results
+
+
+class LocalBatchBackend:
+    """
+    Local stand-in of batch api. Jobs are processed on first `retrieve` by `handler` (request body ->
+    chat completion body), which defaults to a regular (full price) chat completions call.
+    """
+    discounted = False
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], Dict[str, Any]] = None
+    ) -> None:
+        self.handler = handler if handler is not None else self._complete
+        self.jobs: Dict[str, Sequence[Dict[str, Any]]] = {}
+        self._client = None
+
+    def _complete(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client.chat.completions.create(**body).model_dump()
+
+    def submit(self, requests: Sequence[Dict[str, Any]]) -> str:
+        job_id = f"local-{uuid.uuid4()}"
+        self.jobs[job_id] = list(requests)
+        return job_id
+
+    def retrieve(self, job_id: str) -> List[Dict[str, Any]] | None:
+        results: List[Dict[str, Any]] = []
+        for request in self.jobs.pop(job_id):
+            try:
+                response, error = {'status_code' : 200, 'body' : self.handler(request['body'])}, None
+            except Exception as exception:
+                response, error = None, {'code' : type(exception).__name__, 'message' : f"{exception}"}
+            results.append({'custom_id' : request['custom_id'], 'response' : response, 'error' : error})
+        return results
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Batch queue
+# ------------------------------------------------------------------------------------------------------------------
+class BatchQueue:
+    """
+    Queue of deferred LLM calls that are not latency-sensitive (offline reflector / curator calls).
+
+    - `submit` only queues the request. Requests of many tasks are sent as one job when `max_batch_size`
+      requests are queued (or on `flush`).
+    - `poll` applies the results of finished jobs through the `on_result` callback of each request.
+      Callbacks may submit follow-up requests (e.g. curator call on a reflection). Structured output
+      that fails validation is re-asked in a later job, with only the error and the previous output.
+    - token usage is recorded in `ledger` with call type 'batch' (discounted price) when the backend is
+      discounted, 'sync' (full price) otherwise.
+    """
+    def __init__(
+        self,
+        backend: OpenAIBatchBackend | LocalBatchBackend,
+        router: ModelRouter,
+        ledger: UsageLedger = None,
+        max_batch_size: int = 100,
+        poll_interval: float = 30.0,
+        max_reasks: int = 1
+    ) -> None:
+        self.backend = backend
+        self.router = router
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.max_batch_size = max_batch_size
+        self.poll_interval = poll_interval
+        self.max_reasks = max_reasks
+
+        self._queued: List[Dict[str, Any]] = []                 # request lines not sent yet
+        self._requests: Dict[str, Dict[str, Any]] = {}          # custom id -> request info (until result is applied)
+        self._jobs: Dict[str, List[str]] = {}                   # job id -> custom ids of its requests
+        self._lock = Lock()
+        self._poll_lock = Lock()        # one poller at a time (workers poll between their tasks)
+
+    def __len__(self) -> int:
+        # number of requests whose result is not applied yet
+        with self._lock:
+            return len(self._requests)
+
+    def submit(
+        self,
+        node: str,
+        tier: str,
+        messages: Sequence[AnyMessage],
+        on_result: Callable[[Any], None],
+        schema: Type[BaseModel] = None,
+        reasks: int = 0
+    ) -> str:
+        """
+        Queue one chat request. `on_result` receives the parsed `schema` instance, or response text without schema.
+        """
+        model_config = self.router.tiers[tier]
+        body = {
+            'model' : model_config['model'],
+            'messages' : to_openai_messages(messages)
+        }
+        if 'temperature' in model_config:
+            body['temperature'] = model_config['temperature']
+        if schema is not None:
+            body['response_format'] = get_response_format(schema)
+
+        custom_id = f"{node}/{uuid.uuid4()}"
+        with self._lock:
+            self._queued.append({'custom_id' : custom_id, 'method' : 'POST', 'url' : BATCH_ENDPOINT, 'body' : body})
+            self._requests[custom_id] = {'node' : node, 'tier' : tier, 'on_result' : on_result, 'schema' : schema, 'reasks' : reasks}
+            full = len(self._queued) >= self.max_batch_size
+        if full:
+            self.flush()
+        return custom_id
+
+    def flush(self) -> None:
+        with self._lock:
+            queued, self._queued = self._queued, []
+        if queued:
+            job_id = self.backend.submit(queued)
+            with self._lock:
+                self._jobs[job_id] = [request['custom_id'] for request in queued]
+
+    def _apply(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            request = self._requests.pop(result['custom_id'], None)
+        if request is None:
+            return
+
+        response = result.get('response') or {}
+        if result.get('error') or response.get('status_code') != 200:
+            print(f"[BatchQueue] ⚠️ Request '{result['custom_id']}' failed : {result.get('error') or response.get('body')}")
+            return
+
+        body = response['body']
+        usage = body.get('usage') or {}
+        self.ledger.record(
+            model=self.router.model(request['tier']),
+            node=request['node'],
+            call_type='batch' if self.backend.discounted else 'sync',
+            input_tokens=usage.get('prompt_tokens', 0),
+            output_tokens=usage.get('completion_tokens', 0),
+            cached_input_tokens=(usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0,
+            tier=request['tier']
+        )
+
+        output = body['choices'][0]['message'].get('content') or ""
+        if request['schema'] is None:
+            request['on_result'](output)
+            return
+
+        parsed, error = parse_response(output, request['schema'])
+        if parsed is not None:
+            request['on_result'](parsed)
+        elif request['reasks'] < self.max_reasks:
+            self.submit(
+                node=request['node'],
+                tier=request['tier'],
+                messages=[
+                    SystemMessage(content=str(REASK_SYSTEM_PROMPT)),
+                    HumanMessage(content=REASK_INPUT_PROMPT.render(error=error, output=output))
+                ],
+                on_result=request['on_result'],
+                schema=request['schema'],
+                reasks=request['reasks'] + 1
+            )
+        else:
+            print(f"[BatchQueue] ⚠️ Invalid {request['schema'].__name__} of '{result['custom_id']}' dropped :\n{error}")
+
+    def poll(self) -> int:
+        """
+        Apply results of finished jobs and return the number of applied results.
+        """
+        if not self._poll_lock.acquire(blocking=False):
+            return 0        # another worker is polling right now
+        try:
+            return self._poll()
+        finally:
+            self._poll_lock.release()
+
+    def _poll(self) -> int:
+        with self._lock:
+            jobs = list(self._jobs)
+
+        num_applied = 0
+        for job_id in jobs:
+            results = self.backend.retrieve(job_id)
+            if results is None:
+                continue
+            with self._lock:
+                custom_ids = self._jobs.pop(job_id)
+            for result in results:
+                try:
+                    self._apply(result)
+                except Exception as error:
+                    # one broken result must not lose the rest of the job
+                    print(f"[BatchQueue] ⚠️ Failed to apply '{result.get('custom_id')}' : {type(error).__name__}: {error}")
+                num_applied += 1
+
+            # requests without result line (expired / cancelled job) are dropped
+            with self._lock:
+                missing = [custom_id for custom_id in custom_ids if self._requests.pop(custom_id, None) is not None]
+            if missing:
+                print(f"[BatchQueue] ⚠️ Job '{job_id}' ended without result of {len(missing)} requests.")
+        return num_applied
+
+    def drain(self, timeout: float = None) -> None:
+        """
+        Send every queued request and apply results (follow-up requests included) until nothing is left.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.flush()
+            if self.poll() > 0:
+                continue        # follow-up requests of applied results are sent right away
+            with self._lock:
+                if not self._jobs and not self._queued:
+                    return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"{len(self)} batch requests are not applied within {timeout}s.")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,529 @@
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata
+)
+
+from .playbook import PlayBook
+from .evaluation import EvaluationResult
+from ..utils.messages import MessageLog
+from ..utils.tools import is_read_only_code
+
+# payloads smaller than this are stored uncompressed (zlib header / cpu time is not worth it)
+COMPRESS_MIN_BYTES = 1024
+# every n-th message log segment is stored in full, so loading a channel never walks a long chain
+FULL_MESSAGES_INTERVAL = 50
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# SQLite delta checkpointer
+# ------------------------------------------------------------------------------------------------------------------
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Durable LangGraph checkpointer backed by a local SQLite file (WAL mode).
+
+    - Deltas only : a checkpoint row keeps channel versions, and channel values are only written for
+      channels updated at that step (`new_versions`). An append-only `MessageLog` is written as the
+      segment of messages appended since its previous version, so a step costs O(new messages)
+      instead of O(trajectory).
+    - Compression : payloads over `COMPRESS_MIN_BYTES` are zlib compressed (level 1).
+    - Execution journal : checkpoints restore agent state but not AppWorld state. Every mutating
+      `env.execute` call is journaled (`JournaledEnvironment`), and `resume_journal` returns the code
+      to replay on a fresh environment before resuming from the last checkpoint.
+
+    `seconds` accumulates time spent writing checkpoints (`thread_seconds` per thread), to keep an eye
+    on checkpoint overhead.
+    """
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 30.0
+    ) -> None:
+        super().__init__()
+        self.path = path
+        self.timeout = timeout
+        self.seconds = 0.0
+        self._thread_seconds: Dict[str, float] = {}
+
+        # sqlite connection can not be shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        # last stored message log of each (thread_id, checkpoint_ns, channel) : (version, log, depth)
+        self._logs: Dict[Tuple[str, str, str], Tuple[str, MessageLog, int]] = {}
+        # number of journaled executions of each thread
+        self._journal_lengths: Dict[str, int] = {}
+
+        connection = self._get_connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                checkpoint_type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                journal_length INTEGER NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                channel TEXT NOT NULL,
+                version TEXT NOT NULL,
+                type TEXT NOT NULL,
+                base_version TEXT,
+                depth INTEGER NOT NULL DEFAULT 0,
+                data BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT NOT NULL,
+                data BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            CREATE TABLE IF NOT EXISTS journal (
+                thread_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                code TEXT NOT NULL,
+                PRIMARY KEY (thread_id, seq)
+            );
+        """)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # --------------------------------------------------------------------------------------------------------
+    # Encoding (type tag + optional zlib)
+    # --------------------------------------------------------------------------------------------------------
+    def _dumps(self, value: Any) -> Tuple[str, bytes]:
+        if isinstance(value, MessageLog):
+            type_, data = self.serde.dumps_typed(list(value))
+            type_ = f"messages:{type_}"
+        elif isinstance(value, PlayBook):
+            type_, data = self.serde.dumps_typed({'playbook' : value.to_dict(), 'version' : value.version})
+            type_ = f"playbook:{type_}"
+        elif isinstance(value, EvaluationResult):
+            type_, data = self.serde.dumps_typed({
+                'total_count' : value.total_count,
+                'pass_count' : value.pass_count,
+                'fail_count' : value.fail_count,
+                'passes' : value.passes,
+                'failures' : value.failures
+            })
+            type_ = f"evaluation:{type_}"
+        else:
+            type_, data = self.serde.dumps_typed(value)
+
+        if data is not None and len(data) >= COMPRESS_MIN_BYTES:
+            return f"z:{type_}", zlib.compress(data, 1)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z:"):
+            type_, data = type_[2:], zlib.decompress(data)
+
+        kind, _, serde_type = type_.partition(":")
+        if kind == 'messages':
+            return MessageLog(self.serde.loads_typed((serde_type, data)))
+        elif kind == 'playbook':
+            value = self.serde.loads_typed((serde_type, data))
+            return PlayBook.from_dict(value['playbook'], version=value['version'])
+        elif kind == 'evaluation':
+            return EvaluationResult(**self.serde.loads_typed((serde_type, data)))
+        return self.serde.loads_typed((type_, data))
+
+    # --------------------------------------------------------------------------------------------------------
+    # Channel values
+    # --------------------------------------------------------------------------------------------------------
+    def _put_blob(
+        self,
+        connection: sqlite3.Connection,
+        thread_id: str,
+        checkpoint_ns: str,
+        channel: str,
+        version: Any,
+        value: Any
+    ) -> None:
+        key = (thread_id, checkpoint_ns, channel)
+        base_version, depth = None, 0
+
+        if isinstance(value, MessageLog):
+            previous = self._logs.get(key)
+            if previous is not None and value.extends(previous[1]) and previous[2] + 1 < FULL_MESSAGES_INTERVAL:
+                # store only messages appended since previous version of this channel
+                base_version, depth = previous[0], previous[2] + 1
+                type_, data = self._dumps(value[len(previous[1]):])
+                type_ = f"segment:{type_}"
+            else:
+                type_, data = self._dumps(value)
+            self._logs[key] = (str(version), value, depth)
+        else:
+            type_, data = self._dumps(value)
+
+        connection.execute(
+            "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, base_version, depth, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, channel, str(version), type_, base_version, depth, data)
+        )
+
+    def _load_blobs(
+        self,
+        connection: sqlite3.Connection,
+        thread_id: str,
+        checkpoint_ns: str,
+        versions: ChannelVersions
+    ) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        for channel, version in versions.items():
+            row = connection.execute(
+                "SELECT type, base_version, depth, data FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if row is None or row[0] == 'empty':
+                continue
+
+            type_, base_version, depth, data = row
+            if not type_.startswith("segment:"):
+                values[channel] = self._loads(type_, data)
+                continue
+
+            # message log segment : walk back to the last full log, then append segments in order
+            segments: List[Sequence[Any]] = [self._loads(type_[len("segment:"):], data)]
+            while base_version is not None:
+                type_, base_version, data = connection.execute(
+                    "SELECT type, base_version, data FROM blobs "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                    (thread_id, checkpoint_ns, channel, base_version)
+                ).fetchone()
+                if type_.startswith("segment:"):
+                    type_ = type_[len("segment:"):]
+                segments.append(self._loads(type_, data))
+
+            log = MessageLog()
+            for segment in reversed(segments):
+                log = log.appended(segment)
+            values[channel] = log
+
+            # next write of this channel (after resume) is a segment on top of the loaded log
+            with self._lock:
+                self._logs[(thread_id, checkpoint_ns, channel)] = (str(version), log, depth)
+
+        return values
+
+    # --------------------------------------------------------------------------------------------------------
+    # BaseCheckpointSaver interface
+    # --------------------------------------------------------------------------------------------------------
+    def _to_tuple(
+        self,
+        connection: sqlite3.Connection,
+        row: Tuple[str, str, str, str, str, bytes, str, bytes]
+    ) -> CheckpointTuple:
+        (
+            thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+            checkpoint_type, checkpoint_data, metadata_type, metadata_data
+        ) = row
+        checkpoint: Checkpoint = self._loads(checkpoint_type, checkpoint_data)
+
+        writes = connection.execute(
+            "SELECT task_id, channel, type, data FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+
+        return CheckpointTuple(
+            config={
+                'configurable' : {
+                    'thread_id' : thread_id,
+                    'checkpoint_ns' : checkpoint_ns,
+                    'checkpoint_id' : checkpoint_id
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                'channel_values' : self._load_blobs(connection, thread_id, checkpoint_ns, checkpoint['channel_versions'])
+            },
+            metadata=self._loads(metadata_type, metadata_data),
+            pending_writes=[(task_id, channel, self._loads(type_, data)) for task_id, channel, type_, data in writes],
+            parent_config=(
+                {
+                    'configurable' : {
+                        'thread_id' : thread_id,
+                        'checkpoint_ns' : checkpoint_ns,
+                        'checkpoint_id' : parent_checkpoint_id
+                    }
+                }
+                if parent_checkpoint_id else None
+            )
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        connection = self._get_connection()
+
+        columns = (
+            "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "checkpoint_type, checkpoint, metadata_type, metadata"
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            row = connection.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id)
+            ).fetchone()
+        else:
+            row = connection.execute(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns)
+            ).fetchone()
+
+        return None if row is None else self._to_tuple(connection, row)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: Dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "checkpoint_type, checkpoint, metadata_type, metadata FROM checkpoints WHERE 1 = 1"
+        )
+        params: List[Any] = []
+        if config is not None:
+            query += " AND thread_id = ?"
+            params.append(config['configurable']['thread_id'])
+            if config['configurable'].get('checkpoint_ns') is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(config['configurable']['checkpoint_ns'])
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before is not None and (before_checkpoint_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_checkpoint_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        connection = self._get_connection()
+        for row in connection.execute(query, params).fetchall():
+            if limit is not None and limit <= 0:
+                break
+            checkpoint_tuple = self._to_tuple(connection, row)
+            if filter and not all(checkpoint_tuple.metadata.get(key) == value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        start = time.perf_counter()
+
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint = checkpoint.copy()
+        values: Dict[str, Any] = checkpoint.pop('channel_values')
+
+        checkpoint_type, checkpoint_data = self._dumps(checkpoint)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+
+        connection = self._get_connection()
+        with self._lock:
+            connection.execute("BEGIN")
+            try:
+                # only channels updated at this step are written
+                for channel, version in new_versions.items():
+                    if channel in values:
+                        self._put_blob(connection, thread_id, checkpoint_ns, channel, version, values[channel])
+                    else:
+                        connection.execute(
+                            "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, data) "
+                            "VALUES (?, ?, ?, ?, 'empty', NULL)",
+                            (thread_id, checkpoint_ns, channel, str(version))
+                        )
+                connection.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id, checkpoint_ns, checkpoint['id'], config['configurable'].get('checkpoint_id'),
+                        checkpoint_type, checkpoint_data, metadata_type, metadata_data,
+                        self._get_journal_length(thread_id)
+                    )
+                )
+                connection.execute("COMMIT")
+            except Exception as error:
+                connection.execute("ROLLBACK")
+                raise error
+
+        self._add_seconds(thread_id, time.perf_counter() - start)
+        return {
+            'configurable' : {
+                'thread_id' : thread_id,
+                'checkpoint_ns' : checkpoint_ns,
+                'checkpoint_id' : checkpoint['id']
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ''
+    ) -> None:
+        start = time.perf_counter()
+
+        thread_id = config['configurable']['thread_id']
+        checkpoint_ns = config['configurable'].get('checkpoint_ns', '')
+        checkpoint_id = config['configurable']['checkpoint_id']
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dumps(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                channel, type_, data, task_path
+            ))
+
+        # special writes (errors, interrupts) replace previous ones, regular writes are written once
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        connection = self._get_connection()
+        with self._lock:
+            connection.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+        self._add_seconds(thread_id, time.perf_counter() - start)
+
+    def _add_seconds(self, thread_id: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds += seconds
+            self._thread_seconds[thread_id] = self._thread_seconds.get(thread_id, 0.0) + seconds
+
+    def thread_seconds(self, thread_id: str) -> float:
+        return self._thread_seconds.get(thread_id, 0.0)
+
+    def delete_thread(self, thread_id: str) -> None:
+        connection = self._get_connection()
+        with self._lock:
+            connection.execute("BEGIN")
+            for table in ('checkpoints', 'blobs', 'writes', 'journal'):
+                connection.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            connection.execute("COMMIT")
+
+            self._journal_lengths.pop(thread_id, None)
+            self._thread_seconds.pop(thread_id, None)
+            for key in [key for key in self._logs if key[0] == thread_id]:
+                del self._logs[key]
+
+    # --------------------------------------------------------------------------------------------------------
+    # Execution journal (AppWorld state is not part of graph state)
+    # --------------------------------------------------------------------------------------------------------
+    def _get_journal_length(self, thread_id: str) -> int:
+        if thread_id not in self._journal_lengths:
+            self._journal_lengths[thread_id] = self._get_connection().execute(
+                "SELECT COUNT(*) FROM journal WHERE thread_id = ?", (thread_id,)
+            ).fetchone()[0]
+        return self._journal_lengths[thread_id]
+
+    def record_execution(
+        self,
+        thread_id: str,
+        code: str
+    ) -> None:
+        connection = self._get_connection()
+        with self._lock:
+            seq = self._get_journal_length(thread_id)
+            connection.execute("INSERT OR REPLACE INTO journal VALUES (?, ?, ?)", (thread_id, seq, code))
+            self._journal_lengths[thread_id] = seq + 1
+
+    def has_checkpoint(self, thread_id: str) -> bool:
+        return self._get_connection().execute(
+            "SELECT 1 FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' LIMIT 1", (thread_id,)
+        ).fetchone() is not None
+
+    def resume_journal(self, thread_id: str) -> List[str]:
+        """
+        Return code executed up to the latest root checkpoint of thread (to replay on a fresh environment).
+        Executions after that checkpoint are dropped, because the graph re-runs the nodes that made them.
+        """
+        connection = self._get_connection()
+        with self._lock:
+            row = connection.execute(
+                "SELECT journal_length FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id,)
+            ).fetchone()
+            journal_length = 0 if row is None else row[0]
+
+            connection.execute("DELETE FROM journal WHERE thread_id = ? AND seq >= ?", (thread_id, journal_length))
+            self._journal_lengths[thread_id] = journal_length
+
+            return [code for (code,) in connection.execute(
+                "SELECT code FROM journal WHERE thread_id = ? ORDER BY seq", (thread_id,)
+            ).fetchall()]
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Environment proxy that journals mutating executions
+# ------------------------------------------------------------------------------------------------------------------
+class JournaledEnvironment:
+    """
+    AppWorld proxy that records every state-changing `execute` call in the checkpointer journal.
+    Read-only code (api doc lookups, prints) is not journaled, since replaying it changes nothing.
+    """
+    def __init__(
+        self,
+        env: Any,
+        checkpointer: SQLiteCheckpointSaver,
+        thread_id: str
+    ) -> None:
+        self._env = env
+        self._checkpointer = checkpointer
+        self._thread_id = thread_id
+
+    def execute(self, code: str) -> str:
+        output = self._env.execute(code)
+        if not is_read_only_code(code):
+            self._checkpointer.record_execution(self._thread_id, code)
+        return output
+
+    def replay(self, codes: Sequence[str]) -> None:
+        for code in codes:
+            self._env.execute(code)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._env, name)
@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Pre-warmed AppWorld environment pool
+# ------------------------------------------------------------------------------------------------------------------
+class EnvironmentPool:
+    """
+    Prepare AppWorld environments of upcoming tasks in background threads while the current task runs.
+
+    `acquire(task_id, upcoming)` hands over the environment of `task_id` (built in the background if it
+    was prefetched, otherwise built now) and starts preparing the environments of `upcoming` tasks.
+    At most `prefetch` prepared environments wait in the pool, which bounds memory. Environments are
+    keyed by task id, so whichever worker picks a task up gets its prepared environment.
+
+    Cleanup is deterministic : `release` closes an environment, and `close` (or leaving the `with`
+    block) cancels preparations that did not start and closes every environment nobody acquired.
+    `wait_seconds` is the total time callers spent blocked in `acquire`.
+    """
+    def __init__(
+        self,
+        env_factory: Callable[[str], Any],
+        prefetch: int = 1
+    ) -> None:
+        self.env_factory = env_factory
+        self.prefetch_size = prefetch
+        self.wait_seconds = 0.0
+
+        self._executor = ThreadPoolExecutor(max_workers=max(prefetch, 1), thread_name_prefix='env')
+        self._futures: Dict[str, Future] = {}
+        self._lock = Lock()
+        self._closed = False
+
+    def __enter__(self) -> "EnvironmentPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def prefetch(self, task_ids: Iterable[str]) -> None:
+        with self._lock:
+            for task_id in task_ids:
+                if self._closed or len(self._futures) >= self.prefetch_size:
+                    break
+                if task_id not in self._futures:
+                    self._futures[task_id] = self._executor.submit(self.env_factory, task_id)
+
+    def acquire(
+        self,
+        task_id: str,
+        upcoming: Iterable[str] = ()
+    ) -> Any:
+        with self._lock:
+            future = self._futures.pop(task_id, None)
+
+        # start preparing next environments before (possibly) blocking on this one
+        self.prefetch(upcoming)
+
+        start = time.perf_counter()
+        env = self.env_factory(task_id) if future is None else future.result()
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.wait_seconds += elapsed
+        return env
+
+    def release(self, env: Any) -> None:
+        env.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            futures = list(self._futures.values())
+            self._futures.clear()
+
+        for future in futures:
+            if future.cancel():
+                continue
+            try:
+                future.result().close()
+            except Exception:
+                pass        # environment that failed to build has nothing to release
+
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from appworld import AppWorld
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Structured evaluation result of one attempt
+# ------------------------------------------------------------------------------------------------------------------
+class EvaluationResult:
+    """
+    Evaluation result of AppWorld task, computed once per attempt and stored in agent state.
+
+    Control flow reads `success` directly, the evaluator reuses the same object for final
+    scoring, and prompt text is only rendered (and cached) when a reflector asks for it.
+    """
+    def __init__(
+        self,
+        total_count: int,
+        pass_count: int,
+        fail_count: int,
+        passes: List[Dict[str, Any]],
+        failures: List[Dict[str, Any]]
+    ) -> None:
+        self.total_count = total_count
+        self.pass_count = pass_count
+        self.fail_count = fail_count
+        self.passes = passes
+        self.failures = failures
+
+        self._report: str | None = None
+
+    @classmethod
+    def from_env(
+        cls,
+        env: "AppWorld"
+    ) -> "EvaluationResult":
+        tracker = env.evaluate()
+        return cls(
+            total_count=tracker.total_count,
+            pass_count=tracker.pass_count,
+            fail_count=tracker.fail_count,
+            passes=tracker.passes,
+            failures=tracker.failures
+        )
+
+    @property
+    def success(self) -> bool:
+        return self.pass_count == self.total_count
+
+    def to_report(self) -> str:
+        """
+        Render evaluation report for reflector prompts (rendered once, then cached).
+        """
+        if self._report is not None:
+            return self._report
+
+        sections = [
+            f"Task Status : {'Succeed' if self.success else 'Failed'}\n---\n\n",
+            f"Task Requirement Count:\n- total requirements : {self.total_count}\n- passed requirements : {self.pass_count}\n- failed requirements : {self.fail_count}\n---\n\n"
+        ]
+
+        if self.pass_count > 0:
+            lines = [
+                str({'requirement' : passed['requirement'], 'label' : passed['label']})
+                for passed in self.passes
+            ]
+            sections.append("Detail of passed requirments: \n" + "\n".join(lines) + "\n---\n\n")
+
+        if self.fail_count > 0:
+            lines = [
+                str({'requirement' : failed['requirement'], 'failed_reason' : failed['trace']})
+                for failed in self.failures
+            ]
+            sections.append("Detail of failed requirments: \n" + "\n".join(lines) + "\n---\n\n")
+
+        self._report = "".join(sections)
+        return self._report
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'task_status' : self.success,
+            'pass_requirements' : self.pass_count,
+            'fail_requirements' : self.fail_count,
+            'total_requirements' : self.total_count,
+            'pass_requirement_info' : self.passes,
+            'fail_requirement_info' : self.failures
+        }
@@ -1,13 +1,21 @@
-from typing import Dict, Any, List
-import numpy as np
+import json
+import os
+from typing import Dict, Any, List, Mapping, NamedTuple, Sequence, Tuple
+from types import MappingProxyType
 
-from langchain_openai import OpenAIEmbeddings
+from ..utils.token_usage import UsageLedger
+from ..utils.embedding import get_embedding
+
+# bullets with cosine similarity over this threshold are treated as duplicates
+SIMILARITY_THRESHOLD = 0.8
 
 
 def cosine_similarity(
     vec1:List[float], 
     vec2:List[float]
 ) -> float:
+    import numpy as np      # imported on first use, so importing agent state does not load numpy
+
     vec1 = np.array(vec1)
     vec2 = np.array(vec2)
     
@@ -19,54 +27,235 @@ def cosine_similarity(
     return dot_product / (norm_vec1 * norm_vec2)
 
 
+SECTION_PREFIXES = {
+    'STRATEGIES AND HARD RULES' : 'shr',
+    'USEFUL CODE SNIPPETS AND TEMPLATES' : 'code',
+    'TROUBLESHOOTING AND PITFALLS' : 'ts'
+}
+
+
+class Bullet(NamedTuple):
+    content: str
+    embedding: Tuple[float, ...]
+    count: int = 0
+    id: int | None = None       # row id in PlayBookStore
+
+
 class PlayBook:
+    """
+    Immutable, versioned playbook snapshot.
+
+    Every write (`add_to_playbook`, `with_bullet`, `apply_delta`) returns a new snapshot with
+    version + 1 and leaves the original untouched, so readers (generator, reflector, curator,
+    other workers) always see a stable snapshot and never a half-applied curation.
+    Snapshots share structure: sections are tuples of immutable bullets, and a new version
+    only re-creates the tuple of the section it changed (other sections and every bullet are
+    shared by reference). Copying a snapshot (e.g. for LangGraph checkpoints) is free.
+    """
+    __slots__ = ('_sections', '_version', '_text')
+
     def __init__(
         self,
+        sections: Mapping[str, Tuple[Bullet, ...]] = None,
+        version: int = 0
     ) -> None:
-        self.playbook: Dict[str, List[Dict[str, Any]]] = {
-            'STRATEGIES AND HARD RULES' : [],
-            'USEFUL CODE SNIPPETS AND TEMPLATES' : [],
-            'TROUBLESHOOTING AND PITFALLS' : []
-        }
-        self.embedding_model = OpenAIEmbeddings(model='text-embedding-3-small')
-    
-    def _get_embedding(
-        self, 
-        content: str
-    ) -> List[float]:
-        return self.embedding_model.embed_query(content)
-    
+        if sections is None:
+            sections = {section_title : () for section_title in SECTION_PREFIXES}
+
+        self._sections: Mapping[str, Tuple[Bullet, ...]] = MappingProxyType(dict(sections))
+        self._version: int = version
+        self._text: str | None = None       # rendered playbook (cached, snapshot never changes)
+
+    def __copy__(self) -> "PlayBook":
+        return self
+
+    def __deepcopy__(self, memo) -> "PlayBook":
+        return self
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def sections(self) -> Mapping[str, Tuple[Bullet, ...]]:
+        return self._sections
+
+    def __len__(self) -> int:
+        return sum(len(section_body) for section_body in self._sections.values())
+
+    # --------------------------------------------------------------------------------------------------------
+    # Write (returns new snapshot)
+    # --------------------------------------------------------------------------------------------------------
+    def with_section(
+        self,
+        section: str,
+        bullets: Tuple[Bullet, ...],
+        version: int = None
+    ) -> "PlayBook":
+        return PlayBook(
+            sections={**self._sections, section : tuple(bullets)},
+            version=self._version + 1 if version is None else version
+        )
+
+    def with_bullet(
+        self,
+        section: str,
+        content: str,
+        embedding: Sequence[float]
+    ) -> "PlayBook":
+        section_body = self._sections.get(section, ())
+
+        for i, bullet in enumerate(section_body):
+            if cosine_similarity(embedding, bullet.embedding) >= SIMILARITY_THRESHOLD:
+                duplicated = bullet._replace(count=bullet.count + 1)
+                return self.with_section(section, section_body[:i] + (duplicated,) + section_body[i+1:])
+
+        return self.with_section(section, section_body + (Bullet(content=content, embedding=tuple(embedding)),))
+
     def add_to_playbook(
         self,
         section: str,
-        content: str
-    ) -> None:
-        embedding: List[float] = self._get_embedding(content)
+        content: str,
+        ledger: UsageLedger = None
+    ) -> "PlayBook":
+        embedding: List[float] = get_embedding(content, ledger=ledger, node='playbook/embedding')
+        return self.with_bullet(section=section, content=content, embedding=embedding)
 
-        for bullet in self.playbook[section]:
-            if cosine_similarity(embedding, bullet['embedding']) >= 0.8:
-                self.playbook[section]['count'] += 1
-                return
-        
-        self.playbook[section].append({
-            'content' : content,
-            'embedding' : embedding,
-            'count' : 0
-        })
+    def apply_delta(
+        self,
+        delta_entries: Sequence[Dict[str, Any]],
+        ledger: UsageLedger = None
+    ) -> "PlayBook":
+        playbook = self
+        for delta in delta_entries:
+            if delta['operation'] == 'ADD':
+                playbook = playbook.add_to_playbook(section=delta['section'], content=delta['content'], ledger=ledger)
+            else:
+                raise ValueError(f"Unexpected Operation value : {delta['operation']}")
+        return playbook
+
+    # --------------------------------------------------------------------------------------------------------
+    # Serialization
+    # --------------------------------------------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, List[Dict[str, Any]]]:
+        return {
+            section_title : [
+                {'content' : bullet.content, 'embedding' : list(bullet.embedding), 'count' : bullet.count}
+                for bullet in section_body
+            ]
+            for section_title, section_body in self._sections.items()
+        }
+
+    @classmethod
+    def from_dict(
+        cls,
+        playbook: Dict[str, List[Dict[str, Any]]],
+        version: int = 0
+    ) -> "PlayBook":
+        sections = {section_title : () for section_title in SECTION_PREFIXES}
+        for section_title, section_body in playbook.items():
+            sections[section_title] = tuple(
+                Bullet(content=bullet['content'], embedding=tuple(bullet['embedding']), count=bullet['count'])
+                for bullet in section_body
+            )
+        return cls(sections=sections, version=version)
     
     def to_str(self):
+        if self._text is not None:
+            return self._text
+
         playbook = ""
 
-        for section_title, section_body in self.playbook.items():
-            playbook += f"{section_title}:"
+        for section_title, section_body in self._sections.items():
+            playbook += f"{section_title}:\n"
+            prefix = SECTION_PREFIXES.get(section_title, 'misc')
             for i, bullet in enumerate(section_body):
-                if section_title == 'STRATEGIES AND HARD RULES':
-                    playbook += f"  * shr-{i:05d} : {bullet['content']}\n"
-                if section_title == 'USEFUL CODE SNIPPETS AND TEMPLATES':
-                    playbook += f"  * code-{i:05d} : {bullet['content']}\n"
-                if section_title == 'TROUBLESHOOTING AND PITFALLS':
-                    playbook += f"  * ts-{i:05d} : {bullet['content']}\n"
+                playbook += f"  * {prefix}-{i:05d} : {bullet.content}\n"
 
             playbook += "\n"
         
-        return playbook
\ No newline at end of file
+        self._text = playbook
+        return playbook
+
+
+# --------------------------------------------------------------------------------------------------------
+# Merge of playbooks grown in parallel (e.g. training shards of one epoch)
+# --------------------------------------------------------------------------------------------------------
+def _find_duplicate(
+    bullets: Sequence[Bullet],
+    embedding: Sequence[float]
+) -> int | None:
+    for i, bullet in enumerate(bullets):
+        if cosine_similarity(embedding, bullet.embedding) >= SIMILARITY_THRESHOLD:
+            return i
+    return None
+
+
+def merge_playbooks(
+    base: PlayBook,
+    playbooks: Sequence[PlayBook]
+) -> PlayBook:
+    """
+    Merge playbooks that were each grown from `base` into one new version.
+
+    Writes only bump counts of existing bullets or append new bullets, so the first bullets of each
+    section are the bullets of `base`. Count increments of base bullets are summed over playbooks, and
+    new bullets are added in playbook order, deduplicated against bullets merged so far with their
+    stored embeddings (no embedding call).
+    """
+    sections: Dict[str, List[Bullet]] = {section_title : list(section_body) for section_title, section_body in base.sections.items()}
+
+    for playbook in playbooks:
+        for section_title, section_body in playbook.sections.items():
+            base_body = base.sections.get(section_title, ())
+            if len(section_body) < len(base_body):
+                raise ValueError(f"Playbook was not grown from base playbook (section '{section_title}' lost bullets).")
+
+            merged = sections.setdefault(section_title, [])
+            for i, bullet in enumerate(section_body[:len(base_body)]):
+                increment = bullet.count - base_body[i].count
+                if increment:
+                    merged[i] = merged[i]._replace(count=merged[i].count + increment)
+
+            for bullet in section_body[len(base_body):]:
+                index = _find_duplicate(merged, bullet.embedding)
+                if index is None:
+                    merged.append(bullet._replace(id=None))
+                else:
+                    merged[index] = merged[index]._replace(count=merged[index].count + bullet.count + 1)
+
+    return PlayBook(
+        sections={section_title : tuple(section_body) for section_title, section_body in sections.items()},
+        version=base.version + 1
+    )
+
+
+# --------------------------------------------------------------------------------------------------------
+# Playbook checkpoint file
+# --------------------------------------------------------------------------------------------------------
+def save_playbook(
+    path: str,
+    playbook: PlayBook,
+    **metadata: Any
+) -> None:
+    """
+    Write playbook (and metadata such as epoch / success rate) to JSON file. The file is replaced atomically.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({**metadata, 'version' : playbook.version, 'playbook' : playbook.to_dict()}, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def load_playbook(path: str) -> PlayBook:
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+
+    # carried-over 'playbook' of evaluator state (version in 'playbook_version') and plain playbook dict are accepted as well
+    if 'playbook' in checkpoint:
+        version = checkpoint.get('version', checkpoint.get('playbook_version', 0))
+        return PlayBook.from_dict(checkpoint['playbook'], version=version)
+    return PlayBook.from_dict(checkpoint)
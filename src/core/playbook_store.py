@@ -0,0 +1,206 @@
+import sqlite3
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+from .playbook import PlayBook, Bullet, SIMILARITY_THRESHOLD
+from ..utils.token_usage import UsageLedger
+from ..utils.embedding import get_embedding
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Shared Playbook Store (SQLite WAL)
+# ------------------------------------------------------------------------------------------------------------------
+class PlayBookStore:
+    """
+    Playbook shared by many ACE workers (threads, processes, or machines on a shared disk) through SQLite in WAL mode.
+
+    - Versioned reads : every write bumps a global version. Readers never block writers (WAL) and
+      `read()` only fetches rows changed since the cached version, so the hot read path is one
+      small query when nothing changed.
+    - Delta application with optimistic concurrency : embeddings are computed before any lock is
+      taken. The write transaction then re-checks duplicates against the *current* bullets, so a
+      delta based on an older version is rebased instead of overwriting concurrent updates.
+    - Embedding-based dedup : a bullet too similar to an existing bullet of the same section only
+      increments the count of the existing bullet.
+    """
+    def __init__(
+        self,
+        path: str,
+        similarity_threshold: float = SIMILARITY_THRESHOLD,
+        ledger: UsageLedger = None,
+        timeout: float = 30.0
+    ) -> None:
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.timeout = timeout
+
+        # default usage ledger to record embedding calls (`apply_delta` takes the ledger of the calling task)
+        self.ledger = ledger
+
+        # sqlite connection can not be shared between threads
+        self._local = threading.local()
+
+        # cached snapshot, its version, and position of each bullet id in the snapshot (section, index)
+        self._lock = threading.Lock()
+        self._positions: Dict[int, Tuple[str, int]] = {}
+        self._version = -1
+        self._snapshot: PlayBook = PlayBook(version=-1)
+
+        connection = self._get_connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bullets (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                section TEXT NOT NULL,
+                content TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bullets_version ON bullets (version);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+        """)
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # --------------------------------------------------------------------------------------------------------
+    # Read
+    # --------------------------------------------------------------------------------------------------------
+    def version(self) -> int:
+        return self._get_connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def read(self) -> PlayBook:
+        """
+        Return playbook snapshot of the latest version.
+        """
+        connection = self._get_connection()
+
+        # read version and changed rows in one read transaction (consistent snapshot under WAL)
+        connection.execute("BEGIN")
+        try:
+            version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+            with self._lock:
+                if version == self._version:
+                    return self._snapshot
+                cached_version = self._version
+
+            rows = connection.execute(
+                "SELECT id, section, content, embedding, count FROM bullets WHERE version > ? ORDER BY id",
+                (cached_version,)
+            ).fetchall()
+        finally:
+            connection.execute("COMMIT")
+
+        with self._lock:
+            if version > self._version:
+                self._snapshot = self._build_snapshot(rows, version)
+                self._version = version
+            return self._snapshot
+
+    def _build_snapshot(
+        self,
+        rows: Sequence[Tuple[int, str, str, bytes, int]],
+        version: int
+    ) -> PlayBook:
+        """
+        Apply changed rows on top of the cached snapshot.
+        Only the sections touched by `rows` are re-created, the others are shared with the previous snapshot.
+        """
+        sections: Dict[str, List[Bullet]] = {}
+        for bullet_id, section, content, embedding, count in rows:
+            if section not in sections:
+                sections[section] = list(self._snapshot.sections.get(section, ()))
+            bullet = Bullet(
+                content=content,
+                embedding=tuple(np.frombuffer(embedding, dtype=np.float32).tolist()),
+                count=count,
+                id=bullet_id
+            )
+
+            if bullet_id in self._positions:
+                # bullet ids never move between sections
+                _, index = self._positions[bullet_id]
+                sections[section][index] = bullet
+            else:
+                self._positions[bullet_id] = (section, len(sections[section]))
+                sections[section].append(bullet)
+
+        playbook = PlayBook(sections=self._snapshot.sections, version=version)
+        for section, bullets in sections.items():
+            playbook = playbook.with_section(section, tuple(bullets), version=version)
+        return playbook
+
+    # --------------------------------------------------------------------------------------------------------
+    # Write
+    # --------------------------------------------------------------------------------------------------------
+    def apply_delta(
+        self,
+        delta_entries: Sequence[Dict[str, Any]],
+        ledger: UsageLedger = None
+    ) -> PlayBook:
+        """
+        Apply curator delta entries ({'operation', 'section', 'content'}) and return the new snapshot.
+        """
+        additions = []
+        for delta in delta_entries:
+            if delta['operation'] != 'ADD':
+                raise ValueError(f"Unexpected Operation value : {delta['operation']}")
+            # embedding is computed before the write lock is taken (slow network call)
+            embedding = get_embedding(
+                delta['content'],
+                ledger=ledger if ledger is not None else self.ledger,
+                node='playbook_store/embedding'
+            )
+            additions.append((delta['section'], delta['content'], np.asarray(embedding, dtype=np.float32)))
+
+        if not additions:
+            return self.read()
+
+        connection = self._get_connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0] + 1
+
+            for section, content, embedding in additions:
+                # dedup against current bullets of the section (includes bullets added by other workers)
+                rows = connection.execute(
+                    "SELECT id, embedding FROM bullets WHERE section = ?", (section,)
+                ).fetchall()
+
+                duplicate_id = None
+                if rows:
+                    matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                    similarities = (matrix @ embedding) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding))
+                    index = int(np.argmax(similarities))
+                    if similarities[index] >= self.similarity_threshold:
+                        duplicate_id = rows[index][0]
+
+                if duplicate_id is not None:
+                    connection.execute(
+                        "UPDATE bullets SET count = count + 1, version = ? WHERE id = ?", (version, duplicate_id)
+                    )
+                else:
+                    connection.execute(
+                        "INSERT INTO bullets (section, content, embedding, count, version) VALUES (?, ?, ?, 0, ?)",
+                        (section, content, embedding.tobytes(), version)
+                    )
+
+            connection.execute("UPDATE meta SET value = ? WHERE key = 'version'", (version,))
+            connection.execute("COMMIT")
+        except Exception as error:
+            connection.execute("ROLLBACK")
+            raise error
+
+        return self.read()
@@ -0,0 +1,174 @@
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List
+from threading import Lock
+import numpy as np
+
+from ..utils.token_usage import UsageLedger
+from ..utils.embedding import get_embedding
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+class ReflectionStore:
+    """
+    Bounded, deduplicated store of reflections that are carried over tasks in ReflexionAgent.
+
+    Reflections are embedded when added. A reflection that is too similar to a stored one only
+    bumps the count of stored reflection. When the store is full, the least recently used
+    reflection is evicted. Actor prompt only receives the `top_k` reflections most relevant
+    to the current task instruction, so its size stays constant over a long sweep.
+    """
+    def __init__(
+        self,
+        max_size: int = 100,
+        top_k: int = 5,
+        similarity_threshold: float = 0.9,
+        ledger: UsageLedger = None
+    ) -> None:
+        self.max_size = max_size
+        self.top_k = top_k
+        self.similarity_threshold = similarity_threshold
+
+        self.reflections: List[Dict[str, Any]] = []
+        self.clock = 0              # logical time for least recently used eviction
+
+        # default usage ledger to record embedding calls (not serialized). callers running tasks in
+        # parallel pass the ledger of their task to `add` / `retrieve` instead.
+        self.ledger = ledger
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self.reflections)
+
+    def _get_similarities(
+        self,
+        embedding: List[float]
+    ) -> np.ndarray:
+        matrix = np.array([reflection['embedding'] for reflection in self.reflections])
+        query = np.array(embedding)
+        return (matrix @ query) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query))
+
+    def add(
+        self,
+        content: str,
+        ledger: UsageLedger = None
+    ) -> None:
+        ledger = ledger if ledger is not None else self.ledger
+        embedding = get_embedding(content, ledger=ledger, node='reflection_store/embedding')
+
+        with self._lock:
+            self.clock += 1
+
+            if self.reflections:
+                similarities = self._get_similarities(embedding)
+                index = int(np.argmax(similarities))
+                if similarities[index] >= self.similarity_threshold:
+                    self.reflections[index]['count'] += 1
+                    self.reflections[index]['last_used'] = self.clock
+                    return
+
+            self.reflections.append({
+                'content' : content,
+                'embedding' : embedding,
+                'count' : 0,
+                'last_used' : self.clock
+            })
+
+            if len(self.reflections) > self.max_size:
+                evict_index = min(range(len(self.reflections)), key=lambda i: self.reflections[i]['last_used'])
+                self.reflections.pop(evict_index)
+
+    def _lexical_similarities(
+        self,
+        query: str
+    ) -> np.ndarray:
+        # tf-idf cosine similarity over words of reflections (no embedding model)
+        documents = [Counter(_WORD.findall(reflection['content'].lower())) for reflection in self.reflections]
+        vocabulary = {word : i for i, word in enumerate(set().union(*documents))}
+        query_counts = Counter(word for word in _WORD.findall(query.lower()) if word in vocabulary)
+        if not query_counts:
+            return np.zeros(len(documents))
+
+        matrix = np.zeros((len(documents), len(vocabulary)))
+        for row, counts in enumerate(documents):
+            for word, count in counts.items():
+                matrix[row, vocabulary[word]] = count
+        idf = np.log((1 + len(documents)) / (1 + np.count_nonzero(matrix, axis=0))) + 1
+        matrix *= idf
+
+        vector = np.zeros(len(vocabulary))
+        for word, count in query_counts.items():
+            vector[vocabulary[word]] = count
+        vector *= idf
+        return (matrix @ vector) / np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector), 1e-12)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = None,
+        ledger: UsageLedger = None,
+        lexical: bool = False
+    ) -> List[str]:
+        """
+        Top-k reflections most relevant to query. `lexical` ranks by word overlap (tf-idf) instead of
+        embeddings, so no embedding model is created or called (read-only inference).
+        """
+        top_k = self.top_k if top_k is None else top_k
+        if not self.reflections or top_k == 0:
+            return []
+
+        if lexical:
+            with self._lock:
+                similarities = self._lexical_similarities(query)
+                indices = np.argsort(-similarities, kind='stable')[:top_k]
+                # no shared word : unrelated reflection is left out of the prompt
+                return [self.reflections[index]['content'] for index in indices if similarities[index] > 0]
+
+        ledger = ledger if ledger is not None else self.ledger
+        embedding = get_embedding(query, ledger=ledger, node='reflection_store/embedding')
+
+        with self._lock:
+            self.clock += 1
+
+            similarities = self._get_similarities(embedding)
+            indices = np.argsort(-similarities)[:top_k]
+            for index in indices:
+                self.reflections[index]['last_used'] = self.clock
+
+            return [self.reflections[index]['content'] for index in indices]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'max_size' : self.max_size,
+                'top_k' : self.top_k,
+                'similarity_threshold' : self.similarity_threshold,
+                'clock' : self.clock,
+                'reflections' : [dict(reflection) for reflection in self.reflections]
+            }
+
+    @classmethod
+    def from_dict(
+        cls,
+        store: Dict[str, Any]
+    ) -> "ReflectionStore":
+        instance = cls(
+            max_size=store['max_size'],
+            top_k=store['top_k'],
+            similarity_threshold=store['similarity_threshold']
+        )
+        instance.clock = store['clock']
+        instance.reflections = [dict(reflection) for reflection in store['reflections']]
+        return instance
+
+
+def load_reflection_store(path: str) -> ReflectionStore:
+    """
+    Load reflection store from JSON file : carried-over state of evaluator ('{experiment_name}.state.json')
+    or a plain `ReflectionStore.to_dict()`.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        store = json.load(f)
+    return ReflectionStore.from_dict(store.get('reflection_store', store))
@@ -0,0 +1,124 @@
+from threading import Lock
+from typing import Any, Dict, List, Sequence, Tuple
+
+from langchain.messages import AIMessage, AnyMessage, ToolMessage
+
+from ..utils.messages import is_error_observation
+from ..utils.tools import is_read_only_tool_call
+
+# model tiers from cheapest to strongest. escalation moves one tier up.
+TIER_ORDER = ('small', 'default', 'large')
+
+# route key -> tier. keys are '{role}/{step_type}', '*/{step_type}' or '{role}' (most specific first).
+# roles are agent / module names ('react', 'actor', 'generator', 'reflector', 'curator').
+DEFAULT_ROUTES = {
+    'reflector' : 'small',
+    'curator' : 'small',
+    '*/browse' : 'small',       # previous step only read api documentation
+}
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Step type of ReAct-style loop
+# ------------------------------------------------------------------------------------------------------------------
+def classify_step(messages: Sequence[AnyMessage]) -> str:
+    """
+    Step type from the latest observation (only the last model turn is read, not the whole history).
+
+    - 'first'  : no observation yet (task planning)
+    - 'error'  : an observation of the last turn is an error
+    - 'browse' : every call of the last turn only read api documentation
+    - 'default': anything else
+    """
+    if len(messages) == 0 or not isinstance(messages[-1], ToolMessage):
+        return 'first'
+
+    index = len(messages) - 1
+    observations: List[ToolMessage] = []
+    while index >= 0 and isinstance(messages[index], ToolMessage):
+        observations.append(messages[index])
+        index -= 1
+
+    if any(is_error_observation(f"{observation.content}") for observation in observations):
+        return 'error'
+
+    last_turn = messages[index] if index >= 0 else None
+    if isinstance(last_turn, AIMessage) and last_turn.tool_calls and all(is_read_only_tool_call(tool_call) for tool_call in last_turn.tool_calls):
+        return 'browse'
+    return 'default'
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Model Router
+# ------------------------------------------------------------------------------------------------------------------
+class ModelRouter:
+    """
+    Map (role, step type) of each LLM call to a model tier, and escalate to stronger tiers after failures.
+
+    `tiers` maps tier name ('small', 'default', 'large') to model config. Tiers that are not configured
+    are skipped, so a router with only 'default' tier is the single-model setup. Every
+    `escalate_after` failures (consecutive error observations + failed attempts of the task) move
+    the call one tier up. Clients are created once per tier and shared by all agents and tasks.
+    """
+    def __init__(
+        self,
+        tiers: Dict[str, Dict[str, Any]],
+        routes: Dict[str, str] = None,
+        escalate_after: int = 2
+    ) -> None:
+        if 'default' not in tiers:
+            raise ValueError("Model router needs 'default' tier.")
+
+        self.tiers = tiers
+        self.routes = DEFAULT_ROUTES if routes is None else routes
+        self.escalate_after = escalate_after
+        self.order: Tuple[str, ...] = tuple(tier for tier in TIER_ORDER if tier in tiers)
+
+        self._clients: Dict[Tuple[str, str], Any] = {}
+        self._lock = Lock()
+
+    @classmethod
+    def single(
+        cls,
+        model_config: Dict[str, Any]
+    ) -> "ModelRouter":
+        return cls(tiers={'default' : model_config})
+
+    def route(
+        self,
+        role: str,
+        step_type: str = 'default',
+        failures: int = 0
+    ) -> str:
+        tier = self.routes.get(
+            f"{role}/{step_type}",
+            self.routes.get(f"*/{step_type}", self.routes.get(role, 'default'))
+        )
+        if tier not in self.tiers:
+            tier = 'default'
+
+        # escalate one tier per `escalate_after` failures (capped at strongest tier)
+        if self.escalate_after and failures >= self.escalate_after:
+            index = self.order.index(tier) + failures // self.escalate_after
+            tier = self.order[min(index, len(self.order) - 1)]
+        return tier
+
+    def model(self, tier: str) -> str:
+        return self.tiers[tier]['model']
+
+    def get_client(
+        self,
+        tier: str,
+        tools: Sequence[Any] = None
+    ) -> Any:
+        """
+        Chat client of tier (with `tools` bound, if given). Created on first use.
+        """
+        key = (tier, 'tools' if tools else 'chat')
+        with self._lock:
+            if key not in self._clients:
+                from langchain_openai import ChatOpenAI
+
+                client = ChatOpenAI(**self.tiers[tier])
+                self._clients[key] = client.bind_tools(tools) if tools else client
+            return self._clients[key]
@@ -0,0 +1,373 @@
+import multiprocessing
+import os
+import signal
+from threading import BoundedSemaphore, Lock, RLock
+from types import SimpleNamespace
+from typing import Any, Dict, List, Set
+
+
+class SandboxError(RuntimeError):
+    """
+    AppWorld raised an error inside a sandbox worker process.
+    """
+
+
+class CPUTimeLimitExceeded(Exception):
+    pass
+
+
+class _WorkerLost(Exception):
+    # worker process timed out (wall-clock) or died, its AppWorld state is gone
+    pass
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Worker process (hosts one AppWorld session at a time)
+# ------------------------------------------------------------------------------------------------------------------
+def _raise_cpu_limit(signum, frame) -> None:
+    raise CPUTimeLimitExceeded()
+
+
+def _current_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        return 0.0      # not linux : memory based recycling is disabled
+
+
+def _describe_task(task: Any) -> SimpleNamespace:
+    # picklable copy of the task fields agents read (instruction, supervisor profile)
+    supervisor = task.supervisor
+    return SimpleNamespace(
+        instruction=task.instruction,
+        supervisor=SimpleNamespace(
+            first_name=supervisor.first_name,
+            last_name=supervisor.last_name,
+            email=supervisor.email,
+            phone_number=supervisor.phone_number
+        )
+    )
+
+
+def _execute_with_limits(
+    env: Any,
+    code: str,
+    cpu_seconds: float | None,
+    max_output_chars: int | None
+) -> str:
+    # CPU time (not wall time) of this process : sleeping / waiting code is caught by the parent timeout
+    if cpu_seconds:
+        signal.setitimer(signal.ITIMER_PROF, cpu_seconds)
+    try:
+        output = f"{env.execute(code)}"
+    except CPUTimeLimitExceeded:
+        output = f"Execution stopped : CPU time limit of {cpu_seconds}s exceeded."
+    finally:
+        if cpu_seconds:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+
+    if max_output_chars and len(output) > max_output_chars:
+        omitted = len(output) - max_output_chars
+        output = output[:max_output_chars] + f"\n... [output truncated : {omitted} characters omitted]"
+    return output
+
+
+def _worker_main(
+    connection: Any,
+    cpu_seconds: float | None,
+    max_output_chars: int | None
+) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)        # Ctrl+C is handled by parent process
+    if not hasattr(signal, 'setitimer'):
+        cpu_seconds = None
+    if cpu_seconds:
+        signal.signal(signal.SIGPROF, _raise_cpu_limit)
+
+    from appworld import AppWorld       # imported once per worker, before the first session arrives
+
+    env = None
+    while True:
+        try:
+            command, payload = connection.recv()
+        except EOFError:
+            break
+
+        try:
+            if command == 'open':
+                env = AppWorld(**payload)
+                result = _describe_task(env.task)
+            elif command == 'execute':
+                result = _execute_with_limits(env, payload, cpu_seconds, max_output_chars)
+            elif command == 'evaluate':
+                tracker = env.evaluate()
+                result = SimpleNamespace(
+                    total_count=tracker.total_count,
+                    pass_count=tracker.pass_count,
+                    fail_count=tracker.fail_count,
+                    passes=tracker.passes,
+                    failures=tracker.failures
+                )
+            elif command == 'task_completed':
+                result = env.task_completed()
+            elif command == 'close':
+                env.close()
+                env, result = None, None
+            elif command == 'shutdown':
+                break
+            else:
+                raise ValueError(f"Unknown sandbox command : {command}")
+            connection.send(('ok', result, _current_rss_mb()))
+        except Exception as error:
+            connection.send(('error', f"{type(error).__name__}: {error}", _current_rss_mb()))
+
+    if env is not None:
+        env.close()
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: Any,
+        cpu_seconds: float | None,
+        max_output_chars: int | None
+    ) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_connection, cpu_seconds, max_output_chars),
+            daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.rss_mb = 0.0
+        # one request / response exchange on the pipe at a time (responses carry no request id)
+        self.lock = Lock()
+
+    def call(
+        self,
+        command: str,
+        payload: Any = None,
+        timeout: float | None = None
+    ) -> Any:
+        with self.lock:
+            try:
+                self.connection.send((command, payload))
+                if not self.connection.poll(timeout):
+                    raise _WorkerLost(f"no response within {timeout:.0f}s")
+                status, result, self.rss_mb = self.connection.recv()
+            except (EOFError, OSError):
+                raise _WorkerLost(f"sandbox process exited (exit code {self.process.exitcode})")
+
+        if status == 'error':
+            raise SandboxError(result)
+        return result
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Sandbox pool
+# ------------------------------------------------------------------------------------------------------------------
+class SandboxPool:
+    """
+    Pool of persistent worker processes that run AppWorld sessions out of the agent process.
+
+    - `open(**appworld_kwargs)` binds a session to one idle worker until the session is closed
+      (AppWorld state lives in that process). When every worker is busy, `open` waits.
+    - every `execute` runs under a CPU time limit (`cpu_seconds`) inside the worker and a wall-clock
+      limit (`timeout_seconds`) in the caller. Output longer than `max_output_chars` is truncated
+      before it is sent back.
+    - a worker whose resident memory exceeds `max_memory_mb`, hits the wall-clock limit or dies is
+      replaced by a fresh process, and the session state is rebuilt by replaying its state-changing code.
+
+    Workers are started (and import appworld) up front, so sessions do not pay process startup.
+    """
+    def __init__(
+        self,
+        max_workers: int = 4,
+        cpu_seconds: float | None = 30.0,
+        timeout_seconds: float | None = None,
+        max_output_chars: int | None = 20000,
+        max_memory_mb: float | None = 2048,
+        open_timeout_seconds: float = 600.0
+    ) -> None:
+        self.max_workers = max_workers
+        self.cpu_seconds = cpu_seconds
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else (cpu_seconds or 30.0) * 2 + 10.0
+        self.max_output_chars = max_output_chars
+        self.max_memory_mb = max_memory_mb
+        self.open_timeout_seconds = open_timeout_seconds
+        self.num_recycled = 0
+
+        # spawn : agent process runs threads (llm clients, tool executors), forking it is unsafe
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = Lock()
+        self._slots = BoundedSemaphore(max_workers)
+        self._workers: Set[_Worker] = set()
+        self._closed = False
+        self._idle: List[_Worker] = [self._spawn() for _ in range(max_workers)]
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, cpu_seconds=self.cpu_seconds, max_output_chars=self.max_output_chars)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _discard(self, worker: _Worker) -> None:
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+
+    def _recycle(self, worker: _Worker) -> _Worker:
+        self._discard(worker)
+        with self._lock:
+            self.num_recycled += 1
+        return self._spawn()
+
+    def _over_memory(self, worker: _Worker) -> bool:
+        return self.max_memory_mb is not None and worker.rss_mb > self.max_memory_mb
+
+    def open(self, **appworld_kwargs: Any) -> "SandboxedEnvironment":
+        self._slots.acquire()
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Sandbox pool is closed.")
+                worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                worker = self._spawn()
+            return SandboxedEnvironment(self, worker, appworld_kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _checkin(self, worker: _Worker | None) -> None:
+        # worker of a closed session goes back to the idle list (replaced when it is unhealthy)
+        if worker is None or not worker.process.is_alive() or self._over_memory(worker):
+            if worker is not None:
+                self._discard(worker)
+            worker = None if self._closed else self._spawn()
+
+        with self._lock:
+            if worker is not None and not self._closed:
+                self._idle.append(worker)
+                worker = None
+        if worker is not None:
+            self._discard(worker)
+        self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            workers = list(self._workers)
+
+        for worker in idle:
+            try:
+                worker.connection.send(('shutdown', None))
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+        for worker in workers:
+            self._discard(worker)
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# AppWorld proxy of one sandboxed session
+# ------------------------------------------------------------------------------------------------------------------
+class SandboxedEnvironment:
+    """
+    AppWorld-like proxy (`execute`, `evaluate`, `task`, `task_completed`, `close`) of a session
+    hosted in a sandbox worker process.
+
+    Calls from several threads (concurrent tool calls of one turn) are serialized : the session runs
+    one command at a time, and a worker replacement (`_restart`) never interleaves with another call.
+    """
+    def __init__(
+        self,
+        pool: SandboxPool,
+        worker: _Worker,
+        appworld_kwargs: Dict[str, Any]
+    ) -> None:
+        self._pool = pool
+        self._worker = worker
+        self._appworld_kwargs = appworld_kwargs
+        self._history: List[str] = []      # state-changing code, replayed when worker is replaced
+        self._recycle_on_memory = True
+        self._lock = RLock()                # held for a whole command, including restart and replay
+
+        try:
+            self.task = self._open()
+        except _WorkerLost:
+            self._worker = pool._recycle(self._worker)
+            self.task = self._open()
+
+    def _open(self) -> SimpleNamespace:
+        return self._worker.call('open', self._appworld_kwargs, timeout=self._pool.open_timeout_seconds)
+
+    def _restart(self) -> None:
+        self._worker = self._pool._recycle(self._worker)
+        self._open()
+        for code in self._history:
+            try:
+                self._worker.call('execute', code, timeout=self._pool.timeout_seconds)
+            except SandboxError:
+                pass        # same error as the original run, state is the same
+
+        # session state itself needs the memory (not leaked garbage) : replacing the worker again cannot help
+        if self._pool._over_memory(self._worker):
+            self._recycle_on_memory = False
+
+    def _request(self, command: str) -> Any:
+        with self._lock:
+            try:
+                return self._worker.call(command, timeout=self._pool.timeout_seconds)
+            except _WorkerLost:
+                self._restart()
+                return self._worker.call(command, timeout=self._pool.timeout_seconds)
+
+    def execute(self, code: str) -> str:
+        from ..utils.tools import is_read_only_code
+
+        with self._lock:
+            try:
+                output = self._worker.call('execute', code, timeout=self._pool.timeout_seconds)
+            except _WorkerLost as error:
+                # code that hangs or crashes the process is dropped : state is rebuilt without it
+                self._restart()
+                return f"Execution stopped : {error}. Environment state was restored to before this code."
+
+            if not is_read_only_code(code):
+                self._history.append(code)
+            if self._recycle_on_memory and self._pool._over_memory(self._worker):
+                self._restart()
+            return output
+
+    def evaluate(self) -> SimpleNamespace:
+        return self._request('evaluate')
+
+    def task_completed(self) -> bool:
+        return self._request('task_completed')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._worker is None:
+                return
+            worker, self._worker = self._worker, None
+        try:
+            worker.call('close', timeout=self._pool.timeout_seconds)
+        except (_WorkerLost, SandboxError):
+            self._pool._discard(worker)
+            worker = None
+        self._pool._checkin(worker)
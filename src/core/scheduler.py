@@ -0,0 +1,123 @@
+import statistics
+from collections import deque
+from itertools import islice
+from threading import Lock
+from typing import Deque, Dict, Iterable, List, Sequence
+
+from ..utils.results import load_result_file
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Task cost prediction from earlier result files
+# ------------------------------------------------------------------------------------------------------------------
+def predict_task_costs(
+    task_ids: Sequence[str],
+    history_paths: Iterable[str] = (),
+    key: str = 'latency'
+) -> Dict[str, float]:
+    """
+    Predict cost (`key` of records : 'latency', 'total_tokens' or 'steps') of every task id.
+
+    1. mean over earlier records of the same task id
+    2. mean over tasks of the same scenario (AppWorld task id '{scenario}_{n}' : variants of a scenario
+       need the same apps and apis, so their difficulty is similar)
+    3. median over all records (1.0 when there is no history)
+    """
+    history: Dict[str, List[float]] = {}
+    for path in history_paths:
+        for record in load_result_file(path):
+            if record.get('task_id') is not None and isinstance(record.get(key), (int, float)):
+                history.setdefault(record['task_id'], []).append(float(record[key]))
+
+    by_task = {task_id : statistics.fmean(values) for task_id, values in history.items()}
+
+    by_scenario: Dict[str, List[float]] = {}
+    for task_id, value in by_task.items():
+        by_scenario.setdefault(task_id.split('_')[0], []).append(value)
+
+    default = statistics.median(by_task.values()) if by_task else 1.0
+
+    predictions = {}
+    for task_id in task_ids:
+        if task_id in by_task:
+            predictions[task_id] = by_task[task_id]
+        elif task_id.split('_')[0] in by_scenario:
+            predictions[task_id] = statistics.fmean(by_scenario[task_id.split('_')[0]])
+        else:
+            predictions[task_id] = default
+    return predictions
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Longest-first scheduler with work stealing
+# ------------------------------------------------------------------------------------------------------------------
+class TaskScheduler:
+    """
+    Hand out task ids to parallel workers to minimise makespan of a sweep.
+
+    Tasks are sorted longest-first (LPT) and greedily assigned to the deque of the worker with the
+    least predicted load, so every worker starts with a balanced share and runs its longest tasks first.
+    A worker pops from the front of its own deque. When it runs dry, it steals from the back (the
+    shortest tasks) of the worker with the most predicted work left, so a wrong prediction only
+    leaves workers idle at the very end of the sweep.
+    """
+    def __init__(
+        self,
+        task_ids: Sequence[str],
+        predictions: Dict[str, float],
+        num_workers: int
+    ) -> None:
+        self.num_workers = num_workers
+        self.predictions = predictions
+
+        self._queues: List[Deque[str]] = [deque() for _ in range(num_workers)]
+        self._loads: List[float] = [0.0] * num_workers          # predicted work left in each queue
+        self._lock = Lock()
+        self._cancelled = False
+
+        for task_id in sorted(task_ids, key=lambda task_id: -predictions.get(task_id, 0.0)):
+            worker = min(range(num_workers), key=lambda index: self._loads[index])
+            self._queues[worker].append(task_id)
+            self._loads[worker] += predictions.get(task_id, 0.0)
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in self._queues)
+
+    @property
+    def predicted_makespan(self) -> float:
+        return max(self._loads, default=0.0)
+
+    def next(self, worker: int) -> str | None:
+        """
+        Next task id of `worker`, or `None` when no task is left (or the scheduler is cancelled).
+        """
+        with self._lock:
+            if self._cancelled:
+                return None
+
+            if self._queues[worker]:
+                task_id = self._queues[worker].popleft()
+                self._loads[worker] -= self.predictions.get(task_id, 0.0)
+                return task_id
+
+            # work stealing : take the shortest task of the busiest worker
+            victim = max(range(self.num_workers), key=lambda index: (len(self._queues[index]) > 0, self._loads[index]))
+            if not self._queues[victim]:
+                return None
+            task_id = self._queues[victim].pop()
+            self._loads[victim] -= self.predictions.get(task_id, 0.0)
+            return task_id
+
+    def peek(self, worker: int, k: int = 1) -> List[str]:
+        """
+        Next `k` task ids in the queue of `worker` (they may still be stolen by other workers).
+        """
+        with self._lock:
+            return list(islice(self._queues[worker], k))
+
+    def cancel(self) -> None:
+        """
+        Stop handing out tasks (running tasks are not interrupted).
+        """
+        with self._lock:
+            self._cancelled = True
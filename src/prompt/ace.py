@@ -1,15 +1,33 @@
-from pathlib import Path
+from .registry import load_prompt
 
-GENERATOR_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/ace/generator_system.txt").read_text(encoding='utf-8')
-GENERATOR_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/ace/generator_input.txt").read_text(encoding='utf-8')
-GENERATOR_RESPONSE_MODULE_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/ace/generator_response_module_system.txt").read_text(encoding='utf-8')
-GENERATOR_RESPONSE_MODULE_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/ace/generator_response_module_input.txt").read_text(encoding='utf-8')
+# templates are read from disk on first use (see registry.py)
+GENERATOR_SYSTEM_PROMPT = load_prompt("ace/generator_system.txt")
+# not `escaped` : example code in this template has literal braces (e.g. f"Expected {expected_count}")
+GENERATOR_INPUT_PROMPT = load_prompt(
+    "ace/generator_input.txt",
+    placeholders=('playbook', 'first_name', 'last_name', 'email', 'phone_number', 'instruction')
+)
+# response module : converts final (free-form) answer of a ReAct-style module into its response model
+GENERATOR_RESPONSE_MODULE_SYSTEM_PROMPT = load_prompt("ace/generator_response_module_system.txt")
+GENERATOR_RESPONSE_MODULE_INPUT_PROMPT = load_prompt(
+    "ace/generator_response_module_input.txt",
+    placeholders=('response',),
+    escaped=True
+)
 
-REFLECTOR_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/ace/reflector_system.txt").read_text(encoding='utf-8')
-REFLECTOR_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/ace/reflector_input.txt").read_text(encoding='utf-8')
+REFLECTOR_SYSTEM_PROMPT = load_prompt("ace/reflector_system.txt")
+REFLECTOR_INPUT_PROMPT = load_prompt(
+    "ace/reflector_input.txt",
+    placeholders=('instruction', 'trajectory', 'playbook'),
+    escaped=True
+)
 
-REFLECTOR_WITH_GT_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/ace/reflector_with_gt_system.txt").read_text(encoding='utf-8')
-REFLECTOR_WITH_GT_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/ace/reflector_with_gt_input.txt").read_text(encoding='utf-8')
+REFLECTOR_WITH_GT_SYSTEM_PROMPT = load_prompt("ace/reflector_with_gt_system.txt")
+REFLECTOR_WITH_GT_INPUT_PROMPT = load_prompt("ace/reflector_with_gt_input.txt")
 
-CURATOR_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/ace/curator_system.txt").read_text(encoding='utf-8')
-CURATOR_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/ace/curator_input.txt").read_text(encoding='utf-8')
\ No newline at end of file
+CURATOR_SYSTEM_PROMPT = load_prompt("ace/curator_system.txt")
+CURATOR_INPUT_PROMPT = load_prompt(
+    "ace/curator_input.txt",
+    placeholders=('instruction', 'playbook', 'reflection'),
+    escaped=True
+)
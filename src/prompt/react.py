@@ -1,4 +1,9 @@
-from pathlib import Path
+from .registry import load_prompt
 
-SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/react/system.txt").read_text(encoding='utf-8')
-INPUT_PROMPT = Path(__file__).parent.joinpath("templates/react/input.txt").read_text(encoding='utf-8')
\ No newline at end of file
+# templates are read from disk on first use (see registry.py)
+SYSTEM_PROMPT = load_prompt("react/system.txt")
+INPUT_PROMPT = load_prompt(
+    "react/input.txt",
+    placeholders=('first_name', 'last_name', 'email', 'phone_number', 'instruction'),
+    escaped=True
+)
@@ -1,10 +1,32 @@
-from pathlib import Path
+from .registry import load_prompt
 
-ACTOR_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/actor_input.txt").read_text(encoding="utf-8")
-ACTOR_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/actor_system.txt").read_text(encoding="utf-8")
+# templates are read from disk on first use (see registry.py)
+ACTOR_INPUT_PROMPT = load_prompt(
+    "reflexion/actor_input.txt",
+    placeholders=('first_name', 'last_name', 'email', 'phone_number', 'instruction', 'reflection_history'),
+    escaped=True
+)
+ACTOR_SYSTEM_PROMPT = load_prompt("reflexion/actor_system.txt")
 
-REFLECTOR_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/reflector_system.txt").read_text(encoding="utf-8")
-REFLECTOR_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/reflector_input.txt").read_text(encoding="utf-8")
+REFLECTOR_SYSTEM_PROMPT = load_prompt("reflexion/reflector_system.txt")
+# offline batch mode : single call without tools, reflection is kept for later tasks
+REFLECTOR_BATCH_SYSTEM_PROMPT = load_prompt("reflexion/reflector_batch_system.txt")
+REFLECTOR_INPUT_PROMPT = load_prompt(
+    "reflexion/reflector_input.txt",
+    placeholders=(
+        'first_name', 'last_name', 'email', 'phone_number', 'instruction',
+        'evaluation_report', 'reflection_history', 'trajectory'
+    ),
+    escaped=True
+)
 
-REFLECTOR_WITH_GT_SYSTEM_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/reflector_with_gt_system.txt").read_text(encoding="utf-8")
-REFLECTOR_WITH_GT_INPUT_PROMPT = Path(__file__).parent.joinpath("templates/reflexion/reflector_with_gt_input.txt").read_text(encoding="utf-8")
\ No newline at end of file
+REFLECTOR_WITH_GT_SYSTEM_PROMPT = load_prompt("reflexion/reflector_with_gt_system.txt")
+REFLECTOR_WITH_GT_INPUT_PROMPT = load_prompt(
+    "reflexion/reflector_with_gt_input.txt",
+    placeholders=(
+        'first_name', 'last_name', 'email', 'phone_number', 'instruction', 'failure_report', 'reflection_history',
+        'ground_truth_api_calls', 'ground_truth_required_apis', 'ground_truth_required_apps', 'ground_truth_code',
+        'trajectory'
+    ),
+    escaped=True
+)
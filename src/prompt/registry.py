@@ -0,0 +1,157 @@
+import hashlib
+import importlib
+import re
+import string
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+TEMPLATE_DIR = Path(__file__).parent.joinpath("templates")
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Precompiled prompt template
+# ------------------------------------------------------------------------------------------------------------------
+class PromptTemplate:
+    """
+    Prompt template that is read from disk on first use and pre-split into static and dynamic segments.
+
+    - `placeholders` are declared up front. A declared placeholder missing from the template (or, for
+      `escaped` templates, a placeholder in the template that is not declared) raises ValueError when
+      the template is loaded, not in the middle of a run.
+    - `escaped=True` : template follows `str.format` syntax (`{{` / `}}` are literal braces).
+      `escaped=False` : only `{name}` of declared placeholders is substituted and every other brace is
+      literal text (system prompts and examples full of JSON / jinja-style `{{ ... }}`).
+    - `render(**values)` only joins the static segments with the dynamic values. Values must match the
+      declared placeholders exactly (a missing or undeclared key raises ValueError).
+    - `static_prefix` / `prefix_hash` : the part before the first placeholder, which is identical for
+      every render (what provider-side prompt caching can reuse).
+    """
+    def __init__(
+        self,
+        path: str,
+        placeholders: Sequence[str] = (),
+        escaped: bool = False
+    ) -> None:
+        self.path = path
+        self.placeholders: Tuple[str, ...] = tuple(placeholders)
+        self.escaped = escaped
+
+        # filled on first use (loading twice from two threads yields the same result, so no lock)
+        self._segments: Tuple[str, ...] | None = None
+        self._fields: Tuple[str, ...] = ()
+        self._prefix_hash: str | None = None
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.path!r}, placeholders={self.placeholders})"
+
+    # --------------------------------------------------------------------------------------------------------
+    # Load / precompile
+    # --------------------------------------------------------------------------------------------------------
+    def _load(self) -> Tuple[str, ...]:
+        if self._segments is not None:
+            return self._segments
+
+        text = TEMPLATE_DIR.joinpath(self.path).read_text(encoding='utf-8')
+        segments, fields = self._split_escaped(text) if self.escaped else self._split_literal(text)
+
+        missing = set(self.placeholders) - set(fields)
+        if missing:
+            raise ValueError(f"Prompt template '{self.path}' has no placeholder for : {sorted(missing)}")
+
+        self._fields = tuple(fields)
+        self._segments = tuple(segments)
+        return self._segments
+
+    def _split_escaped(self, text: str) -> Tuple[List[str], List[str]]:
+        segments, fields = [""], []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            segments[-1] += literal
+            if field is None:
+                continue
+            if field not in self.placeholders:
+                raise ValueError(f"Prompt template '{self.path}' has undeclared placeholder : {{{field}}}")
+            if format_spec or conversion:
+                raise ValueError(f"Prompt template '{self.path}' uses unsupported format spec in {{{field}}}")
+            fields.append(field)
+            segments.append("")
+        return segments, fields
+
+    def _split_literal(self, text: str) -> Tuple[List[str], List[str]]:
+        if not self.placeholders:
+            return [text], []
+
+        pattern = re.compile(r"\{(" + "|".join(re.escape(name) for name in self.placeholders) + r")\}")
+        parts = pattern.split(text)
+        # re.split with one group alternates static text and placeholder names
+        return parts[0::2], parts[1::2]
+
+    # --------------------------------------------------------------------------------------------------------
+    # Render
+    # --------------------------------------------------------------------------------------------------------
+    def render(self, **values: Any) -> str:
+        segments = self._load()
+
+        # caller / template drift fails loudly instead of sending a prompt without (or with unused) values
+        undeclared = set(values) - set(self.placeholders)
+        if undeclared:
+            raise ValueError(f"Prompt template '{self.path}' has no placeholder for : {sorted(undeclared)}")
+        missing = set(self.placeholders) - set(values)
+        if missing:
+            raise ValueError(f"Prompt template '{self.path}' is rendered without : {sorted(missing)}")
+
+        if not self._fields:
+            return segments[0]
+
+        parts = [segments[0]]
+        for field, segment in zip(self._fields, segments[1:]):
+            parts.append(f"{values[field]}")
+            parts.append(segment)
+        return "".join(parts)
+
+    def __str__(self) -> str:
+        # template without placeholders (system prompt) is its own rendering
+        return self.render()
+
+    @property
+    def static_prefix(self) -> str:
+        return self._load()[0]
+
+    @property
+    def prefix_hash(self) -> str:
+        if self._prefix_hash is None:
+            self._prefix_hash = hashlib.sha256(self.static_prefix.encode('utf-8')).hexdigest()[:16]
+        return self._prefix_hash
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Registry
+# ------------------------------------------------------------------------------------------------------------------
+_registry: Dict[str, PromptTemplate] = {}
+
+
+def load_prompt(
+    path: str,
+    placeholders: Sequence[str] = (),
+    escaped: bool = False
+) -> PromptTemplate:
+    """
+    Get (lazy) prompt template of '{TEMPLATE_DIR}/{path}'. Nothing is read from disk until first render.
+    """
+    if path not in _registry:
+        _registry[path] = PromptTemplate(path=path, placeholders=placeholders, escaped=escaped)
+    return _registry[path]
+
+
+def validate_prompts(groups: Sequence[str] = None) -> None:
+    """
+    Load templates of prompt modules `groups` (e.g. ('ace', 'structured')), or every registered template.
+
+    Raises ValueError on placeholder mismatch, so callers check at startup instead of at first render.
+    Templates of other groups stay unread.
+    """
+    for group in groups or ():
+        importlib.import_module(f"{__package__}.{group}")       # prompt modules register their templates on import
+
+    for path, template in list(_registry.items()):
+        if groups is None or path.split('/', 1)[0] in groups:
+            template._load()
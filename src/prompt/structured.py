@@ -0,0 +1,9 @@
+from .registry import load_prompt
+
+# templates are read from disk on first use (see registry.py)
+REASK_SYSTEM_PROMPT = load_prompt("structured/reask_system.txt")
+REASK_INPUT_PROMPT = load_prompt(
+    "structured/reask_input.txt",
+    placeholders=('error', 'output'),
+    escaped=True
+)
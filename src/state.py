@@ -1,18 +1,26 @@
-from typing import Annotated, Sequence, List, Dict, Any, TypedDict
+from typing import Annotated, Sequence, Dict, Any, TypedDict
 from operator import add
 
-from langchain.messages import AnyMessage
-
-from langgraph.graph.message import add_messages
-
 from .core.playbook import PlayBook
+from .core.evaluation import EvaluationResult
+from .utils.messages import MessageLog, append_messages
 
 
 # -----------------------------------------------------------------------------------------------------
 # ReAct Agent State
 # -----------------------------------------------------------------------------------------------------
 class ReActState(TypedDict):
-    messages: Annotated[List[AnyMessage], add_messages]
+    messages: Annotated[MessageLog, append_messages]
+
+    # set by tool node from AppWorld state after state-changing code is executed
+    task_completed: bool
+
+    # failures seen by model router (escalates to stronger model tier)
+    consecutive_errors: int         # steps in a row whose observation is an error (set by tool node)
+    failed_attempts: int            # failed attempts of the task before this run (set by Reflexion / ACE)
+
+    # final answer of modules with response model (set by response node, e.g. ACE reflector)
+    structured_response: Dict[str, Any]
     
     # field for track token usages
     input_tokens: Annotated[int, add]
@@ -26,11 +34,11 @@ class ReActState(TypedDict):
 # Reflexion Agent State
 # -----------------------------------------------------------------------------------------------------
 class ReflexionState(TypedDict):
-    messages: Annotated[List[AnyMessage], add_messages]
+    messages: Annotated[MessageLog, append_messages]
 
     # fields for reflexion agent
-    trajectory: Sequence[AnyMessage]
-    evaluation: str
+    trajectory: MessageLog
+    evaluation: EvaluationResult
     reflections: Annotated[Sequence[str], add]
 
     # field for track token usages
@@ -45,14 +53,15 @@ class ReflexionState(TypedDict):
 # ACE (Agentic Context Engineering) Agent State
 # -----------------------------------------------------------------------------------------------------
 class ACEState(TypedDict):
-    messages: Annotated[List[AnyMessage], add_messages]
+    messages: Annotated[MessageLog, append_messages]
 
     # field for ace agent
-    trajectory: Sequence[AnyMessage]
-    evaluation: str
+    trajectory: MessageLog
+    evaluation: EvaluationResult
     playbook: PlayBook
     reflection: Dict[str, Any]
     curation: Dict[str, Any]
+    num_reflections: Annotated[int, add]
 
 
     # field for track token usages
@@ -0,0 +1,105 @@
+import argparse
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+ROOT = Path(__file__).resolve().parents[2]
+
+MODEL = 'gpt-4.1-mini'
+PROMPT_TOKENS = 1000
+COMPLETION_TOKENS = 100
+
+
+class Verdict(BaseModel):
+    label: str
+    score: int
+
+
+def _stub_handler(reask_system_prompt: str):
+    # request body -> chat completion body. the case of a request is the content of its last message.
+    def handler(body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body['messages']
+        case = messages[-1]['content']
+        if messages[0]['content'] == reask_system_prompt:
+            content = '{"label": "reasked", "score": 2}'
+        elif case == 'text':
+            content = "plain text"
+        elif case == 'schema':
+            content = '```json\n{"label": "parsed", "score": 1,}\n```'       # near-valid output, repaired locally
+        elif case == 'reask':
+            content = '{"label": "reasked"}'                                   # missing field -> one re-ask
+        else:
+            raise RuntimeError(f"stub failure of case '{case}'")
+
+        return {
+            'choices' : [{'message' : {'role' : 'assistant', 'content' : content}}],
+            'usage' : {'prompt_tokens' : PROMPT_TOKENS, 'completion_tokens' : COMPLETION_TOKENS}
+        }
+    return handler
+
+
+def _run_queue(discounted: bool) -> List[str]:
+    from langchain.messages import HumanMessage
+
+    from src.core.batch import BatchQueue, LocalBatchBackend
+    from src.core.router import ModelRouter
+    from src.prompt.structured import REASK_SYSTEM_PROMPT
+    from src.utils.token_usage import BATCH_PRICE_RATIO, calc_token_price
+
+    backend = LocalBatchBackend(handler=_stub_handler(str(REASK_SYSTEM_PROMPT)))
+    backend.discounted = discounted
+    queue = BatchQueue(backend=backend, router=ModelRouter.single({'model' : MODEL}), max_batch_size=2, poll_interval=0.0)
+
+    results: Dict[str, Any] = {}
+    for case, schema in (('text', None), ('schema', Verdict), ('reask', Verdict), ('failed', Verdict)):
+        queue.submit(
+            node=case,
+            tier='default',
+            messages=[HumanMessage(content=case)],
+            on_result=lambda result, case=case: results.__setitem__(case, result),
+            schema=schema
+        )
+    queue.drain(timeout=10.0)
+
+    errors = []
+    expected = {'text' : "plain text", 'schema' : Verdict(label='parsed', score=1), 'reask' : Verdict(label='reasked', score=2)}
+    if results != expected:
+        errors.append(f"results {results} != {expected}")
+    if len(queue) != 0:
+        errors.append(f"{len(queue)} requests left in queue")
+
+    # text + schema + reask (invalid output and its re-ask) are billed, the failed request is not
+    call_type = 'batch' if discounted else 'sync'
+    price = calc_token_price(MODEL, PROMPT_TOKENS, COMPLETION_TOKENS)['total_token_price']
+    expected_cost = 4 * price * (BATCH_PRICE_RATIO if discounted else 1.0)
+    breakdown = queue.ledger.breakdown(by='call_type')
+    if list(breakdown) != [call_type]:
+        errors.append(f"call types {list(breakdown)} != ['{call_type}']")
+    elif breakdown[call_type]['calls'] != 4 or not math.isclose(breakdown[call_type]['cost'], expected_cost):
+        errors.append(f"ledger {json.dumps(breakdown[call_type])} != 4 calls, cost {expected_cost}")
+    return errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="BatchQueue with stub LocalBatchBackend : schema parsing, re-ask, failed requests and ledger pricing.")
+    parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+
+    failed = False
+    for name, discounted in (('local (full price)', False), ('discounted', True)):
+        errors = _run_queue(discounted)
+        status = "❌" if errors else "✅"
+        print(f"{status} {name}")
+        for error in errors:
+            print(f"    📍 {error}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
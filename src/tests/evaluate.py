@@ -1,15 +1,26 @@
-from ..agents.react import ReActAgent
-from ..agents.reflexion import ReflexionAgent
-from ..agents.ace import ACEAgent
-from ..utils.token_usage import calc_token_price
-from ..prompt.react import SYSTEM_PROMPT, INPUT_PROMPT
-from ..core.playbook import PlayBook
+from ..utils.token_usage import UsageLedger
+from ..utils.results import ResultWriter
+from ..utils.budget import BudgetController
+from ..core.evaluation import EvaluationResult
+from ..prompt.registry import validate_prompts
 
-from langchain.messages import HumanMessage
+import time
+from threading import Lock
+from typing import Literal, List, Dict, TYPE_CHECKING
 
-from typing import Literal, List, Dict
+# agent modules, appworld and heavy libraries (numpy, langgraph, embeddings) are imported where they are
+# first needed, only for the selected agent type. keeps CLI / worker startup short (see tests/import_time.py)
+if TYPE_CHECKING:
+    from ..core.playbook import PlayBook
+    from ..core.reflection_store import ReflectionStore
+
+# prompt modules used by each agent type (templates checked when the evaluator starts)
+PROMPT_GROUPS = {
+    'react' : ('react',),
+    'reflexion' : ('react', 'reflexion', 'structured'),
+    'ace' : ('react', 'ace', 'structured')
+}
 
-from appworld import AppWorld, load_task_ids
 
 class AppWorldEvalator:
     def __init__(
@@ -22,142 +33,516 @@ class AppWorldEvalator:
             'model' : 'gpt-4o',
             'temperature' : 0.0,
             'stream_usage' : True
-        }
+        },
+        save_dir: str = "./evaluation_results",
+        resume: bool = False,
+        task_budget: Dict[str, int | float] = {
+            'max_steps' : 100
+        },
+        experiment_budget: Dict[str, int | float] = {},
+        num_samples: int = 1,
+        sample_temperature: float = 0.7,
+        playbook_store_path: str = None,
+        checkpoint_path: str = None,
+        num_workers: int = 1,
+        schedule_history: List[str] = (),
+        prefetch_envs: int = None,
+        sandbox_config: Dict[str, int | float] = None,
+        router_config: Dict[str, object] = None,
+        batch_config: Dict[str, object] = None,
+        task_ids: List[str] = None,
+        playbook: "PlayBook" = None,
+        reflection_store: "ReflectionStore" = None,
+        frozen: bool = False
     ) -> None:
         self.agent_type = agent_type
+        # placeholder drift of this agent's templates fails here, not in the middle of a run
+        validate_prompts(PROMPT_GROUPS.get(agent_type, ()))
         self.experiment_name = experiment_name
         self.model_config = model_config
+        self.num_samples = num_samples          # number of parallel ReAct trajectories per task (best-of-N)
+        # temperature of best-of-N samples whose tier is configured greedy (temperature 0)
+        self.sample_temperature = sample_temperature
+        self._sample_routers = None
+
+        # model tier per node role / step type ('tiers', 'routes', 'escalate_after'). `None` uses `model_config`
+        # for every call. llm clients are created once and shared by every task.
+        self.router_config = router_config
+        self._router = None
+
+        # offline batch mode ('backend' : 'openai' | 'local', 'work_dir', 'max_batch_size', 'poll_interval').
+        # reflector / curator calls of failed tasks are deferred to batch api, results are applied between tasks.
+        self.batch_config = batch_config
+        self.batch_queue = None
+        if batch_config is not None and agent_type not in ('reflexion', 'ace'):
+            raise ValueError("Batch mode is only available for 'reflexion' and 'ace' agents.")
+        if batch_config is not None and agent_type == 'ace' and playbook_store_path is None:
+            raise ValueError("Batch mode of ACE needs a shared playbook store ('playbook_store_path').")
+        if batch_config is not None and frozen:
+            raise ValueError("Batch mode learns from failed tasks, it can not be combined with frozen inference.")
 
-        self.task_ids: List[str] = load_task_ids(dataset_name=dataset_type)
+        # number of tasks run in parallel, and earlier result files used to predict task durations
+        self.num_workers = num_workers
+        self.schedule_history = list(schedule_history)
+        # inference with carried-over state only read : generator / actor with the given playbook or
+        # reflections, no evaluator / learning nodes inside the agent and no embedding model
+        self.frozen = frozen
+        if num_workers > 1 and agent_type == 'ace' and playbook_store_path is None and not frozen:
+            raise ValueError("Parallel ACE workers need a shared playbook store ('playbook_store_path').")
+        # run AppWorld sessions in sandbox worker processes (cpu_seconds, max_output_chars, max_memory_mb).
+        # `None` runs them in this process.
+        self.sandbox_config = sandbox_config
+        self.sandbox = None
+        # number of AppWorld environments prepared in background ahead of the running tasks
+        # (default : one with sandbox workers, none in this process)
+        self.prefetch_envs = prefetch_envs if prefetch_envs is not None else (1 if sandbox_config is not None else 0)
+        self.env_pool = None
+        # AppWorld keeps process-global state (frozen clock, app databases) : sessions that are open at the
+        # same time (parallel tasks, prefetched environments) must live in separate sandbox processes
+        if sandbox_config is None and (num_workers > 1 or self.prefetch_envs > 0):
+            raise ValueError("Parallel workers and prefetched environments need sandbox workers ('sandbox_config').")
+        if agent_type == 'react' and num_samples > 1 and sandbox_config is None:
+            # AppWorld keeps process-global state (frozen clock, app databases) : one session per process
+            raise ValueError("Best-of-N samples run AppWorld sessions at the same time, they need sandbox workers ('sandbox_config').")
+        if agent_type == 'react' and num_samples > 1 and sample_temperature <= 0:
+            raise ValueError(f"Best-of-N samples need a positive 'sample_temperature', got {sample_temperature}.")
+        # guards result file and experiment counters shared by workers
+        self._lock = Lock()
+
+        # explicit task ids (e.g. one shard of a training epoch) instead of the whole dataset split
+        if task_ids is None:
+            from appworld import load_task_ids
+            task_ids = load_task_ids(dataset_name=dataset_type)
+        self.task_ids: List[str] = list(task_ids)
         if first_k_task:
             self.task_ids = self.task_ids[:first_k_task]
 
-        self.result: Dict[str, Dict[str, str | int | float]] = {}
+        # per-task records are streamed to '{save_dir}/{experiment_name}.jsonl' as each task finishes
+        self.writer = ResultWriter(
+            save_dir=save_dir, 
+            experiment_name=experiment_name,
+            overwrite=not resume
+        )
 
         if self.agent_type == 'ace':
-            self.playbook:PlayBook = None       # playbook that retain over task ids in ACEAgent
+            from ..core.playbook_store import PlayBookStore
+            self.playbook: "PlayBook" = playbook   # playbook that retain over task ids in ACEAgent (initial playbook, if given)
+            # playbook shared with other ACE workers (SQLite WAL store). it replaces the in-memory playbook.
+            self.playbook_store = None if playbook_store_path is None else PlayBookStore(playbook_store_path)
         elif self.agent_type == 'reflexion':
-            self.reflections:List[str] = None     # reflection that retain over task ids in ReflexionAgent
+            from ..core.reflection_store import ReflectionStore
+            # bounded reflection store that retain over task ids in ReflexionAgent (loaded reflection set, if given)
+            self.reflection_store = reflection_store if reflection_store is not None else ReflectionStore()
+
+        # experiment level usage ledger. task ledgers propagate their records into this ledger.
+        self.ledger = UsageLedger()
+        # usage of batch results (arrive after their task is recorded, so kept in carried-over state)
+        self.batch_ledger = UsageLedger(parent=self.ledger)
+        self.num_succeed = 0
+
+        # budget limits (max_steps, max_tokens, max_cost, max_seconds) per task and per experiment
+        self.task_budget = task_budget
+        self.budget = BudgetController(**experiment_budget, ledger=self.ledger)
+
+        # durable checkpoints of running task (optional). with `resume`, an interrupted task continues
+        # from its last completed node instead of starting over.
+        self.resume = resume
+        self.checkpointer = None
+        if checkpoint_path is not None:
+            from ..core.checkpoint import SQLiteCheckpointSaver
+            self.checkpointer = SQLiteCheckpointSaver(checkpoint_path)
+
+        self.completed_task_ids = set()
+        if resume:
+            self._restore()
+
+    # ----------------------------------------------------------------------------------------
+    # Resume : skip completed task ids and restore carried-over state
+    # ----------------------------------------------------------------------------------------
+    def _restore(self) -> None:
+        # record of a task whose state was saved right before a crash (state already learned from it)
+        self.writer.recover()
+        for record in self.writer.read():
+            self.completed_task_ids.add(record['task_id'])
+            self.num_succeed += int(record['task_status'])
+            self.ledger.load(record.get('usage', []))
+
+        state = self.writer.load_state()
+        if state is None:
+            return
+
+        self.batch_ledger.load(state.get('batch_usage', []))
         
-    def evaluate(self) -> Dict[str, Dict[str, str | int | float]]:
+        if self.agent_type == 'ace' and state.get('playbook') is not None:
+            from ..core.playbook import PlayBook
+            self.playbook = PlayBook.from_dict(state['playbook'], version=state.get('playbook_version', 0))
+        elif self.agent_type == 'reflexion' and state.get('reflection_store') is not None:
+            from ..core.reflection_store import ReflectionStore
+            self.reflection_store = ReflectionStore.from_dict(state['reflection_store'])
 
+    def _get_carried_state(self) -> Dict[str, object]:
+        state = {'batch_usage' : self.batch_ledger.to_list()} if self.batch_config is not None else {}
+        if self.agent_type == 'ace' and self.playbook_store is not None:
+            return state       # shared playbook is already durable in store
+        elif self.agent_type == 'ace' and self.playbook is not None:
+            return {**state, 'playbook_version' : self.playbook.version, 'playbook' : self.playbook.to_dict()}
+        elif self.agent_type == 'ace':
+            return {**state, 'playbook' : None}
+        elif self.agent_type == 'reflexion':
+            return {**state, 'reflection_store' : self.reflection_store.to_dict()}
+        return state
+        
+    def evaluate(self) -> Dict[str, str | int]:
+        pending_task_ids = []
         for task_id in self.task_ids:
-            print(f"⏳ Start task '{task_id}'...")
-            # ----------------------------------------------------------------------------------------
-            # get AppWorld instance with current 'task_id'
-            # ----------------------------------------------------------------------------------------
-            env = AppWorld(
-                task_id=task_id, 
-                ground_truth_mode='full',
-                random_seed=42,
-                experiment_name=self.experiment_name
-            )
+            if task_id in self.completed_task_ids:
+                print(f"⏭️  Skip task '{task_id}' (already completed).")
+            else:
+                pending_task_ids.append(task_id)
+
+        from contextlib import ExitStack
+        from ..core.env_pool import EnvironmentPool
 
-            # ----------------------------------------------------------------------------------------
-            # initialize agent instance with current task AppWorld instance
-            # ----------------------------------------------------------------------------------------
-            if self.agent_type == 'react':                                    # ReAct Agent
-                agent = ReActAgent(
-                    env=env, 
-                    system_prompt=SYSTEM_PROMPT,
-                    model_config=self.model_config
-                )
-            elif self.agent_type == 'reflexion':                              # Reflexion Agent
-                agent = ReflexionAgent(
-                    env=env,
-                    model_config=self.model_config
-                )
-            elif self.agent_type == 'ace':                                    # ACE Agent
-                agent = ACEAgent(
-                    env=env,
-                    model_config=self.model_config
-                )
+        with ExitStack() as stack:
+            if self.sandbox_config is not None:
+                from ..core.sandbox import SandboxPool
+                # one session per running task (and best-of-N sample) and per prefetched environment
+                self.sandbox = stack.enter_context(SandboxPool(
+                    max_workers=self.num_workers * self.num_samples + self.prefetch_envs,
+                    **self.sandbox_config
+                ))
+            self.env_pool = stack.enter_context(EnvironmentPool(self._create_env, prefetch=self.prefetch_envs))
+            if self.batch_config is not None:
+                self.batch_queue = self._create_batch_queue()
+
+            if self.num_workers == 1:
+                # dataset order (carried-over playbook / reflections evolve in a reproducible order)
+                for index, task_id in enumerate(pending_task_ids):
+                    if self.budget.exceeded():
+                        break
+                    self._run_task(task_id, upcoming=pending_task_ids[index + 1 : index + 1 + self.prefetch_envs])
             else:
-                raise ValueError("Unknown Agent Type. It must be one of : 'react', 'reflexion', 'ace'")
-            
-
-            # ----------------------------------------------------------------------------------------
-            # run agent on current task
-            # ----------------------------------------------------------------------------------------
-
-            # create input state for agent
-            if self.agent_type == 'react':                                         # ReAct Agent input state
-                input_state = {
-                    'messages' : [
-                        HumanMessage(
-                            content=INPUT_PROMPT.format(
-                                first_name = agent.env.task.supervisor.first_name,
-                                last_name = agent.env.task.supervisor.last_name,
-                                email = agent.env.task.supervisor.email,
-                                phone_number = agent.env.task.supervisor.phone_number,
-                                instruction = agent.env.task.instruction
-                        ))
-                    ],
-                }
-            elif self.agent_type == 'reflexion':                                   # Reflexion Agent input state
-                input_state = {'reflections' : [] if self.reflections == None else self.reflections}
-            elif self.agent_type == 'ace':                                         # ACE Agent input state
-                input_state = {'playbook' : {} if not self.playbook == None else self.playbook}
-
-            # run agent on task
-            result = agent.invoke(input_state)
-
-            # ----------------------------------------------------------------------------------------
-            # get metadata of current agent run
-            # ----------------------------------------------------------------------------------------
-
-            if self.agent_type == 'reflexion':
-                self.reflections = result['reflections']
-            elif self.agent_type == 'ace':
-                self.playbook = result['playbook']
-
-            # get agent latency
-            latency = result['latency']
-
-            # get token usage info
-            input_tokens = result['input_tokens']
-            output_tokens = result['output_tokens']
-            total_tokens = result['total_tokens']
-
-            # calculate price with used tokens
-            price = calc_token_price(
-                model='gpt-4o',
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
+                self._run_parallel(pending_task_ids)
+            print(f"📌 Waited {self.env_pool.wait_seconds:.1f}s in total for AppWorld environments.")
+
+        if self.batch_queue is not None:
+            # deferred reflections / curations of the last tasks (carried-over state is saved once more)
+            print(f"⏳ Wait for {len(self.batch_queue)} deferred batch requests...")
+            self.batch_queue.drain()
+            with self._lock:
+                self.writer.save_state(self._get_carried_state())
+
+        if self.budget.stop_reason is not None:
+            print(f"🛑 Stop experiment : {self.budget.stop_reason}")
+        else:
+            print(f"✅ All {len(self.task_ids)} tasks are completed!")
+
+        return {
+            'result_path' : self.writer.result_path,
+            'num_tasks' : len(self.completed_task_ids),
+            'num_succeed' : self.num_succeed,
+            **self.get_running_totals()
+        }
+
+    # ----------------------------------------------------------------------------------------
+    # Parallel sweep : longest-first scheduling with work stealing
+    # ----------------------------------------------------------------------------------------
+    def _run_parallel(self, task_ids: List[str]) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+        from ..core.scheduler import TaskScheduler, predict_task_costs
+
+        predictions = predict_task_costs(task_ids, history_paths=self.schedule_history)
+        scheduler = TaskScheduler(task_ids, predictions=predictions, num_workers=self.num_workers)
+        print(f"📌 Scheduled {len(task_ids)} tasks on {self.num_workers} workers (predicted makespan : {scheduler.predicted_makespan:.1f})")
+
+        def _worker(index: int) -> None:
+            try:
+                while not self.budget.exceeded():
+                    task_id = scheduler.next(index)
+                    if task_id is None:
+                        break
+                    self._run_task(task_id, upcoming=scheduler.peek(index, self.prefetch_envs))
+            except Exception as error:
+                scheduler.cancel()      # other workers finish their running task and stop
+                raise error
+
+        with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix='task') as executor:
+            futures = [executor.submit(_worker, index) for index in range(self.num_workers)]
+            for future in futures:
+                future.result()
+
+    def _get_router(self):
+        with self._lock:
+            if self._router is None:
+                from ..core.router import ModelRouter
+                if self.router_config is None:
+                    self._router = ModelRouter.single(self.model_config)
+                else:
+                    self._router = ModelRouter(**self.router_config)
+            return self._router
+
+    def _get_sample_routers(self):
+        router = self._get_router()
+        with self._lock:
+            if self._sample_routers is None:
+                from ..agents.best_of_n import get_sample_routers
+                self._sample_routers = get_sample_routers(router, self.num_samples, temperature=self.sample_temperature)
+            return self._sample_routers
+
+    def _create_batch_queue(self):
+        from ..core.batch import BatchQueue, LocalBatchBackend, OpenAIBatchBackend
+
+        config = dict(self.batch_config)
+        backend = config.pop('backend', 'openai')
+        work_dir = config.pop('work_dir', './batch_jobs')
+        if backend == 'openai':
+            backend = OpenAIBatchBackend(work_dir=work_dir)
+        elif backend == 'local':
+            backend = LocalBatchBackend()
+        else:
+            raise ValueError(f"Unknown batch backend : {backend}. It must be one of : 'openai', 'local'")
+        return BatchQueue(backend=backend, router=self._get_router(), ledger=self.batch_ledger, **config)
+
+    # ----------------------------------------------------------------------------------------
+    # AppWorld environments (prepared ahead of time by environment pool)
+    # ----------------------------------------------------------------------------------------
+    def _create_env(self, task_id: str, experiment_name: str = None):
+        config = {
+            'task_id' : task_id,
+            'ground_truth_mode' : 'full',
+            'random_seed' : 42,
+            'experiment_name' : experiment_name or self.experiment_name
+        }
+        if self.sandbox is not None:
+            return self.sandbox.open(**config)
+
+        from appworld import AppWorld
+        return AppWorld(**config)
+
+    # ----------------------------------------------------------------------------------------
+    # Run agent on one task and record result
+    # ----------------------------------------------------------------------------------------
+    def _run_task(self, task_id: str, upcoming: List[str] = ()) -> None:
+        print(f"⏳ Start task '{task_id}'...")
+
+        # get AppWorld instance with current 'task_id' (usually prepared while previous task was running)
+        start = time.perf_counter()
+        env = self.env_pool.acquire(task_id, upcoming=upcoming)
+        env_wait_seconds = time.perf_counter() - start
+
+        # environment is closed as soon as task is done (best-of-N keeps the environment of its best sample)
+        kept_env = env
+        try:
+            kept_env = self._run_agent(task_id, env, env_wait_seconds)
+        finally:
+            self.env_pool.release(kept_env)
+
+        # results of finished batch jobs are applied before next task (playbook / reflections learned so far)
+        if self.batch_queue is not None and self.batch_queue.poll() > 0:
+            with self._lock:
+                self.writer.save_state(self._get_carried_state())
+
+    def _run_agent(self, task_id: str, env, env_wait_seconds: float):
+        # usage ledger and budget controller of current task
+        ledger = UsageLedger(parent=self.ledger)
+        budget = BudgetController(**self.task_budget, ledger=ledger, parent=self.budget)
+
+        # checkpointing (not used for best-of-N, whose samples run as independent graphs)
+        checkpointer, thread_id, resuming = None, None, False
+        if self.checkpointer is not None and not (self.agent_type == 'react' and self.num_samples > 1):
+            from ..core.checkpoint import JournaledEnvironment
+            checkpointer, thread_id = self.checkpointer, f"{self.experiment_name}/{task_id}"
+            resuming = self.resume and checkpointer.has_checkpoint(thread_id)
+            if not resuming:
+                checkpointer.delete_thread(thread_id)
+            env = JournaledEnvironment(env, checkpointer=checkpointer, thread_id=thread_id)
+            if resuming:
+                # restore environment state up to last checkpoint before graph state is resumed
+                env.replay(checkpointer.resume_journal(thread_id))
+                print(f"🔁 Resume task '{task_id}' from last checkpoint.")
+
+        # ----------------------------------------------------------------------------------------
+        # initialize agent instance with current task AppWorld instance
+        # ----------------------------------------------------------------------------------------
+        if self.agent_type == 'react' and self.num_samples > 1:           # Best-of-N ReAct Agent
+            from ..agents.best_of_n import BestOfNAgent
+            from ..prompt.react import SYSTEM_PROMPT
+            agent = BestOfNAgent(
+                env=env,
+                env_factory=lambda index: self._create_env(task_id, experiment_name=f"{self.experiment_name}_sample_{index}"),
+                num_samples=self.num_samples,
+                system_prompt=SYSTEM_PROMPT,
+                model_config=self.model_config,
+                ledger=ledger,
+                budget=budget,
+                router=self._get_router(),
+                sample_routers=self._get_sample_routers()
+            )
+        elif self.agent_type == 'react':                                  # ReAct Agent
+            from ..agents.react import ReActAgent
+            from ..prompt.react import SYSTEM_PROMPT
+            agent = ReActAgent(
+                env=env, 
+                system_prompt=SYSTEM_PROMPT,
+                model_config=self.model_config,
+                ledger=ledger,
+                budget=budget,
+                router=self._get_router(),
+                checkpointer=checkpointer,
+                thread_id=thread_id
+            )
+        elif self.agent_type == 'reflexion':                              # Reflexion Agent
+            from ..agents.reflexion import ReflexionAgent
+            agent = ReflexionAgent(
+                env=env,
+                model_config=self.model_config,
+                ledger=ledger,
+                budget=budget,
+                router=self._get_router(),
+                reflection_store=self.reflection_store,
+                batch_queue=self.batch_queue,
+                frozen=self.frozen,
+                checkpointer=checkpointer,
+                thread_id=thread_id
+            )
+        elif self.agent_type == 'ace':                                    # ACE Agent
+            from ..agents.ace import ACEAgent
+            agent = ACEAgent(
+                env=env,
+                model_config=self.model_config,
+                ledger=ledger,
+                budget=budget,
+                router=self._get_router(),
+                playbook_store=self.playbook_store,
+                batch_queue=self.batch_queue,
+                frozen=self.frozen,
+                checkpointer=checkpointer,
+                thread_id=thread_id
             )
+        else:
+            raise ValueError("Unknown Agent Type. It must be one of : 'react', 'reflexion', 'ace'")
+        
+
+        # ----------------------------------------------------------------------------------------
+        # run agent on current task
+        # ----------------------------------------------------------------------------------------
+
+        # create input state for agent
+        if self.agent_type == 'react':                                         # ReAct Agent input state
+            from langchain.messages import HumanMessage
+            from ..prompt.react import INPUT_PROMPT
+            input_state = {
+                'messages' : [
+                    HumanMessage(
+                        content=INPUT_PROMPT.render(
+                            first_name = agent.env.task.supervisor.first_name,
+                            last_name = agent.env.task.supervisor.last_name,
+                            email = agent.env.task.supervisor.email,
+                            phone_number = agent.env.task.supervisor.phone_number,
+                            instruction = agent.env.task.instruction
+                    ))
+                ],
+            }
+        elif self.agent_type == 'reflexion':                                   # Reflexion Agent input state
+            input_state = {'reflections' : []}     # reflections of previous tasks are retrieved from reflection store
+        elif self.agent_type == 'ace':                                         # ACE Agent input state
+            if self.playbook_store is not None:
+                self.playbook = self.playbook_store.read()
+            elif self.playbook is None:
+                from ..core.playbook import PlayBook
+                self.playbook = PlayBook()
+            input_state = {'playbook' : self.playbook}
+
+        # run agent on task (resumed run continues from checkpointed state, input state is not used)
+        result = agent.invoke(None if resuming else input_state)
+
+        # ----------------------------------------------------------------------------------------
+        # get metadata of current agent run
+        # ----------------------------------------------------------------------------------------
+
+        if self.agent_type == 'reflexion':
+            for reflection in result['reflections']:
+                self.reflection_store.add(reflection, ledger=ledger)
+        elif self.agent_type == 'ace' and not self.frozen:
+            self.playbook = result['playbook']
 
-            # Task Result Evaluation
-            evaluation = agent.env.evaluate()
+        # get agent latency
+        latency = result['latency']
 
-            # Get evaluation result
-            task_status = (evaluation.pass_count == evaluation.total_count)
-            pass_requirements = evaluation.pass_count
-            fail_requirements = evaluation.fail_count
-            total_requirements = evaluation.total_count
-            pass_requirement_info = evaluation.passes
-            fail_requirement_info = evaluation.failures
+        # get token usage info
+        input_tokens = result['input_tokens']
+        output_tokens = result['output_tokens']
+        total_tokens = result['total_tokens']
 
+        # get price of used tokens (per model pricing, includes embedding calls and cached-token discount)
+        usage = ledger.totals
+        price = {
+            'input_token_price' : usage['input_cost'],
+            'output_token_price' : usage['output_cost'],
+            'total_token_price' : usage['cost']
+        }
+
+        # Task Result Evaluation
+        # reuse evaluation of last attempt computed inside agent. (re-evaluate when run was cut off by
+        # budget, because nodes after last evaluation may have changed environment state)
+        evaluation: EvaluationResult = result.get('evaluation')
+        if evaluation is None or budget.stop_reason is not None:
+            evaluation = EvaluationResult.from_env(agent.env)
 
-            # ----------------------------------------------------------------------------------------
-            # add evaluation metadata of current task_id
-            # ----------------------------------------------------------------------------------------
-            self.result[task_id] = {
+        # Get evaluation result
+        task_status = evaluation.success
+
+        # ----------------------------------------------------------------------------------------
+        # stream evaluation metadata of current task_id (record and carried-over state in one commit)
+        # ----------------------------------------------------------------------------------------
+        with self._lock:
+            self.writer.commit(state=self._get_carried_state(), record={
+                'task_id' : task_id,
+                'agent_type' : self.agent_type,
+                'experiment_name' : self.experiment_name,
                 'latency' : latency,
                 'input_tokens' : input_tokens,
                 'output_tokens' : output_tokens,
                 'total_tokens' : total_tokens,
                 'price' : price,
-                'task_status' : task_status,
-                'pass_requirements' : pass_requirements,
-                'fail_requirements' : fail_requirements,
-                'total_requirements' : total_requirements,
-                'pass_requirement_info' : pass_requirement_info,
-                'fail_requirement_info' : fail_requirement_info
-            }
+                'usage' : ledger.to_list(),
+                'stream' : ledger.stream_summary(),
+                'steps' : budget.steps,
+                'stop_reason' : budget.stop_reason,
+                'sample_index' : result.get('sample_index'),
+                'env_wait_seconds' : env_wait_seconds,
+                'checkpoint_seconds' : None if checkpointer is None else checkpointer.thread_seconds(thread_id),
+                **evaluation.to_dict()
+            })
+            self.completed_task_ids.add(task_id)
+            self.num_succeed += int(task_status)
 
-            print(f"✅ Task '{task_id}' complete.\n")
-        
+        # task is recorded, its checkpoints are no longer needed
+        if checkpointer is not None:
+            checkpointer.delete_thread(thread_id)
+
+        if budget.stop_reason is not None:
+            print(f"🛑 Task '{task_id}' cut off : {budget.stop_reason}")
+        print(f"✅ Task '{task_id}' complete. (task cost : ${price['total_token_price']:.4f})")
+        self._print_running_totals()
+        return agent.env
 
-        print(f"✅ All {len(self.task_ids)} tasks are completed!")
+    # ----------------------------------------------------------------------------------------
+    # Running totals of experiment
+    # ----------------------------------------------------------------------------------------
+    def get_running_totals(self) -> Dict[str, float]:
+        totals = self.ledger.totals
+        return {
+            'total_cost' : totals['cost'],
+            'total_tokens' : totals['total_tokens'],
+            'cost_per_task' : totals['cost'] / max(len(self.completed_task_ids), 1),
+            'cost_per_solved_task' : totals['cost'] / self.num_succeed if self.num_succeed > 0 else float('inf')
+        }
 
-        return self.result
\ No newline at end of file
+    def _print_running_totals(self) -> None:
+        totals = self.get_running_totals()
+        print(
+            f"    📍 Solved {self.num_succeed} / {len(self.completed_task_ids)} | "
+            f"total cost : ${totals['total_cost']:.4f} | "
+            f"cost per solved task : ${totals['cost_per_solved_task']:.4f}\n"
+        )
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# modules that no agent needs at startup (only loaded by features that use them)
+HEAVY_MODULES = ('numpy', 'tiktoken')
+
+# entry point -> (command, modules it must not import, import time limit in seconds over bare interpreter startup)
+CASES: Dict[str, Tuple[List[str], Tuple[str, ...], float]] = {
+    'cli_help' : (
+        ['main.py', '--help'],
+        ('appworld', 'langchain', 'langchain_core', 'langchain_openai', 'langgraph', 'src.tests.evaluate', 'src.agents', *HEAVY_MODULES),
+        0.5
+    ),
+    'evaluator' : (
+        ['-c', 'import src.tests.evaluate'],
+        ('appworld', 'langchain_openai', 'langgraph', 'src.agents', *HEAVY_MODULES),
+        1.5
+    ),
+    'react' : (
+        ['-c', 'import src.agents.react'],
+        (
+            'src.agents.reflexion', 'src.agents.ace', 'src.agents.best_of_n',
+            'src.core.playbook_store', 'src.core.reflection_store', 'src.core.checkpoint', 'langchain_openai', *HEAVY_MODULES
+        ),
+        6.0
+    ),
+    'reflexion' : (
+        ['-c', 'import src.agents.reflexion'],
+        ('src.agents.ace', 'src.agents.best_of_n', 'src.core.playbook_store', 'src.core.checkpoint', 'langchain_openai', 'tiktoken'),
+        6.0
+    ),
+    'ace' : (
+        ['-c', 'import src.agents.ace'],
+        ('src.agents.reflexion', 'src.agents.best_of_n', 'src.core.reflection_store', 'src.core.checkpoint', 'langchain_openai', 'tiktoken'),
+        6.0
+    )
+}
+
+
+def _run(args: List[str]) -> Tuple[float, Set[str], int, str]:
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - start
+
+    # '-X importtime' writes "import time: self [us] | cumulative | module" for every imported module to stderr
+    modules = set()
+    errors = []
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:'):
+            modules.add(line.rsplit('|', 1)[-1].strip())
+        else:
+            errors.append(line)
+    return elapsed, modules, process.returncode, "\n".join(errors[-3:])
+
+
+def _is_forbidden(module: str, forbidden: Tuple[str, ...]) -> bool:
+    return any(module == name or module.startswith(name + '.') for name in forbidden)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Import-time regression check of CLI / agent entry points.")
+    parser.add_argument("--cases", nargs='*', default=list(CASES), choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case (fastest run is reported)")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="multiplier of time limits (slow machines)")
+    args = parser.parse_args()
+
+    baseline = min(_run(['-c', 'pass'])[0] for _ in range(args.repeat))
+    print(f"📌 Interpreter startup : {baseline * 1000:.0f} ms")
+
+    failed = False
+    for name in args.cases:
+        command, forbidden, limit = CASES[name]
+        runs = [_run(command) for _ in range(args.repeat)]
+        elapsed, modules, returncode, error = min(runs, key=lambda run: run[0])
+        elapsed -= baseline
+
+        if returncode != 0:
+            print(f"❌ {name:<10} : exit code {returncode}\n{error}")
+            failed = True
+            continue
+
+        leaked = sorted(module for module in modules if _is_forbidden(module, forbidden))
+        status = "✅"
+        if leaked or elapsed > limit * args.tolerance:
+            status, failed = "❌", True
+
+        print(f"{status} {name:<10} : {elapsed * 1000:7.0f} ms (limit {limit * args.tolerance * 1000:.0f} ms), {len(modules)} modules")
+        if leaked:
+            print(f"    📍 must not import : {', '.join(leaked[:10])}{' ...' if len(leaked) > 10 else ''}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+import argparse
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# stand-in AppWorld for sandbox workers : prints of the code after a random delay (so responses of
+# interleaved calls come back mixed up), and 'crash()' kills the worker process (session restart while
+# other threads are waiting on the same session)
+STAND_IN_APPWORLD = '''
+import contextlib
+import io
+import os
+import random
+import time
+from types import SimpleNamespace
+
+
+class AppWorld:
+    def __init__(self, **kwargs):
+        supervisor = SimpleNamespace(first_name='', last_name='', email='', phone_number='')
+        self.task = SimpleNamespace(instruction='', supervisor=supervisor)
+
+    def execute(self, code):
+        if code == 'crash()':
+            os._exit(1)
+        time.sleep(random.random() * 0.005)
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            exec(code, {})
+        return buffer.getvalue()
+
+    def close(self):
+        pass
+'''
+
+
+def _run_calls(
+    env,
+    num_calls: int,
+    num_threads: int,
+    crash_every: int
+) -> Tuple[int, List[str]]:
+    codes = [
+        'crash()' if crash_every and index % crash_every == crash_every - 1 else f"print('call-{index}')"
+        for index in range(num_calls)
+    ]
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        outputs = list(executor.map(env.execute, codes))
+
+    mismatched = []
+    for index, (code, output) in enumerate(zip(codes, outputs)):
+        output = f"{output}".strip()
+        matched = output.startswith("Execution stopped") if code == 'crash()' else output == f"call-{index}"
+        if not matched:
+            mismatched.append(f"{code!r} -> {output[:60]!r}")
+    return len(codes), mismatched
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent execute calls on one sandboxed session : every output must belong to its own call.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--task_id", type=str, default=None, help="run against installed AppWorld on this task (default : stand-in AppWorld, with worker crashes)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    with tempfile.TemporaryDirectory() as stand_in_dir:
+        if args.task_id is None:
+            Path(stand_in_dir, 'appworld').mkdir()
+            Path(stand_in_dir, 'appworld', '__init__.py').write_text(STAND_IN_APPWORLD, encoding='utf-8')
+            sys.path.insert(0, stand_in_dir)        # spawned workers inherit sys.path of this process
+
+        from src.core.sandbox import SandboxPool
+
+        with SandboxPool(max_workers=1, cpu_seconds=None, timeout_seconds=60) as pool:
+            env = pool.open(task_id=args.task_id or 'stand_in', experiment_name='sandbox_concurrency')
+            try:
+                num_calls, mismatched = _run_calls(env, args.calls, args.threads, crash_every=0 if args.task_id else 50)
+            finally:
+                env.close()
+
+    status = "❌" if mismatched else "✅"
+    print(f"{status} {num_calls - len(mismatched)} / {num_calls} outputs match their call ({args.threads} threads, {pool.num_recycled} worker restarts)")
+    for line in mismatched[:10]:
+        print(f"    📍 {line}")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+from .evaluate import PROMPT_GROUPS, AppWorldEvalator
+from ..prompt.registry import validate_prompts
+
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..core.playbook import PlayBook
+
+
+class ACETrainer:
+    """
+    Multi-epoch offline training of ACE playbook.
+
+    Every epoch shuffles the training split and runs `num_shards` shards in parallel. Each shard is a
+    sequential ACE sweep that starts from the playbook of the previous epoch and curates its own copy,
+    so shards never contend on a shared store. At the epoch boundary, the shard playbooks are merged
+    (`merge_playbooks`) and checkpointed to '{save_dir}/{experiment_name}.epoch{N}.playbook.json'.
+
+    `evaluate` runs the frozen playbook (generator only, no curation) on another split.
+    AppWorld sessions of shards run in sandbox worker processes (`sandbox_config`).
+    """
+    def __init__(
+        self,
+        experiment_name: str,
+        num_epochs: int = 3,
+        num_shards: int = 4,
+        dataset_type: Literal['train', 'dev'] = 'train',
+        first_k_task: int = None,
+        model_config: Dict[str, str | float | bool] = {
+            'model' : 'gpt-4o',
+            'temperature' : 0.0,
+            'stream_usage' : True
+        },
+        router_config: Dict[str, object] = None,
+        save_dir: str = "./training_results",
+        resume: bool = False,
+        task_budget: Dict[str, int | float] = {
+            'max_steps' : 100
+        },
+        prefetch_envs: int = None,
+        sandbox_config: Dict[str, int | float] = {},
+        seed: int = 42
+    ) -> None:
+        self.experiment_name = experiment_name
+        self.num_epochs = num_epochs
+        self.num_shards = num_shards
+        self.model_config = model_config
+        self.router_config = router_config
+        self.save_dir = save_dir
+        self.resume = resume
+        self.task_budget = task_budget
+        self.prefetch_envs = prefetch_envs
+        self.sandbox_config = sandbox_config
+        self.seed = seed
+        validate_prompts(PROMPT_GROUPS['ace'])
+        if sandbox_config is None and (num_shards > 1 or prefetch_envs):
+            # shards (and prefetched environments) are AppWorld sessions open at the same time
+            raise ValueError("Parallel shards and prefetched environments need sandbox workers ('sandbox_config').")
+
+        from appworld import load_task_ids
+        self.task_ids: List[str] = load_task_ids(dataset_name=dataset_type)
+        if first_k_task:
+            self.task_ids = self.task_ids[:first_k_task]
+
+        os.makedirs(save_dir, exist_ok=True)
+        if not resume:
+            # checkpoints of an earlier run with the same name would be picked up by a later resume
+            for epoch in range(1, num_epochs + 1):
+                if os.path.exists(self.checkpoint_path(epoch)):
+                    os.remove(self.checkpoint_path(epoch))
+
+    def checkpoint_path(self, epoch: int) -> str:
+        return os.path.join(self.save_dir, f"{self.experiment_name}.epoch{epoch}.playbook.json")
+
+    def _get_shards(self, epoch: int) -> List[List[str]]:
+        # same shuffle for the same (seed, epoch) : a resumed epoch keeps the task assignment of its shards
+        task_ids = list(self.task_ids)
+        random.Random(self.seed + epoch).shuffle(task_ids)
+        return [task_ids[shard::self.num_shards] for shard in range(self.num_shards)]
+
+    def _latest_checkpoint(self) -> Tuple[int, "PlayBook"]:
+        from ..core.playbook import PlayBook, load_playbook
+
+        for epoch in range(self.num_epochs, 0, -1):
+            if os.path.exists(self.checkpoint_path(epoch)):
+                return epoch, load_playbook(self.checkpoint_path(epoch))
+        return 0, PlayBook()
+
+    # ----------------------------------------------------------------------------------------
+    # Training
+    # ----------------------------------------------------------------------------------------
+    def _run_shard(
+        self,
+        epoch: int,
+        shard: int,
+        task_ids: List[str],
+        playbook: "PlayBook"
+    ) -> Tuple["PlayBook", Dict[str, Any]]:
+        evaluator = AppWorldEvalator(
+            agent_type='ace',
+            dataset_type='train',
+            experiment_name=f"{self.experiment_name}_epoch{epoch}_shard{shard}",
+            model_config=self.model_config,
+            router_config=self.router_config,
+            save_dir=self.save_dir,
+            resume=self.resume,         # interrupted shard continues with its carried-over playbook
+            task_budget=self.task_budget,
+            prefetch_envs=self.prefetch_envs,
+            sandbox_config=self.sandbox_config,
+            task_ids=task_ids,
+            playbook=playbook
+        )
+        summary = evaluator.evaluate()
+        return (evaluator.playbook if evaluator.playbook is not None else playbook), summary
+
+    def train(self) -> Dict[str, Any]:
+        from ..core.playbook import merge_playbooks, save_playbook
+
+        start_epoch, playbook = self._latest_checkpoint()
+        if start_epoch > 0:
+            print(f"🔁 Resume training from epoch {start_epoch} checkpoint ({len(playbook)} bullets).")
+
+        history: List[Dict[str, Any]] = []
+        for epoch in range(start_epoch + 1, self.num_epochs + 1):
+            shards = [task_ids for task_ids in self._get_shards(epoch) if task_ids]
+            print(f"📌 Epoch {epoch}/{self.num_epochs} : {len(self.task_ids)} tasks on {len(shards)} shards")
+
+            with ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix='shard') as executor:
+                futures = [
+                    executor.submit(self._run_shard, epoch, shard, task_ids, playbook)
+                    for shard, task_ids in enumerate(shards)
+                ]
+                results = [future.result() for future in futures]
+
+            # curated deltas of every shard are merged once, at the epoch boundary
+            playbook = merge_playbooks(playbook, [shard_playbook for shard_playbook, _ in results])
+
+            stats = {
+                'epoch' : epoch,
+                'num_tasks' : sum(summary['num_tasks'] for _, summary in results),
+                'num_succeed' : sum(summary['num_succeed'] for _, summary in results),
+                'total_cost' : sum(summary['total_cost'] for _, summary in results),
+                'num_bullets' : len(playbook)
+            }
+            save_playbook(self.checkpoint_path(epoch), playbook, **stats)
+            history.append(stats)
+            print(
+                f"✅ Epoch {epoch} : solved {stats['num_succeed']} / {stats['num_tasks']} | "
+                f"cost : ${stats['total_cost']:.4f} | playbook : {stats['num_bullets']} bullets -> {self.checkpoint_path(epoch)}"
+            )
+
+        return {
+            'checkpoint_path' : self.checkpoint_path(self.num_epochs),
+            'num_bullets' : len(playbook),
+            'epochs' : history
+        }
+
+    # ----------------------------------------------------------------------------------------
+    # Evaluation of frozen playbook
+    # ----------------------------------------------------------------------------------------
+    def evaluate(
+        self,
+        dataset_type: Literal['dev', 'test'] = 'dev',
+        epoch: int = None,
+        num_workers: int = None,
+        first_k_task: int = None
+    ) -> Dict[str, Any]:
+        """
+        Evaluate playbook checkpoint of `epoch` (latest by default) read-only : generator only, tasks run in parallel.
+        """
+        from ..core.playbook import load_playbook
+
+        if epoch is None:
+            epoch, playbook = self._latest_checkpoint()
+        else:
+            playbook = load_playbook(self.checkpoint_path(epoch))
+
+        evaluator = AppWorldEvalator(
+            agent_type='ace',
+            dataset_type=dataset_type,
+            experiment_name=f"{self.experiment_name}_epoch{epoch}_{dataset_type}",
+            first_k_task=first_k_task,
+            model_config=self.model_config,
+            router_config=self.router_config,
+            save_dir=self.save_dir,
+            resume=self.resume,
+            task_budget=self.task_budget,
+            num_workers=num_workers if num_workers is not None else self.num_shards,
+            prefetch_envs=self.prefetch_envs,
+            sandbox_config=self.sandbox_config,
+            playbook=playbook,
+            frozen=True
+        )
+        return evaluator.evaluate()
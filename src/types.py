@@ -1,14 +1,45 @@
-from pydantic import BaseModel, Field
+from typing import List, Literal
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from .core.playbook import SECTION_PREFIXES
+
+# strict json schema outputs require every field to be required and no extra field (additionalProperties: false)
 
 # ------------------------------------------------------------------------------------------------------------------
 # Reflector's Response Model in ACE Agent
 # ------------------------------------------------------------------------------------------------------------------
+class BulletTag(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    id: str = Field(..., description="id of playbook bullet used by the generator (e.g. 'shr-00001')")
+    tag: Literal['helpful', 'harmful', 'neutral'] = Field(..., description="whether the bullet helped the generator")
+
+
 class ReflectorResponseModel(BaseModel):
-    pass
+    model_config = ConfigDict(extra='forbid')
+
+    reasoning: str = Field(..., description="chain of thought / reasoning / detailed analysis")
+    error_identification: str = Field(..., description="what specifically went wrong in the trajectory")
+    root_cause_analysis: str = Field(..., description="why the error occurred, which concept was misunderstood")
+    correct_approach: str = Field(..., description="what the model should have done instead")
+    key_insight: str = Field(..., description="strategy or principle to remember to avoid this error")
+    bullet_tags: List[BulletTag] = Field(..., description="tag of each playbook bullet used by the generator")
 
 
 # ------------------------------------------------------------------------------------------------------------------
-# Reflector's Response Model in ACE Agent
+# Curator's Response Model in ACE Agent
 # ------------------------------------------------------------------------------------------------------------------
+class DeltaOperation(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    operation: Literal['ADD'] = Field(..., description="type of playbook update")
+    section: Literal[tuple(SECTION_PREFIXES)] = Field(..., description="playbook section of the new bullet")
+    content: str = Field(..., description="content of the new bullet")
+
+
 class CuratorResponseModel(BaseModel):
-    pass
+    model_config = ConfigDict(extra='forbid')
+
+    reasoning: str = Field(..., description="why these updates are needed (and why nothing else is)")
+    operations: List[DeltaOperation] = Field(..., description="playbook updates (empty list when nothing new was learned)")
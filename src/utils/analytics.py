@@ -0,0 +1,221 @@
+import argparse
+import glob
+import math
+import os
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from .results import load_result_file
+
+# numeric columns of task records (string columns 'experiment', 'agent_type', 'task_id' are sized to the data)
+NUMERIC_FIELDS = [
+    ('success', np.bool_),
+    ('latency', np.float64),
+    ('input_tokens', np.int64),
+    ('output_tokens', np.int64),
+    ('total_tokens', np.int64),
+    ('cost', np.float64),
+    ('steps', np.int64),                    # -1 : not recorded (legacy result files)
+    ('pass_requirements', np.int64),
+    ('total_requirements', np.int64),
+    ('cut_off', np.bool_),                  # stopped by budget controller
+]
+GROUP_FIELDS = ('experiment', 'agent_type', 'task_id')
+PERCENTILES = (50, 95, 99)
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Loading (records -> columnar structured array)
+# ------------------------------------------------------------------------------------------------------------------
+def load_results(paths: Sequence[str]) -> np.ndarray:
+    """
+    Load task records of result files ('.jsonl' streamed or legacy '.json') into one structured array.
+
+    Experiment name and agent type come from the records, or from the file name / 'unknown' for
+    legacy files that did not record them.
+    """
+    columns: Dict[str, List[Any]] = {name : [] for name in (*GROUP_FIELDS, *(field for field, _ in NUMERIC_FIELDS))}
+    for path in paths:
+        default_experiment = os.path.splitext(os.path.basename(path))[0]
+        for record in load_result_file(path):
+            price = record.get('price') or {}
+            columns['experiment'].append(record.get('experiment_name') or default_experiment)
+            columns['agent_type'].append(record.get('agent_type') or 'unknown')
+            columns['task_id'].append(f"{record.get('task_id', '')}")
+            columns['success'].append(bool(record.get('task_status', False)))
+            columns['latency'].append(record.get('latency') or 0.0)
+            columns['input_tokens'].append(record.get('input_tokens') or 0)
+            columns['output_tokens'].append(record.get('output_tokens') or 0)
+            columns['total_tokens'].append(record.get('total_tokens') or 0)
+            columns['cost'].append(price.get('total_token_price') or 0.0)
+            columns['steps'].append(record['steps'] if record.get('steps') is not None else -1)
+            columns['pass_requirements'].append(record.get('pass_requirements') or 0)
+            columns['total_requirements'].append(record.get('total_requirements') or 0)
+            columns['cut_off'].append(record.get('stop_reason') is not None)
+
+    dtype = [(name, f"U{max(map(len, columns[name]), default=1)}") for name in GROUP_FIELDS] + NUMERIC_FIELDS
+    records = np.empty(len(columns['task_id']), dtype=dtype)
+    for name in records.dtype.names:
+        records[name] = columns[name]
+    return records
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Vectorised aggregation
+# ------------------------------------------------------------------------------------------------------------------
+def _group_percentiles(
+    values: np.ndarray,
+    inverse: np.ndarray,
+    counts: np.ndarray,
+    percentiles: Sequence[float]
+) -> Dict[float, np.ndarray]:
+    # one sort for all groups : values ordered by (group, value), then linear interpolation inside each group
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    result = {}
+    for percentile in percentiles:
+        position = starts + (counts - 1) * (percentile / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        result[percentile] = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+    return result
+
+
+def summarize(
+    records: np.ndarray,
+    by: Sequence[str] = ('experiment',),
+    percentiles: Sequence[float] = PERCENTILES
+) -> List[Dict[str, Any]]:
+    """
+    Aggregate task records per group of `by` fields (e.g. ('agent_type',) or ('experiment', 'agent_type')).
+
+    Every statistic is computed for all groups at once (`np.unique` + `np.bincount`), so the cost
+    is a few passes over the columns regardless of the number of groups.
+    """
+    if len(records) == 0:
+        return []
+
+    keys, inverse, counts = np.unique(records[list(by)], return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+
+    def _sum(values: np.ndarray) -> np.ndarray:
+        return np.bincount(inverse, weights=values, minlength=len(keys))
+
+    solved = _sum(records['success'].astype(np.float64))
+    cost = _sum(records['cost'])
+    tokens = _sum(records['total_tokens'].astype(np.float64))
+    latency = _sum(records['latency'])
+    passed = _sum(records['pass_requirements'].astype(np.float64))
+    requirements = _sum(records['total_requirements'].astype(np.float64))
+    cut_off = _sum(records['cut_off'].astype(np.float64))
+    has_steps = records['steps'] >= 0
+    steps = np.bincount(inverse[has_steps], weights=records['steps'][has_steps], minlength=len(keys))
+    num_with_steps = np.bincount(inverse[has_steps], minlength=len(keys))
+    latency_percentiles = _group_percentiles(records['latency'], inverse, counts, percentiles)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost_per_solved = np.where(solved > 0, cost / solved, np.inf)
+        tokens_per_solved = np.where(solved > 0, tokens / solved, np.inf)
+        mean_steps = np.where(num_with_steps > 0, steps / num_with_steps, np.nan)
+
+    summary = []
+    for index, key in enumerate(keys):
+        row = {field : str(key[field]) for field in by}
+        row.update({
+            'num_tasks' : int(counts[index]),
+            'num_solved' : int(solved[index]),
+            'success_rate' : float(solved[index] / counts[index]),
+            'requirement_pass_rate' : float(passed[index] / max(requirements[index], 1)),
+            'mean_latency' : float(latency[index] / counts[index]),
+            **{f"p{percentile:g}_latency" : float(values[index]) for percentile, values in latency_percentiles.items()},
+            'total_tokens' : int(tokens[index]),
+            'tokens_per_solved_task' : float(tokens_per_solved[index]),
+            'total_cost' : float(cost[index]),
+            'cost_per_task' : float(cost[index] / counts[index]),
+            'cost_per_solved_task' : float(cost_per_solved[index]),
+            'mean_steps' : float(mean_steps[index]),
+            'cut_off_rate' : float(cut_off[index] / counts[index]),
+        })
+        summary.append(row)
+    return summary
+
+
+def compare(
+    records: np.ndarray,
+    baseline: str,
+    candidate: str
+) -> Dict[str, Any]:
+    """
+    Paired comparison of two experiments on the task ids both of them ran.
+    """
+    base = records[records['experiment'] == baseline]
+    other = records[records['experiment'] == candidate]
+    _, base_index, other_index = np.intersect1d(base['task_id'], other['task_id'], assume_unique=False, return_indices=True)
+    base, other = base[base_index], other[other_index]
+
+    if len(base) == 0:
+        return {'baseline' : baseline, 'candidate' : candidate, 'num_common_tasks' : 0}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'baseline' : baseline,
+            'candidate' : candidate,
+            'num_common_tasks' : len(base),
+            'baseline_success_rate' : float(base['success'].mean()),
+            'candidate_success_rate' : float(other['success'].mean()),
+            'only_baseline_solved' : int(np.count_nonzero(base['success'] & ~other['success'])),
+            'only_candidate_solved' : int(np.count_nonzero(other['success'] & ~base['success'])),
+            'latency_ratio' : float(other['latency'].sum() / base['latency'].sum()),
+            'cost_ratio' : float(other['cost'].sum() / base['cost'].sum()),
+            'median_latency_ratio' : float(np.median(other['latency'] / base['latency']))
+        }
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Report
+# ------------------------------------------------------------------------------------------------------------------
+def _format_value(value: Any) -> str:
+    if isinstance(value, float):
+        if math.isinf(value) or math.isnan(value):
+            return '-'
+        return f"{value:.4f}" if abs(value) < 1000 else f"{value:,.0f}"
+    return f"{value}"
+
+
+def format_table(rows: Sequence[Dict[str, Any]]) -> str:
+    if not rows:
+        return "(no records)"
+
+    columns = list(rows[0])
+    cells = [[_format_value(row[column]) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.append("  ".join("-" * width for width in widths))
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Aggregate experiment result files ('.jsonl' or legacy '.json').")
+    parser.add_argument("paths", nargs='+', help="result files or glob patterns (e.g. 'evaluation_results/*.jsonl')")
+    parser.add_argument("--by", nargs='+', default=['experiment'], choices=['experiment', 'agent_type'], help="group fields")
+    parser.add_argument("--compare", nargs=2, metavar=('BASELINE', 'CANDIDATE'), default=None, help="paired comparison of two experiments")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.paths for path in (glob.glob(pattern) or [pattern])})
+    records = load_results(paths)
+    print(f"📌 Loaded {len(records)} task records from {len(paths)} files.\n")
+    print(format_table(summarize(records, by=args.by)))
+
+    if args.compare is not None:
+        print()
+        print(format_table([compare(records, *args.compare)]))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+import time
+from threading import Lock
+
+from .token_usage import UsageLedger
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Budget Controller
+# ------------------------------------------------------------------------------------------------------------------
+class BudgetController:
+    """
+    Hard caps on steps, tokens, cost and wall-time.
+
+    Token and cost usage are read from the usage ledger, so the controller always sees the
+    same numbers that are reported in the result file. A task budget can have a parent
+    (experiment) budget; the task is cut off when either of them is exhausted.
+    Limits set to `None` are not enforced.
+    """
+    def __init__(
+        self,
+        max_steps: int = None,
+        max_tokens: int = None,
+        max_cost: float = None,
+        max_seconds: float = None,
+        ledger: UsageLedger = None,
+        parent: "BudgetController" = None
+    ) -> None:
+        self.max_steps = max_steps
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+
+        self.ledger = ledger if ledger is not None else UsageLedger()
+        self.parent = parent
+
+        self.steps = 0
+        self.start_time = time.monotonic()
+        self.stop_reason: str | None = None
+        self._lock = Lock()
+
+    def step(self) -> None:
+        """
+        Count one agent step (one LLM call of ReAct-style loop).
+        """
+        with self._lock:
+            self.steps += 1
+
+        if self.parent is not None:
+            self.parent.step()
+
+    def cancel(
+        self,
+        reason: str
+    ) -> None:
+        """
+        Cut off execution from outside (e.g. another sample already solved the task).
+        """
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = reason
+
+    def check(self) -> str | None:
+        """
+        Return the reason of cut off if any limit is exceeded, otherwise `None`.
+        """
+        if self.stop_reason is not None:
+            return self.stop_reason
+
+        reason = None
+        totals = self.ledger.totals
+        elapsed = time.monotonic() - self.start_time
+
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            reason = f"step limit exceeded ({self.steps} >= {self.max_steps})"
+        elif self.max_tokens is not None and totals['total_tokens'] >= self.max_tokens:
+            reason = f"token limit exceeded ({totals['total_tokens']} >= {self.max_tokens})"
+        elif self.max_cost is not None and totals['cost'] >= self.max_cost:
+            reason = f"cost limit exceeded (${totals['cost']:.4f} >= ${self.max_cost:.4f})"
+        elif self.max_seconds is not None and elapsed >= self.max_seconds:
+            reason = f"time limit exceeded ({elapsed:.1f}s >= {self.max_seconds:.1f}s)"
+        elif self.parent is not None and self.parent.check() is not None:
+            reason = f"experiment budget : {self.parent.stop_reason}"
+
+        if reason is not None:
+            self.cancel(reason)
+
+        return self.stop_reason
+
+    def exceeded(self) -> bool:
+        return self.check() is not None
+
+    def recursion_limit(self) -> int:
+        """
+        LangGraph recursion limit for one graph invocation (ReAct loop takes 2 super-steps per step).
+        """
+        if self.max_steps is None:
+            return 1000
+        return 2 * self.max_steps + 10
@@ -0,0 +1,40 @@
+from typing import List, TYPE_CHECKING
+
+from .token_usage import UsageLedger
+
+# embedding client and tokenizer are imported on first use (agents without playbook / reflection store never load them)
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+_embedding_model: "OpenAIEmbeddings | None" = None
+
+
+def get_embedding_model() -> "OpenAIEmbeddings":
+    # embedding client is created on first use and shared by every playbook / reflection store
+    global _embedding_model
+    if _embedding_model is None:
+        from langchain_openai import OpenAIEmbeddings
+        _embedding_model = OpenAIEmbeddings(model=EMBEDDING_MODEL)
+    return _embedding_model
+
+
+def get_embedding(
+    content: str,
+    ledger: UsageLedger = None,
+    node: str = 'embedding'
+) -> List[float]:
+    embedding = get_embedding_model().embed_query(content)
+
+    # embedding response has no usage metadata. count input tokens with tokenizer of embedding model.
+    if ledger is not None:
+        import tiktoken
+        ledger.record(
+            model=EMBEDDING_MODEL,
+            node=node,
+            call_type='embedding',
+            input_tokens=len(tiktoken.encoding_for_model(EMBEDDING_MODEL).encode(content))
+        )
+
+    return embedding
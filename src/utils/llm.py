@@ -1,11 +1,17 @@
-from typing import Sequence
+import json
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TYPE_CHECKING
 
 from langchain.messages import AIMessage, AnyMessage
+from langchain_core.messages import AIMessageChunk, message_chunk_to_message
+
+# type hints only : langchain_openai (and tiktoken) load with the first llm client (ModelRouter.get_client)
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
-from langchain_openai import ChatOpenAI
 
 def get_response_with_retry(
-    model_client: ChatOpenAI, 
+    model_client: "ChatOpenAI", 
     messages: Sequence[AnyMessage], 
     max_retries: int
 ) -> AIMessage:
@@ -20,3 +26,76 @@ def get_response_with_retry(
                 raise error
             
     return response
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Streaming response
+# ------------------------------------------------------------------------------------------------------------------
+def _parse_tool_call_chunk(tool_call_chunk: Dict[str, Any]) -> Dict[str, Any] | None:
+    try:
+        args = json.loads(tool_call_chunk.get('args') or '{}')
+    except json.JSONDecodeError:
+        return None     # invalid arguments : left to `invalid_tool_calls` of final message
+    return {'name' : tool_call_chunk.get('name'), 'args' : args, 'id' : tool_call_chunk.get('id'), 'type' : 'tool_call'}
+
+
+def stream_response_with_retry(
+    model_client: "ChatOpenAI",
+    messages: Sequence[AnyMessage],
+    max_retries: int,
+    on_tool_call: Callable[[Dict[str, Any]], None] = None
+) -> Tuple[AIMessage, Dict[str, float]]:
+    """
+    Stream response chunks and return (full response, latency metrics).
+
+    Tool call chunks arrive one call after another (by `index`), so a tool call is complete as soon as
+    the next one starts. `on_tool_call` is called with each complete tool call while the rest of the
+    response is still streaming. Once a tool call is dispatched, a failed stream is not retried
+    (the tool may already have changed environment state).
+
+    metrics : 'ttft' (time to first token), 'mean_itl' / 'max_itl' (inter-token latency), 'duration'
+    """
+    for attempt in range(max_retries):
+        start = time.perf_counter()
+        response: AIMessageChunk | None = None
+        token_times: List[float] = []
+        num_dispatched = 0
+
+        try:
+            for chunk in model_client.stream(messages):
+                if chunk.content or chunk.tool_call_chunks:
+                    token_times.append(time.perf_counter())
+                response = chunk if response is None else response + chunk
+
+                if on_tool_call is None or not chunk.tool_call_chunks:
+                    continue
+                # every tool call before the newest index is complete
+                newest = max(tool_call_chunk.get('index') or 0 for tool_call_chunk in chunk.tool_call_chunks)
+                while num_dispatched < min(newest, len(response.tool_call_chunks)):
+                    tool_call = _parse_tool_call_chunk(response.tool_call_chunks[num_dispatched])
+                    if tool_call is not None:
+                        on_tool_call(tool_call)
+                    num_dispatched += 1
+            break
+        except Exception as error:
+            if attempt + 1 == max_retries or num_dispatched > 0:
+                raise error
+
+    if response is None:
+        raise ValueError("Model stream returned no chunk.")
+
+    # last tool call is complete when stream ends
+    if on_tool_call is not None:
+        for tool_call_chunk in response.tool_call_chunks[num_dispatched:]:
+            tool_call = _parse_tool_call_chunk(tool_call_chunk)
+            if tool_call is not None:
+                on_tool_call(tool_call)
+
+    gaps = [later - earlier for earlier, later in zip(token_times, token_times[1:])]
+    metrics = {
+        'ttft' : (token_times[0] - start) if token_times else 0.0,
+        'mean_itl' : sum(gaps) / len(gaps) if gaps else 0.0,
+        'max_itl' : max(gaps, default=0.0),
+        'duration' : time.perf_counter() - start
+    }
+    return message_chunk_to_message(response), metrics
@@ -1,5 +1,188 @@
 from langchain.messages import AIMessage, ToolMessage, HumanMessage, AnyMessage
-from typing import Sequence
+from typing import Dict, Iterator, List, Sequence
+from collections.abc import Sequence as SequenceABC
+from itertools import islice
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Append-only message log
+# ------------------------------------------------------------------------------------------------------------------
+class MessageLog(SequenceABC):
+    """
+    Append-only message history that is shared by reference and indexed by position.
+
+    `add_messages` matches message IDs and re-materialises the whole list on every node update,
+    so reducer cost and memory grow with trajectory length. A `MessageLog` is a (backing list, length)
+    view instead: appending writes new messages into the shared backing list and returns a longer view,
+    so an update costs O(new messages) and older views stay valid. LangGraph applies the same write to
+    copies of a channel (e.g. when conditional edges read fresh state), so a write of the message that
+    already sits at the next position only fast-forwards the view. A different message at that position
+    forks the backing list (never happens for agents that only append).
+    """
+    __slots__ = ('_messages', '_length')
+
+    def __init__(
+        self,
+        messages: Sequence[AnyMessage] = ()
+    ) -> None:
+        self._messages: List[AnyMessage] = list(messages)
+        self._length: int = len(self._messages)
+
+    @classmethod
+    def _view(
+        cls,
+        messages: List[AnyMessage],
+        length: int
+    ) -> "MessageLog":
+        log = cls.__new__(cls)
+        log._messages = messages
+        log._length = length
+        return log
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._messages[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("MessageLog index out of range")
+        return self._messages[index]
+
+    def __iter__(self) -> Iterator[AnyMessage]:
+        return islice(self._messages, self._length)
+
+    def __repr__(self) -> str:
+        return f"MessageLog(len={self._length})"
+
+    def extends(
+        self,
+        other: "MessageLog"
+    ) -> bool:
+        """
+        True if `other` is a prefix of this log that shares its backing list (this log = other + new messages).
+        """
+        return self._messages is other._messages and other._length <= self._length
+
+    def appended(
+        self,
+        messages: Sequence[AnyMessage]
+    ) -> "MessageLog":
+        backing = self._messages
+        position = self._length
+
+        for message in messages:
+            if position < len(backing):
+                if backing[position] is message:
+                    position += 1
+                    continue
+                # another view already appended different message here. fork shared prefix.
+                backing = backing[:position]
+            backing.append(message)
+            position += 1
+
+        return MessageLog._view(backing, position)
+
+
+def append_messages(
+    log: MessageLog,
+    messages: Sequence[AnyMessage] | AnyMessage
+) -> MessageLog:
+    """
+    Reducer of `MessageLog` state field. Append new messages to the log (O(new messages), no copy).
+    """
+    if isinstance(messages, MessageLog) and len(log) == 0:
+        return messages
+
+    if not isinstance(messages, (list, tuple, MessageLog)):
+        messages = [messages]
+
+    return log.appended(messages)
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Compact trajectory renderer for reflector prompts
+# ------------------------------------------------------------------------------------------------------------------
+# default per-step caps (characters)
+MAX_CODE_CHARS = 2000
+MAX_OBSERVATION_CHARS = 1500
+MAX_THOUGHT_CHARS = 500
+
+ERROR_MARKERS = ('Traceback (most recent call last)', 'Exception:', 'Error:')
+
+
+def _truncate(
+    text: str,
+    limit: int,
+    keep: str = 'head'
+) -> str:
+    """
+    Truncate text to `limit` characters. `keep` is one of 'head', 'tail', 'both'.
+    """
+    if limit is None or len(text) <= limit:
+        return text
+
+    omitted = len(text) - limit
+    if keep == 'tail':
+        return f"...[{omitted} chars truncated]...\n" + text[-limit:]
+    if keep == 'both':
+        return text[:limit // 2] + f"\n...[{omitted} chars truncated]...\n" + text[-(limit - limit // 2):]
+    return text[:limit] + f"\n...[{omitted} chars truncated]..."
+
+
+def is_error_observation(observation: str) -> bool:
+    return any(marker in observation for marker in ERROR_MARKERS)
+
+
+def render_trajectory(
+    messages: Sequence[AnyMessage],
+    max_code_chars: int = MAX_CODE_CHARS,
+    max_observation_chars: int = MAX_OBSERVATION_CHARS,
+    max_thought_chars: int = MAX_THOUGHT_CHARS,
+    max_steps: int = None
+) -> str:
+    """
+    Render agent trajectory as dense transcript (code, truncated observation, highlighted errors).
+
+    Only the information a reflector needs is rendered: message metadata, ids, response headers and
+    usage are dropped, and the task instruction (HumanMessage) is skipped because every reflector
+    prompt already contains it. Errors keep the tail of observation, where the exception message is.
+    With `max_steps`, only the last steps are rendered.
+    """
+    steps: List[str] = []
+    observations: Dict[str, str] = {
+        msg.tool_call_id : msg.content for msg in messages if isinstance(msg, ToolMessage)
+    }
+
+    for msg in messages:
+        if not isinstance(msg, AIMessage):
+            continue
+
+        lines: List[str] = [f"### Step {len(steps) + 1}"]
+
+        thought = msg.content if isinstance(msg.content, str) else ""
+        if thought.strip():
+            lines.append(f"Thought: {_truncate(thought.strip(), max_thought_chars)}")
+
+        for tool_call in msg.tool_calls:
+            code = tool_call['args'].get('code', '')
+            lines.append(f"Code:\n```python\n{_truncate(code, max_code_chars, keep='both')}\n```")
+
+            observation = str(observations.get(tool_call['id'], ''))
+            if is_error_observation(observation):
+                lines.append(f"Output (ERROR):\n{_truncate(observation, max_observation_chars, keep='tail')}")
+            else:
+                lines.append(f"Output:\n{_truncate(observation, max_observation_chars)}")
+
+        steps.append("\n".join(lines))
+
+    if max_steps is not None and len(steps) > max_steps:
+        steps = [f"...[{len(steps) - max_steps} earlier steps omitted]..."] + steps[-max_steps:]
+
+    return "\n\n".join(steps)
+
 
 def pretty_print_messages(messages: Sequence[AnyMessage]) -> None:
     for msg in messages:
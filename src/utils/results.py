@@ -0,0 +1,131 @@
+import os
+import json
+from typing import Any, Dict, Iterator, Set
+
+# record of the last committed task, kept in state file until the record is in the result file
+PENDING_RECORD_KEY = '_pending_record'
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Streaming (append-only) result writer
+# ------------------------------------------------------------------------------------------------------------------
+class ResultWriter:
+    """
+    Append-only JSONL writer for per-task evaluation records.
+
+    Every record is written as a single line and flushed to disk as soon as the task finishes,
+    so a crash in the middle of a sweep never loses the results of already completed tasks.
+    State that is carried over between tasks (reflections, playbook) is kept in a separate
+    snapshot file that is atomically replaced after every task.
+
+    `commit` writes a task record together with the state that already learned from the task : the
+    record is stored in the state snapshot first (one atomic replace), then appended. `recover` appends
+    a committed record that a crash kept out of the result file, so a resumed sweep never re-runs a task
+    on top of state that learned from it.
+    """
+    def __init__(
+        self,
+        save_dir: str,
+        experiment_name: str,
+        overwrite: bool = False
+    ) -> None:
+        os.makedirs(save_dir, exist_ok=True)
+
+        self.result_path = os.path.join(save_dir, f"{experiment_name}.jsonl")
+        self.state_path = os.path.join(save_dir, f"{experiment_name}.state.json")
+
+        # start new experiment from scratch (same behaviour as overwriting '{experiment_name}.json')
+        if overwrite:
+            for path in (self.result_path, self.state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        # a crash while writing may leave a partial last line. start a fresh line in that case.
+        if os.path.exists(self.result_path) and os.path.getsize(self.result_path) > 0:
+            with open(self.result_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    with open(self.result_path, 'a', encoding='utf-8') as g:
+                        g.write("\n")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str)
+
+        with open(self.result_path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        yield from load_records(self.result_path)
+
+    def completed_task_ids(self) -> Set[str]:
+        return {record['task_id'] for record in self.read()}
+
+    def commit(self, record: Dict[str, Any], state: Dict[str, Any]) -> None:
+        # state file replace is the commit point of both record and state
+        self.save_state({**state, PENDING_RECORD_KEY : record})
+        self.write(record)
+
+    def recover(self) -> None:
+        state = self._read_state()
+        record = None if state is None else state.get(PENDING_RECORD_KEY)
+        if record is not None and record['task_id'] not in self.completed_task_ids():
+            self.write(record)
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        tmp_path = self.state_path + ".tmp"
+
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, self.state_path)
+
+    def _read_state(self) -> Dict[str, Any] | None:
+        if not os.path.exists(self.state_path):
+            return None
+
+        with open(self.state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_state(self) -> Dict[str, Any] | None:
+        state = self._read_state()
+        if state is not None:
+            state.pop(PENDING_RECORD_KEY, None)
+        return state
+
+
+def load_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield task records from JSONL result file. Truncated lines (left by a crash) are skipped.
+    """
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_result_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield task records of '.jsonl' streamed result file, or of legacy '.json' result file
+    (list of records or {task_id : record}).
+    """
+    if not path.endswith('.json'):
+        yield from load_records(path)
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [{'task_id' : task_id, **record} for task_id, record in data.items() if isinstance(record, dict)]
+    yield from data
@@ -0,0 +1,165 @@
+import ast
+import json
+import re
+from typing import Any, List, Sequence, Tuple, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from langchain.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
+
+from .llm import get_response_with_retry
+from ..prompt.structured import REASK_SYSTEM_PROMPT, REASK_INPUT_PROMPT
+
+ResponseModel = TypeVar('ResponseModel', bound=BaseModel)
+
+_CODE_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Local parsing and repair (no LLM call)
+# ------------------------------------------------------------------------------------------------------------------
+def repair_json(text: str) -> str:
+    """
+    Repair near-valid JSON object in model output.
+
+    Strips code fences and text around the object, removes trailing commas, and closes
+    an unterminated string and brackets of truncated output.
+    """
+    fenced = _CODE_FENCE.search(text)
+    if fenced is not None:
+        text = fenced.group(1)
+
+    start = text.find('{')
+    if start < 0:
+        return text
+    text = text[start:]
+
+    closers: List[str] = []
+    in_string, escaped = False, False
+    string_start = 0
+    end = len(text)
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string, string_start = True, index
+        elif char in '{[':
+            closers.append('}' if char == '{' else ']')
+        elif char in '}]' and closers:
+            closers.pop()
+            if not closers:
+                end = index + 1      # end of top-level object, text after it is dropped
+                break
+
+    text = text[:end]
+    if in_string:
+        # output cut inside a key : drop the key, inside a value : close the string
+        is_key = closers and closers[-1] == '}' and text[:string_start].rstrip()[-1:] in ('{', ',')
+        text = text[:string_start] if is_key else text + '"'
+    text = text.rstrip().rstrip(',')
+    if text.endswith(':'):
+        text += ' null'     # output cut right after a key
+    text += "".join(reversed(closers))
+    return _TRAILING_COMMA.sub(r"\1", text)
+
+
+def get_text(message: AnyMessage) -> str:
+    # `text` is a method in older langchain releases and a property in newer ones
+    text = message.text
+    return str(text) if isinstance(text, str) else text()
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "\n".join(
+        f"- {'.'.join(str(loc) for loc in detail['loc']) or '(root)'} : {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def parse_response(
+    text: str,
+    schema: Type[ResponseModel]
+) -> Tuple[ResponseModel | None, str | None]:
+    """
+    Parse model output into `schema`. Returns (parsed, None), or (None, validation error message).
+    """
+    try:
+        return schema.model_validate_json(text), None
+    except ValidationError as error:
+        message = _format_validation_error(error)
+
+    candidate = repair_json(text)
+    # python literal (single quotes, True / None) is the other common near-valid form
+    for loader in (json.loads, ast.literal_eval):
+        try:
+            data = loader(candidate)
+        except (ValueError, SyntaxError, RecursionError):
+            continue
+        try:
+            return schema.model_validate(data), None
+        except ValidationError as error:
+            return None, _format_validation_error(error)
+
+    return None, message
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Structured response pipeline
+# ------------------------------------------------------------------------------------------------------------------
+def get_structured_response(
+    model_client: Any,
+    schema: Type[ResponseModel],
+    messages: Sequence[AnyMessage],
+    max_retries: int = 3,
+    max_reasks: int = 1
+) -> Tuple[ResponseModel, List[AIMessage]]:
+    """
+    Get response of `schema` with as few LLM round trips as possible.
+
+    1. strict json schema output (`include_raw` keeps raw message for usage and repair) : one call in common case
+    2. local repair of near-valid raw output (no call)
+    3. re-ask that only sends the validation error and the previous output, not the whole context
+
+    Returns parsed response and raw messages of every call (token usage is recorded by caller).
+    """
+    structured_client = model_client.with_structured_output(
+        schema,
+        method='json_schema',
+        strict=True,
+        include_raw=True
+    )
+
+    responses: List[AIMessage] = []
+    request_messages = list(messages)
+    error = None
+    for _ in range(max_reasks + 1):
+        result = get_response_with_retry(
+            model_client=structured_client,
+            messages=request_messages,
+            max_retries=max_retries
+        )
+        raw: AIMessage = result['raw']
+        responses.append(raw)
+
+        if result.get('parsed') is not None:
+            return result['parsed'], responses
+
+        output = get_text(raw)
+        parsed, error = parse_response(output, schema)
+        if parsed is not None:
+            return parsed, responses
+
+        request_messages = [
+            SystemMessage(content=str(REASK_SYSTEM_PROMPT)),
+            HumanMessage(content=REASK_INPUT_PROMPT.render(error=error, output=output))
+        ]
+
+    raise ValueError(f"Invalid {schema.__name__} after {max_reasks} re-asks :\n{error}")
@@ -1,32 +1,81 @@
-from typing import Dict
+from typing import Dict, List, Tuple, Any
+from threading import Lock
 
 from langchain.messages import AIMessage
 
 TOKEN_PRICE_UNIT = 1000000
 
+# batch api calls are billed at half price (input and output)
+BATCH_PRICE_RATIO = 0.5
+
 TOKEN_PRICE_MAP = {
+    # chat models
     'gpt-4o' : {
         'input' : 2.5 / TOKEN_PRICE_UNIT,
+        'cached_input' : 1.25 / TOKEN_PRICE_UNIT,
         'output' : 10 / TOKEN_PRICE_UNIT
     },
     'gpt-4o-mini' : {
         'input' : 0.15 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.075 / TOKEN_PRICE_UNIT,
         'output' : 0.6 / TOKEN_PRICE_UNIT
     },
+    'gpt-4.1' : {
+        'input' : 2.00 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.50 / TOKEN_PRICE_UNIT,
+        'output' : 8.00 / TOKEN_PRICE_UNIT
+    },
     'gpt-4.1-mini' : {
         'input' : 0.40 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.10 / TOKEN_PRICE_UNIT,
         'output' : 1.60 / TOKEN_PRICE_UNIT
     },
+    'gpt-4.1-nano' : {
+        'input' : 0.10 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.025 / TOKEN_PRICE_UNIT,
+        'output' : 0.40 / TOKEN_PRICE_UNIT
+    },
+    # embedding models
+    'text-embedding-3-small' : {
+        'input' : 0.02 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.02 / TOKEN_PRICE_UNIT,
+        'output' : 0.0
+    },
+    'text-embedding-3-large' : {
+        'input' : 0.13 / TOKEN_PRICE_UNIT,
+        'cached_input' : 0.13 / TOKEN_PRICE_UNIT,
+        'output' : 0.0
+    },
 }
 
 
+def get_token_price(model: str) -> Dict[str, float]:
+    """
+    Get price map of model. Dated snapshots (e.g. 'gpt-4o-2024-08-06') resolve to the longest matching model name.
+    """
+    if model in TOKEN_PRICE_MAP:
+        return TOKEN_PRICE_MAP[model]
+
+    candidates = [name for name in TOKEN_PRICE_MAP if model.startswith(name)]
+    if not candidates:
+        raise ValueError(f"Unknown model for token price : {model}")
+
+    return TOKEN_PRICE_MAP[max(candidates, key=len)]
+
+
 def calc_token_price(
-    model:str, 
-    input_tokens:int, 
-    output_tokens:int
+    model:str,
+    input_tokens:int,
+    output_tokens:int,
+    cached_input_tokens:int = 0,
+    batch: bool = False
 ):
-    input_token_price = input_tokens * TOKEN_PRICE_MAP[model]['input']
-    output_token_price = output_tokens * TOKEN_PRICE_MAP[model]['output']
+    # cached input tokens are part of input tokens, but billed with discounted price.
+    token_price = get_token_price(model)
+    ratio = BATCH_PRICE_RATIO if batch else 1.0
+
+    input_token_price = ((input_tokens - cached_input_tokens) * token_price['input'] + cached_input_tokens * token_price['cached_input']) * ratio
+    output_token_price = output_tokens * token_price['output'] * ratio
     total_token_price = input_token_price + output_token_price
 
     return {
@@ -43,9 +92,171 @@ def get_token_usage_from_message(message: AIMessage) -> Dict[str, int]:
         total_tokens = message.usage_metadata['total_tokens']
     except Exception as error:
         raise error
-    
+
+    input_token_details = message.usage_metadata.get('input_token_details') or {}
+    cached_input_tokens = input_token_details.get('cache_read') or 0
+
     return {
         'input_tokens' : input_tokens,
         'output_tokens' : output_tokens,
-        'total_tokens' : total_tokens
-    }
\ No newline at end of file
+        'total_tokens' : total_tokens,
+        'cached_input_tokens' : cached_input_tokens
+    }
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Usage Ledger
+# ------------------------------------------------------------------------------------------------------------------
+class UsageLedger:
+    """
+    Ledger that attributes token usage and cost per (model, node, call type, model tier).
+
+    A ledger can have parent ledger (e.g. task ledger -> experiment ledger). Every record is
+    propagated to the parent, so running totals of the experiment are always up to date.
+    """
+    USAGE_FIELDS = ('calls', 'input_tokens', 'cached_input_tokens', 'output_tokens', 'total_tokens', 'input_cost', 'output_cost', 'cost')
+
+    def __init__(
+        self,
+        parent: "UsageLedger" = None
+    ) -> None:
+        self.parent = parent
+        self.entries: Dict[Tuple[str, str, str, str], Dict[str, float]] = {}
+        self.streams: Dict[str, Dict[str, float]] = {}     # node -> latency stats of streamed calls
+        self._lock = Lock()
+
+    def _add(
+        self,
+        key: Tuple[str, str, str, str],
+        usage: Dict[str, float]
+    ) -> None:
+        with self._lock:
+            entry = self.entries.setdefault(key, {field : 0 for field in self.USAGE_FIELDS})
+            for field in self.USAGE_FIELDS:
+                entry[field] += usage.get(field, 0)
+
+        if self.parent is not None:
+            self.parent._add(key, usage)
+
+    def record(
+        self,
+        model: str,
+        node: str,
+        call_type: str = 'chat',
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached_input_tokens: int = 0,
+        tier: str = 'default'
+    ) -> Dict[str, float]:
+        price = calc_token_price(
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cached_input_tokens=cached_input_tokens,
+            batch=call_type == 'batch'
+        )
+
+        self._add((model, node, call_type, tier), {
+            'calls' : 1,
+            'input_tokens' : input_tokens,
+            'cached_input_tokens' : cached_input_tokens,
+            'output_tokens' : output_tokens,
+            'total_tokens' : input_tokens + output_tokens,
+            'input_cost' : price['input_token_price'],
+            'output_cost' : price['output_token_price'],
+            'cost' : price['total_token_price']
+        })
+
+        return price
+
+    def record_message(
+        self,
+        message: AIMessage,
+        model: str,
+        node: str,
+        tier: str = 'default'
+    ) -> Dict[str, int]:
+        token_usage = get_token_usage_from_message(message)
+
+        self.record(
+            model=model,
+            node=node,
+            call_type='chat',
+            input_tokens=token_usage['input_tokens'],
+            output_tokens=token_usage['output_tokens'],
+            cached_input_tokens=token_usage['cached_input_tokens'],
+            tier=tier
+        )
+
+        return token_usage
+
+    def record_stream(
+        self,
+        node: str,
+        metrics: Dict[str, float]
+    ) -> None:
+        """
+        Record latency metrics of one streamed call (see `stream_response_with_retry`).
+        """
+        with self._lock:
+            stats = self.streams.setdefault(node, {'calls' : 0, 'ttft_sum' : 0.0, 'ttft_max' : 0.0, 'itl_sum' : 0.0, 'itl_max' : 0.0})
+            stats['calls'] += 1
+            stats['ttft_sum'] += metrics['ttft']
+            stats['ttft_max'] = max(stats['ttft_max'], metrics['ttft'])
+            stats['itl_sum'] += metrics['mean_itl']
+            stats['itl_max'] = max(stats['itl_max'], metrics['max_itl'])
+
+        if self.parent is not None:
+            self.parent.record_stream(node, metrics)
+
+    def stream_summary(self) -> Dict[str, Dict[str, float]]:
+        # node -> mean / max time to first token and inter-token latency (seconds)
+        with self._lock:
+            return {
+                node : {
+                    'calls' : stats['calls'],
+                    'mean_ttft' : stats['ttft_sum'] / stats['calls'],
+                    'max_ttft' : stats['ttft_max'],
+                    'mean_itl' : stats['itl_sum'] / stats['calls'],
+                    'max_itl' : stats['itl_max']
+                }
+                for node, stats in self.streams.items()
+            }
+
+    @property
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                field : sum(entry[field] for entry in self.entries.values())
+                for field in self.USAGE_FIELDS
+            }
+
+    def breakdown(
+        self,
+        by: str = 'model'
+    ) -> Dict[str, Dict[str, float]]:
+        index = {'model' : 0, 'node' : 1, 'call_type' : 2, 'tier' : 3}[by]
+
+        result: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for key, entry in self.entries.items():
+                group = result.setdefault(key[index], {field : 0 for field in self.USAGE_FIELDS})
+                for field in self.USAGE_FIELDS:
+                    group[field] += entry[field]
+
+        return result
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {'model' : model, 'node' : node, 'call_type' : call_type, 'tier' : tier, **entry}
+                for (model, node, call_type, tier), entry in self.entries.items()
+            ]
+
+    def load(
+        self,
+        entries: List[Dict[str, Any]]
+    ) -> None:
+        for entry in entries:
+            # records written before model routing have no tier
+            self._add((entry['model'], entry['node'], entry['call_type'], entry.get('tier', 'default')), entry)
@@ -0,0 +1,281 @@
+import ast
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Any, Dict, List, Sequence
+from weakref import WeakKeyDictionary
+
+from langchain.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+# number of tool calls that can be in flight at the same time (dispatch / cached doc lookups overlap,
+# AppWorld execution itself is serialized per environment)
+MAX_TOOL_WORKERS = 4
+
+# max number of cached api doc lookups (apps x apis of AppWorld is far below this)
+MAX_DOC_CACHE_SIZE = 4096
+
+# api_docs app only serves static api documentation (never changes state of AppWorld)
+READ_ONLY_API_PREFIX = ('apis', 'api_docs')
+
+# api that ends AppWorld task
+COMPLETE_TASK_API = ['apis', 'supervisor', 'complete_task']
+
+_tool_executor: ThreadPoolExecutor | None = None
+
+# AppWorld runs code in one interactive shell with process-wide stdout capture : one execution at a time
+_env_locks: "WeakKeyDictionary[Any, Lock]" = WeakKeyDictionary()
+_env_locks_guard = Lock()
+
+# output of api doc lookups with constant arguments (static api documentation) -> served without the shell
+_doc_cache: Dict[str, str] = {}
+_doc_cache_lock = Lock()
+
+
+def _get_tool_executor() -> ThreadPoolExecutor:
+    global _tool_executor
+    if _tool_executor is None:
+        _tool_executor = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix='tool')
+    return _tool_executor
+
+
+def _get_attribute_path(node: ast.AST) -> List[str]:
+    path = []
+    while isinstance(node, ast.Attribute):
+        path.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        path.append(node.id)
+    return list(reversed(path))
+
+
+def is_read_only_code(code: str) -> bool:
+    """
+    Check whether generated code only reads api documentation.
+
+    Code is read-only when every statement is an expression (no assignment, import, loop, ...)
+    and every call in it is either `print(...)` or `apis.api_docs.<api>(...)`.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+
+    if not tree.body:
+        return False
+
+    for statement in tree.body:
+        if not isinstance(statement, ast.Expr):
+            return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Lambda, ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom)):
+            return False
+        if isinstance(node, ast.Call):
+            path = _get_attribute_path(node.func)
+            if path == ['print']:
+                continue
+            if tuple(path[:2]) == READ_ONLY_API_PREFIX and len(path) == 3:
+                continue
+            return False
+
+    return True
+
+
+def calls_complete_task(code: str) -> bool:
+    """
+    Check whether generated code calls `apis.supervisor.complete_task(...)` (comments and strings do not count).
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+
+    return any(
+        isinstance(node, ast.Call) and _get_attribute_path(node.func) == COMPLETE_TASK_API
+        for node in ast.walk(tree)
+    )
+
+
+def _get_doc_lookup_key(code: str) -> str | None:
+    # cache key of code that only prints / evaluates `apis.api_docs.<api>(...)` with constant arguments :
+    # its output depends on nothing but the call, unlike code reading variables of the session (e.g. `print(result)`)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+
+    if not tree.body:
+        return None
+
+    for statement in tree.body:
+        if not isinstance(statement, ast.Expr):
+            return None
+        node = statement.value
+        if isinstance(node, ast.Call) and _get_attribute_path(node.func) == ['print'] and len(node.args) == 1 and not node.keywords:
+            node = node.args[0]
+        if not isinstance(node, ast.Call):
+            return None
+        path = _get_attribute_path(node.func)
+        if tuple(path[:2]) != READ_ONLY_API_PREFIX or len(path) != 3:
+            return None
+        if not all(isinstance(arg, ast.Constant) for arg in [*node.args, *(keyword.value for keyword in node.keywords)]):
+            return None
+
+    return ast.dump(tree)
+
+
+def _get_env_lock(env: Any) -> Lock:
+    with _env_locks_guard:
+        lock = _env_locks.get(env)
+        if lock is None:
+            lock = _env_locks[env] = Lock()
+        return lock
+
+
+def execute_code(env: Any, code: str) -> str:
+    """
+    Execute code in AppWorld environment, one execution at a time per environment.
+
+    Api doc lookups with constant arguments only read static documentation, so their output is cached by
+    the normalized code and repeated lookups (same doc in another turn or task) never reach the shell.
+    Other read-only code (e.g. `print(result)`) depends on the session and always runs. Errors are not cached.
+    """
+    key = _get_doc_lookup_key(code)
+    if key is not None:
+        with _doc_cache_lock:
+            output = _doc_cache.get(key)
+        if output is not None:
+            return output
+
+    with _get_env_lock(env):
+        output = f"{env.execute(code)}"
+
+    if key is not None and 'Traceback' not in output:
+        with _doc_cache_lock:
+            if len(_doc_cache) < MAX_DOC_CACHE_SIZE:
+                _doc_cache[key] = output
+    return output
+
+
+def is_read_only_tool_call(tool_call: Dict[str, Any]) -> bool:
+    return tool_call['name'] == 'action_tool' and is_read_only_code(tool_call['args'].get('code', ''))
+
+
+def run_tool_calls(
+    tool_calls: Sequence[Dict[str, Any]],
+    action_tool: BaseTool
+) -> List[ToolMessage]:
+    """
+    Run 'action_tool' calls of one model turn and return tool messages in the order of calls.
+
+    Consecutive read-only calls (api documentation lookups) are submitted together to bounded executor :
+    cached docs are served concurrently, lookups that reach AppWorld still run one at a time (see
+    `execute_code`). Mutating calls run one by one, and act as a barrier between read-only groups.
+    """
+    tool_calls = [tool_call for tool_call in tool_calls if tool_call['name'] == 'action_tool']
+
+    contents: List[str] = [None] * len(tool_calls)
+    read_only_group: List[int] = []
+
+    def _flush_read_only_group():
+        if len(read_only_group) == 1:
+            index = read_only_group[0]
+            contents[index] = action_tool.invoke(tool_calls[index]['args'])
+        elif read_only_group:
+            executor = _get_tool_executor()
+            futures = {index : executor.submit(action_tool.invoke, tool_calls[index]['args']) for index in read_only_group}
+            for index, future in futures.items():
+                contents[index] = future.result()
+        read_only_group.clear()
+
+    for index, tool_call in enumerate(tool_calls):
+        if is_read_only_tool_call(tool_call):
+            read_only_group.append(index)
+            continue
+
+        _flush_read_only_group()
+        contents[index] = action_tool.invoke(tool_call['args'])
+
+    _flush_read_only_group()
+
+    return [
+        ToolMessage(content=content, tool_call_id=tool_call['id'])
+        for tool_call, content in zip(tool_calls, contents)
+    ]
+
+
+# ------------------------------------------------------------------------------------------------------------------
+# Early dispatch of streamed tool calls
+# ------------------------------------------------------------------------------------------------------------------
+class ToolCallDispatcher:
+    """
+    Start 'action_tool' calls while the model is still streaming the rest of its turn.
+
+    While streaming (`dispatch_early`), only read-only calls before the first mutating call of the turn
+    start : the turn may still be abandoned (budget cut-off), and state-changing code must not have run
+    by then. `collect` (tool node) dispatches the rest. Ordering rules are the same as `run_tool_calls` :
+    a read-only call only waits for the last mutating call before it, a mutating call waits for every
+    call before it. Each call waits inside the executor on calls submitted earlier, so the FIFO executor
+    never deadlocks. `cancel` drops the calls of an abandoned turn.
+    """
+    def __init__(
+        self,
+        action_tool: BaseTool
+    ) -> None:
+        self.action_tool = action_tool
+        self._futures: Dict[str, Future] = {}
+        self._barrier: List[Future] = []        # calls that the next read-only call has to wait for
+        self._held = False                      # a mutating call was streamed : later calls wait for `collect`
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def _run_after(
+        self,
+        previous: List[Future],
+        args: Dict[str, Any]
+    ) -> str:
+        wait(previous)
+        return self.action_tool.invoke(args)
+
+    def dispatch(self, tool_call: Dict[str, Any]) -> None:
+        if tool_call['name'] != 'action_tool' or tool_call['id'] in self._futures:
+            return
+
+        executor = _get_tool_executor()
+        if is_read_only_tool_call(tool_call):
+            future = executor.submit(self._run_after, list(self._barrier), tool_call['args'])
+        else:
+            future = executor.submit(self._run_after, list(self._futures.values()), tool_call['args'])
+            self._barrier = [future]
+        self._futures[tool_call['id']] = future
+
+    def dispatch_early(self, tool_call: Dict[str, Any]) -> None:
+        if tool_call['name'] != 'action_tool' or self._held:
+            return
+        if not is_read_only_tool_call(tool_call):
+            self._held = True
+            return
+        self.dispatch(tool_call)
+
+    def cancel(self) -> None:
+        """
+        Drop calls that did not start and wait for running ones (read-only lookups).
+        """
+        futures = list(self._futures.values())
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+    def collect(self, tool_calls: Sequence[Dict[str, Any]]) -> List[ToolMessage]:
+        """
+        Tool messages of `tool_calls` in order (calls that were not dispatched yet are dispatched now).
+        """
+        tool_calls = [tool_call for tool_call in tool_calls if tool_call['name'] == 'action_tool']
+        for tool_call in tool_calls:
+            self.dispatch(tool_call)
+
+        return [
+            ToolMessage(content=self._futures[tool_call['id']].result(), tool_call_id=tool_call['id'])
+            for tool_call in tool_calls
+        ]
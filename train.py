@@ -0,0 +1,94 @@
+import argparse
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-epoch offline training of ACE playbook, then read-only evaluation of the trained playbook.")
+    parser.add_argument("--model_name", type=str, default="gpt-4.1-mini")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--small_model", type=str, default=None, help="cheap model for routine steps (reflector, curator, api doc browsing)")
+    parser.add_argument("--large_model", type=str, default=None, help="strong model that steps escalate to after repeated failures")
+    parser.add_argument("--escalate_after", type=int, default=2, help="number of failures that moves a step one model tier up")
+    parser.add_argument("--experiment_name", type=str, default="ace_train")
+    parser.add_argument("--num_epochs", type=int, default=3)
+    parser.add_argument("--num_shards", type=int, default=4, help="number of training shards run in parallel in every epoch")
+    parser.add_argument("--first_k_task", type=int, default=None, help="use only first k tasks of 'train' split")
+    parser.add_argument("--seed", type=int, default=42, help="seed of per-epoch task shuffle")
+    parser.add_argument("--eval_dataset_type", type=str, choices=["dev", "test"], default=None, help="evaluate trained playbook (frozen) on this split after training")
+    parser.add_argument("--eval_only", action="store_true", help="skip training and evaluate the latest playbook checkpoint")
+    parser.add_argument("--save_dir", type=str, default="./training_results")
+    parser.add_argument("--resume", action="store_true", help="continue from the latest epoch checkpoint (and interrupted shards of the running epoch)")
+    parser.add_argument("--prefetch_envs", type=int, default=None, help="number of AppWorld environments prepared in background per shard (default : 1 with sandbox, otherwise 0)")
+    parser.add_argument("--no_sandbox", action="store_true", help="run AppWorld in this process (only with '--num_shards 1' and '--prefetch_envs 0')")
+    parser.add_argument("--max_steps", type=int, default=100)
+    parser.add_argument("--max_task_tokens", type=int, default=None)
+    parser.add_argument("--max_task_cost", type=float, default=None)
+    parser.add_argument("--max_task_seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    # shards run AppWorld sessions at the same time : each one needs its own sandbox process
+    if args.prefetch_envs is None:
+        args.prefetch_envs = 0 if args.no_sandbox else 1
+    if args.no_sandbox and (args.num_shards > 1 or args.prefetch_envs > 0):
+        parser.error("'--no_sandbox' runs one AppWorld session at a time : use '--num_shards 1' and '--prefetch_envs 0'")
+
+    print("=="*50)
+    print(f"📌 Training ACE Playbook")
+    print(f"    📍 LLM Core Name: {args.model_name}")
+    print(f"    📍 LLM Core Temperature: {args.temperature}")
+    print(f"    📍 Model Tiers: small={args.small_model}, large={args.large_model} (escalate after {args.escalate_after} failures)")
+    print(f"    📍 Epochs: {args.num_epochs}")
+    print(f"    📍 Shards: {args.num_shards} (sandbox : {not args.no_sandbox})")
+    print(f"    📍 Number of Task: {args.first_k_task if args.first_k_task is not None else 'Full'}")
+    print(f"    📍 Evaluation Dataset Type: {args.eval_dataset_type}")
+    print(f"📌 Save Directory: {args.save_dir}")
+    print(f"    📍 Experiment Name: {args.experiment_name}")
+    print(f"    📍 Resume: {args.resume}")
+    print(f"📌 Task Budget: steps={args.max_steps}, tokens={args.max_task_tokens}, cost={args.max_task_cost}, seconds={args.max_task_seconds}")
+    print("=="*50 + "\n\n")
+
+    # imported after argument parsing : '--help' and argument errors never load agents / appworld
+    from src.tests.train import ACETrainer
+
+    model_config = {
+        'model' : args.model_name,
+        'temperature' : args.temperature,
+        'stream_usage' : True
+    }
+    router_config = None
+    if args.small_model is not None or args.large_model is not None:
+        tiers = {'default' : model_config}
+        for tier, model in (('small', args.small_model), ('large', args.large_model)):
+            if model is not None:
+                tiers[tier] = {**model_config, 'model' : model}
+        router_config = {'tiers' : tiers, 'escalate_after' : args.escalate_after}
+
+    trainer = ACETrainer(
+        experiment_name=args.experiment_name,
+        num_epochs=args.num_epochs,
+        num_shards=args.num_shards,
+        first_k_task=args.first_k_task,
+        model_config=model_config,
+        router_config=router_config,
+        save_dir=args.save_dir,
+        resume=args.resume or args.eval_only,
+        task_budget={
+            'max_steps' : args.max_steps,
+            'max_tokens' : args.max_task_tokens,
+            'max_cost' : args.max_task_cost,
+            'max_seconds' : args.max_task_seconds
+        },
+        prefetch_envs=args.prefetch_envs,
+        sandbox_config=None if args.no_sandbox else {},
+        seed=args.seed
+    )
+
+    if not args.eval_only:
+        summary = trainer.train()
+        print(f"📌 Trained playbook : {summary['num_bullets']} bullets ({summary['checkpoint_path']})")
+
+    if args.eval_dataset_type is not None:
+        summary = trainer.evaluate(dataset_type=args.eval_dataset_type)
+        print(f"📌 Succeed {summary['num_succeed']} / {summary['num_tasks']} tasks. Results : {summary['result_path']}")
+        print(f"📌 Total cost : ${summary['total_cost']:.4f} (cost per solved task : ${summary['cost_per_solved_task']:.4f})")
+
+if __name__ == "__main__":
+    main()